@@ -1,7 +1,8 @@
 from flask import Flask
-from routes.auth import auth_bp
-from routes.logs import logs_bp
-from config import Config
+from backend.routes.auth import auth_bp
+from backend.routes.logs import logs_bp
+from backend.routes.metrics import metrics_bp
+from backend.config import Config
 
 def create_app():
     app = Flask(__name__)
@@ -10,9 +11,17 @@ def create_app():
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(logs_bp)
+    app.register_blueprint(metrics_bp)
 
     return app
 
 if __name__ == '__main__':
+    # Single-process development server; serve production traffic with
+    # gunicorn -c backend/gunicorn.conf.py backend.wsgi:app
     app = create_app()
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    if Config.STAGING_CACHE_ENABLED:
+        from backend.cohosted_vault import start_cohosted_vault
+        from backend.routes import auth
+        start_cohosted_vault(auth.staging_cache, auth.EXCHANGE_HOST, auth.EXCHANGE_PORT)
+    # The reloader would run a second copy of the app, and of the co-hosted vault.
+    app.run(host='0.0.0.0', port=5000, debug=Config.DEBUG, use_reloader=not Config.STAGING_CACHE_ENABLED)
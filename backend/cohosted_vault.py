@@ -0,0 +1,64 @@
+"""
+Runs the data vault inside the gateway's process.
+
+With STAGING_CACHE_ENABLED, the auth routes stage the payload of every
+approved request in ``auth.staging_cache``. A vault started here shares that
+cache, so it answers those requests without reading and masking the record
+again; a request whose payload is not staged is refused. The cache lives
+in one process, so a co-hosted deployment runs the single-process
+development server (``python -m backend.app``), not gunicorn.
+"""
+import importlib
+import os
+import sys
+import threading
+
+from backend.utils.token_generator import SECRET_KEY
+
+VAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data-exchange')
+# Top-level names the vault's modules import each other by
+_VAULT_NAMES = frozenset(os.path.splitext(name)[0] for name in os.listdir(VAULT_DIR)
+                         if name.endswith('.py') or os.path.isdir(os.path.join(VAULT_DIR, name, '')))
+_import_lock = threading.Lock()
+
+
+def import_vault_modules(*names):
+    """
+    Imports modules of the vault by name, e.g. ``server``.
+
+    The vault imports its modules (config, utils.*) by bare name. They are
+    resolved against the vault's directory only while importing, then taken
+    out of ``sys.path`` and ``sys.modules`` again, so those names keep
+    meaning what they did in the gateway's process.
+
+    :return: The modules, in the order of ``names``.
+    """
+    def is_vault_module(name):
+        return name.split('.')[0] in _VAULT_NAMES
+
+    with _import_lock:
+        saved = {name: module for name, module in sys.modules.items() if is_vault_module(name)}
+        for name in saved:
+            del sys.modules[name]
+        sys.path.insert(0, VAULT_DIR)
+        try:
+            return [importlib.import_module(name) for name in names]
+        finally:
+            sys.path.remove(VAULT_DIR)
+            for name in [name for name in sys.modules if is_vault_module(name)]:
+                del sys.modules[name]
+            sys.modules.update(saved)
+
+
+def start_cohosted_vault(staging_cache, host, port):
+    """
+    Starts a DataVaultServer sharing ``staging_cache`` on a daemon thread.
+    It accepts each token this gateway mints once.
+
+    :return: The running server; ``server.port`` is the bound port.
+    """
+    server_module, token_validator = import_vault_modules('server', 'utils.token_validator')
+    server = server_module.DataVaultServer(host=host, port=port, staging_cache=staging_cache,
+                                           token_validator=token_validator.TokenValidator(secret_key=SECRET_KEY))
+    threading.Thread(target=server.start, name='cohosted-vault', daemon=True).start()
+    return server
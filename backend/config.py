@@ -1,5 +1,8 @@
 import os
 
+# Default location of the gateway's data files, so it runs the same from any working directory
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
 class Config:
     """Base configuration."""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a_default_secret_key'
@@ -8,6 +11,79 @@ class Config:
     DATABASE_URI = os.environ.get('DATABASE_URI') or 'sqlite:///app.db'
     JSON_SORT_KEYS = False
 
+    # Audit log storage
+    AUDIT_LOG_DIR = os.environ.get('AUDIT_LOG_DIR') or os.path.join(_DATA_DIR, 'audit_logs')
+    AUDIT_LEGACY_LOG_FILE = os.environ.get('AUDIT_LEGACY_LOG_FILE') or os.path.join(_DATA_DIR, 'audit_logs.json')
+    AUDIT_SEGMENT_MAX_BYTES = int(os.environ.get('AUDIT_SEGMENT_MAX_BYTES', 64 * 1024 * 1024))
+    AUDIT_SEGMENT_MAX_AGE = int(os.environ.get('AUDIT_SEGMENT_MAX_AGE', 24 * 60 * 60))
+    AUDIT_COMPRESS_SEGMENTS = os.environ.get('AUDIT_COMPRESS_SEGMENTS', 'True').lower() in ['true', '1']
+    AUDIT_RETENTION_SEGMENTS = int(os.environ.get('AUDIT_RETENTION_SEGMENTS', 0)) or None
+    AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 0)) or None
+    AUDIT_FSYNC = os.environ.get('AUDIT_FSYNC', 'False').lower() in ['true', '1']
+    # Set when several gateway processes append to the same audit, decision log and rollup stores
+    AUDIT_MULTI_PROCESS = os.environ.get('AUDIT_MULTI_PROCESS', 'False').lower() in ['true', '1']
+
+    # Background audit writer
+    AUDIT_ASYNC_WRITES = os.environ.get('AUDIT_ASYNC_WRITES', 'True').lower() in ['true', '1']
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 512))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 0.05))
+    AUDIT_OVERFLOW_POLICY = os.environ.get('AUDIT_OVERFLOW_POLICY') or 'block'
+    AUDIT_BLOCK_TIMEOUT = float(os.environ.get('AUDIT_BLOCK_TIMEOUT', 1.0))
+
+    # Audit log queries
+    AUDIT_PAGE_DEFAULT_LIMIT = int(os.environ.get('AUDIT_PAGE_DEFAULT_LIMIT', 100))
+    AUDIT_PAGE_MAX_LIMIT = int(os.environ.get('AUDIT_PAGE_MAX_LIMIT', 1000))
+    # Appended entries counted before /logs/stats folds them into its columnar snapshot
+    AUDIT_STATS_SNAPSHOT_SIZE = int(os.environ.get('AUDIT_STATS_SNAPSHOT_SIZE', 50000))
+
+    # Policy snapshots; set to 0 to disable reloading on file changes
+    POLICY_FILE = os.environ.get('POLICY_FILE') or os.path.join(_DATA_DIR, 'policies.json')
+    POLICY_RELOAD_INTERVAL = float(os.environ.get('POLICY_RELOAD_INTERVAL', 2.0))
+    # Compiled policy and consent snapshot, built once and mapped read-only by every process instead of parsing
+    # the policy JSON; kept next to the policy file unless POLICY_SHARED_SNAPSHOT names another path. Set
+    # POLICY_SNAPSHOT_CACHE to false to compile policies in each process.
+    POLICY_SNAPSHOT_CACHE = os.environ.get('POLICY_SNAPSHOT_CACHE', 'True').lower() in ['true', '1']
+    POLICY_SHARED_SNAPSHOT = os.environ.get('POLICY_SHARED_SNAPSHOT') or None
+    # Per-user consents as JSON Lines of {"user_id", "consent": {purpose: bool}}, enforced for policies that
+    # require consent; unset to skip consent checks
+    CONSENT_FILE = os.environ.get('CONSENT_FILE') or None
+
+    # Batch authorization
+    AUTHORIZE_BATCH_MAX_ITEMS = int(os.environ.get('AUTHORIZE_BATCH_MAX_ITEMS', 1000))
+
+    # Authorization decision cache; set the size to 0 to disable it
+    DECISION_CACHE_SIZE = int(os.environ.get('DECISION_CACHE_SIZE', 10000))
+    DECISION_CACHE_TTL = float(os.environ.get('DECISION_CACHE_TTL', 30.0))
+
+    # Co-hosted deployment: python -m backend.app also runs the data vault in
+    # its process, answering approved requests from payloads prepared in the
+    # background on approval. The cache is per process; not for gunicorn.
+    STAGING_CACHE_ENABLED = os.environ.get('STAGING_CACHE_ENABLED', 'False').lower() in ['true', '1']
+    STAGING_CACHE_MAX_ENTRIES = int(os.environ.get('STAGING_CACHE_MAX_ENTRIES', 10000))
+    STAGING_CACHE_MAX_BYTES = int(os.environ.get('STAGING_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    STAGING_WORKERS = int(os.environ.get('STAGING_WORKERS', 2))
+    # Masked in every record released to a partner, staged or read by the vault
+    STAGING_MASKED_FIELDS = [field for field in os.environ.get('STAGING_MASKED_FIELDS', 'name,email').split(',') if field]
+    USER_DATA_FILE = os.environ.get('USER_DATA_FILE') or os.path.join(_DATA_DIR, 'mock_data.json')
+
+    # Deterministic tokenization; set TOKEN_VAULT_FILE to keep a reverse lookup for detokenization
+    TOKENIZATION_KEY = os.environ.get('TOKENIZATION_KEY') or SECRET_KEY
+    TOKENIZATION_CACHE_SIZE = int(os.environ.get('TOKENIZATION_CACHE_SIZE', 65536))
+    TOKENIZED_FIELDS = [field for field in os.environ.get('TOKENIZED_FIELDS', 'account_number,phone').split(',') if field]
+    TOKEN_VAULT_FILE = os.environ.get('TOKEN_VAULT_FILE') or None
+
+    # Policy decision log
+    POLICY_DECISION_LOG_DIR = os.environ.get('POLICY_DECISION_LOG_DIR') or os.path.join(_DATA_DIR, 'policy_logs')
+    POLICY_LEGACY_DECISION_LOG_FILE = os.environ.get('POLICY_LEGACY_DECISION_LOG_FILE') or os.path.join(_DATA_DIR, 'policy_logs.json')
+
+    # Policy decision rollups: per-minute counts by partner, purpose and outcome
+    POLICY_DECISION_ROLLUP_DIR = os.environ.get('POLICY_DECISION_ROLLUP_DIR') or os.path.join(_DATA_DIR, 'policy_rollups')
+    DECISION_ROLLUP_FLUSH_INTERVAL = float(os.environ.get('DECISION_ROLLUP_FLUSH_INTERVAL', 10.0))
+    DECISION_ROLLUP_RETENTION_HOURS = int(os.environ.get('DECISION_ROLLUP_RETENTION_HOURS', 24))
+    # Fraction of decisions also written as raw events to the decision log
+    DECISION_LOG_SAMPLE_RATE = float(os.environ.get('DECISION_LOG_SAMPLE_RATE', 0.0))
+
 class ProductionConfig(Config):
     """Production configuration."""
     DATABASE_URI = os.environ.get('DATABASE_URI') or 'mysql://user@localhost/foo'
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for serving the gateway from several worker processes:
+
+    gunicorn -c backend/gunicorn.conf.py backend.wsgi:app
+
+Workers map one compiled policy and consent snapshot, kept next to the
+policy file (or at POLICY_SHARED_SNAPSHOT), instead of each compiling their
+own; the first worker to start, or to see the policy or consent file change,
+rebuilds it and the others map the result. They append to the same audit,
+decision log and rollup stores (AUDIT_MULTI_PROCESS), each indexing the
+others' entries before answering log queries; decision summaries at
+/logs/decisions include the rows the other workers have flushed, about a
+minute behind. /metrics describes the worker that serves the request.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GATEWAY_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GATEWAY_WORKERS', 0)) or multiprocessing.cpu_count()
+worker_class = 'gthread'
+threads = int(os.environ.get('GATEWAY_THREADS', 4))
+timeout = 30
+# Each worker imports the app after the fork: the policy reloader, audit
+# writer and rollup threads started at import time do not survive a fork.
+preload_app = False
+
+# Read by backend.config when each worker imports the app.
+os.environ.setdefault('AUDIT_MULTI_PROCESS', 'True')
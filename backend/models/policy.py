@@ -1,3 +1,6 @@
+from backend.services.policy_index import compile_policies
+
+
 class Policy:
     def __init__(self, policy_id, partner_id, data_usage_rules, consent_required):
         self.policy_id = policy_id
@@ -5,6 +8,47 @@ class Policy:
         self.data_usage_rules = data_usage_rules
         self.consent_required = consent_required
 
+    @classmethod
+    def from_dict(cls, data, policy_id=None):
+        """
+        Builds a Policy from either policy file layout:
+
+        - ``{"partner_id": ..., "data_usage": {"purpose": ..., "allowed_data": [...], "conditions": [...]}}``
+          where ``data_usage`` may also be a list of such entries, each with
+          an optional ``masked_fields`` list of field paths, or
+        - ``{"partner_id": ..., "allowed_purposes": [...]}``.
+
+        ``data_usage_rules`` maps each purpose to its ``allowed_data``,
+        ``conditions`` and ``masked_fields``.
+        """
+        usage = data.get('data_usage') or []
+        if isinstance(usage, dict):
+            usage = [usage]
+        rules = {}
+        for entry in usage:
+            rules[entry['purpose']] = {
+                "allowed_data": list(entry.get('allowed_data', [])),
+                "conditions": list(entry.get('conditions', [])),
+                "masked_fields": list(entry.get('masked_fields', [])),
+            }
+        for purpose in data.get('allowed_purposes', []):
+            rules.setdefault(purpose, {"allowed_data": [], "conditions": [], "masked_fields": []})
+        consent_required = data.get('consent_required')
+        if consent_required is None:
+            consent_required = any(
+                'consent' in condition.lower()
+                for rule in rules.values() for condition in rule['conditions']
+            )
+        return cls(
+            policy_id=data.get('policy_id') or policy_id or data['partner_id'],
+            partner_id=data['partner_id'],
+            data_usage_rules=rules,
+            consent_required=bool(consent_required),
+        )
+
+    def allowed_purposes(self):
+        return list(self.data_usage_rules)
+
     def is_consent_required(self):
         return self.consent_required
 
@@ -16,6 +60,13 @@ class PolicyManager:
     def __init__(self):
         self.policies = {}
 
+    @classmethod
+    def from_dicts(cls, policy_dicts):
+        manager = cls()
+        for i, data in enumerate(policy_dicts):
+            manager.add_policy(Policy.from_dict(data, policy_id=f"policy_{i}"))
+        return manager
+
     def add_policy(self, policy):
         self.policies[policy.policy_id] = policy
 
@@ -27,4 +78,8 @@ class PolicyManager:
             del self.policies[policy_id]
 
     def list_policies(self):
-        return list(self.policies.values())
\ No newline at end of file
+        return list(self.policies.values())
+
+    def compile(self):
+        """Returns an immutable CompiledPolicies index of the current policies."""
+        return compile_policies(self.list_policies())
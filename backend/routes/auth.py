@@ -1,9 +1,49 @@
 from flask import Blueprint, request, jsonify
+from backend.config import Config
+from backend.services.audit_service import get_audit_service
+from backend.services.data_masking import DataMaskingService
+from backend.services.decision_rollup import get_decision_rollup
 from backend.services.policy_engine import PolicyEngine
-from backend.utils.token_generator import generate_token
+from backend.services.staging_cache import RecordStager, StagedRecordCache, load_user_records
+from backend.utils.metrics import stage_timer
+from backend.utils.token_generator import TOKEN_LIFETIME, generate_token, generate_tokens
+from backend.utils.validators import validate_batch_item, validate_batch_request_data
 
 auth_bp = Blueprint('auth', __name__)
-policy_engine = PolicyEngine()
+policy_engine = PolicyEngine(Config.POLICY_FILE, decision_rollup=get_decision_rollup())
+audit_service = get_audit_service()
+
+EXCHANGE_HOST = "localhost"
+EXCHANGE_PORT = 9999
+TOKEN_EXPIRES_IN = int(TOKEN_LIFETIME.total_seconds())
+
+_staging_seconds = stage_timer('staging')
+
+# Shared with the vault backend.app starts in this process (backend/cohosted_vault.py).
+staging_cache = None
+record_stager = None
+if Config.STAGING_CACHE_ENABLED:
+    staging_cache = StagedRecordCache(max_entries=Config.STAGING_CACHE_MAX_ENTRIES,
+                                      max_bytes=Config.STAGING_CACHE_MAX_BYTES,
+                                      workers=Config.STAGING_WORKERS)
+    record_stager = RecordStager(staging_cache, load_user_records(Config.USER_DATA_FILE), policy_engine,
+                                 DataMaskingService(), Config.STAGING_MASKED_FIELDS, ttl=TOKEN_EXPIRES_IN)
+
+def release_claims(partner_id, purpose):
+    """
+    Token claims binding an approval to one release: the vault serves only
+    the token's user, reduced to the policy's allowed data for the purpose
+    and with the same fields masked as a staged payload.
+    """
+    index = policy_engine.index
+    masked_fields = list(Config.STAGING_MASKED_FIELDS)
+    masked_fields += [path for path in index.masked_fields(partner_id, purpose) if path not in masked_fields]
+    return {
+        "partner_id": partner_id,
+        "purpose": purpose,
+        "allowed_data": list(index.allowed_data(partner_id, purpose)),
+        "masked_fields": masked_fields,
+    }
 
 @auth_bp.route('/authorize', methods=['POST'])
 def authorize():
@@ -16,14 +56,76 @@ def authorize():
         return jsonify({"error": "Missing required fields"}), 400
 
     # Check policy and generate token
-    if policy_engine.is_authorized(partner_id, user_id, purpose):
-        token = generate_token(user_id)
+    decision = policy_engine.evaluate(partner_id, user_id, purpose)
+    if decision.allowed:
+        token = generate_token(user_id, claims=release_claims(partner_id, purpose))
+        if record_stager is not None:
+            with _staging_seconds.time():
+                record_stager.stage(token, partner_id, user_id, purpose)
+        audit_service.log_access(user_id, partner_id, purpose, data.get('requested_data', []),
+                                 policy_version=decision.policy_version)
         return jsonify({
             "status": "approved",
             "token": token,
-            "exchange_host": "localhost",
-            "exchange_port": 9999,
-            "expires_in": 300
+            "exchange_host": EXCHANGE_HOST,
+            "exchange_port": EXCHANGE_PORT,
+            "expires_in": TOKEN_EXPIRES_IN,
+            "policy_version": decision.policy_version
         }), 200
     else:
-        return jsonify({"status": "denied"}), 403
\ No newline at end of file
+        return jsonify({"status": "denied", "policy_version": decision.policy_version}), 403
+
+@auth_bp.route('/authorize/batch', methods=['POST'])
+def authorize_batch():
+    data = request.get_json(silent=True)
+    try:
+        validate_batch_request_data(data, Config.AUTHORIZE_BATCH_MAX_ITEMS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    partner_id = data['partner_id']
+
+    results = []
+    valid = []
+    for i, item in enumerate(data['items']):
+        try:
+            validate_batch_item(item)
+        except ValueError as e:
+            results.append({"index": i, "status": "invalid", "error": str(e)})
+            continue
+        result = {"index": i, "user_id": item['user_id'], "purpose": item['purpose']}
+        results.append(result)
+        valid.append((result, item))
+
+    decisions = policy_engine.evaluate_batch(partner_id, [(item['user_id'], item['purpose']) for _, item in valid])
+    approved = []
+    for (result, item), decision in zip(valid, decisions):
+        result["status"] = "approved" if decision.allowed else "denied"
+        if decision.allowed:
+            approved.append((result, item))
+
+    claims = {}
+    for _, item in approved:
+        if item['purpose'] not in claims:
+            claims[item['purpose']] = release_claims(partner_id, item['purpose'])
+    tokens = generate_tokens([item['user_id'] for _, item in approved],
+                             claims=[claims[item['purpose']] for _, item in approved])
+    for (result, item), token in zip(approved, tokens):
+        result["token"] = token
+        if record_stager is not None:
+            with _staging_seconds.time():
+                record_stager.stage(token, partner_id, item['user_id'], item['purpose'])
+
+    policy_version = decisions[0].policy_version if decisions else policy_engine.snapshot.version
+    audit_service.log_access_batch(
+        [(item['user_id'], partner_id, item['purpose'], item.get('requested_data', [])) for _, item in approved],
+        policy_version=policy_version,
+    )
+    return jsonify({
+        "partner_id": partner_id,
+        "results": results,
+        "approved": len(approved),
+        "exchange_host": EXCHANGE_HOST,
+        "exchange_port": EXCHANGE_PORT,
+        "expires_in": TOKEN_EXPIRES_IN,
+        "policy_version": policy_version
+    }), 200
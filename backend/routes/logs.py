@@ -1,25 +1,135 @@
-from flask import Blueprint, jsonify
-from backend.utils import validators
 import json
+from itertools import islice
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from backend.config import Config
+from backend.services.audit_index import decode_cursor, encode_cursor
+from backend.services.audit_service import get_audit_service
+from backend.services.audit_stats import DIMENSIONS
+from backend.services.decision_rollup import get_decision_rollup
+from backend.utils.validators import parse_timestamp
 
 logs_bp = Blueprint('logs', __name__)
+audit_service = get_audit_service()
+decision_rollup = get_decision_rollup()
+
+def _time_filters():
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    return (
+        parse_timestamp(start_date) if start_date else None,
+        parse_timestamp(end_date) if end_date else None,
+    )
+
+def _parse_limit():
+    limit = request.args.get('limit')
+    if limit is None:
+        return Config.AUDIT_PAGE_DEFAULT_LIMIT
+    if not limit.isdigit() or int(limit) == 0:
+        raise ValueError("Invalid limit: must be a positive integer.")
+    return min(int(limit), Config.AUDIT_PAGE_MAX_LIMIT)
+
+def _ndjson_lines(records):
+    for _, record in records:
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+def _json_array(records):
+    # Streams the same body jsonify would build, one record at a time.
+    yield '['
+    first = True
+    for _, record in records:
+        yield json.dumps(record) if first else ',' + json.dumps(record)
+        first = False
+    yield ']'
+
+def _respond(user_id):
+    """
+    Serves a filtered audit log query in one of three shapes:
+
+    - ``format=ndjson``: every match streamed as newline-delimited JSON,
+    - ``limit`` and/or ``cursor``: one page, ``{"logs": [...], "next_cursor": ...}``,
+    - neither: every match as a JSON array, streamed rather than buffered.
+    """
+    since, until = _time_filters()
+    cursor = request.args.get('cursor')
+    records = audit_service.iter_query(
+        user_id=user_id,
+        partner_id=request.args.get('partner_id'),
+        since=since,
+        until=until,
+        after=decode_cursor(cursor) if cursor else None,
+    )
+
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(_ndjson_lines(records)), mimetype='application/x-ndjson')
+
+    if 'limit' in request.args or cursor:
+        limit = _parse_limit()
+        page = list(islice(records, limit + 1))
+        next_cursor = encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+        return jsonify({"logs": [record for _, record in page[:limit]], "next_cursor": next_cursor}), 200
+
+    return Response(stream_with_context(_json_array(records)), mimetype='application/json')
 
 @logs_bp.route('/logs', methods=['GET'])
 def get_audit_logs():
     try:
-        with open('backend/data/audit_logs.json') as f:
-            audit_logs = json.load(f)
-        return jsonify(audit_logs), 200
+        return _respond(request.args.get('user_id'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@logs_bp.route('/logs/stats', methods=['GET'])
+def get_audit_stats():
+    """
+    Access counts from the audit log's columnar snapshots, grouped by each
+    ``group_by`` dimension (partner, purpose, user, hour; repeat the
+    parameter or separate with commas, default all four) over
+    ``start_date``/``end_date``, widened to whole hours. ``partner_id``,
+    ``purpose`` and ``user_id`` filter; ``limit`` keeps the largest groups.
+    """
+    try:
+        group_by = [name for value in request.args.getlist('group_by') for name in value.split(',') if name]
+        since, until = _time_filters()
+        groups, total = audit_service.stats_query(
+            group_by or DIMENSIONS,
+            since=since,
+            until=until,
+            partner_id=request.args.get('partner_id'),
+            purpose=request.args.get('purpose'),
+            user_id=request.args.get('user_id'),
+            limit=_parse_limit() if 'limit' in request.args else None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"stats": groups, "total": total}), 200
+
 @logs_bp.route('/logs/<user_id>', methods=['GET'])
 def get_user_logs(user_id):
     try:
-        with open('backend/data/audit_logs.json') as f:
-            audit_logs = json.load(f)
-        
-        user_logs = [log for log in audit_logs if log['user_id'] == user_id]
-        return jsonify(user_logs), 200
+        return _respond(user_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+@logs_bp.route('/logs/decisions', methods=['GET'])
+def get_decision_summary():
+    """
+    Policy decision counts by partner, purpose and outcome, from the
+    in-memory rollup; ``granularity`` (minute, hour, day or total) splits
+    them by period. Covers the rollup's retention window and, with several
+    workers, the decisions the other workers have flushed.
+    """
+    try:
+        since, until = _time_filters()
+        decisions = decision_rollup.summary(
+            since=since,
+            until=until,
+            partner_id=request.args.get('partner_id'),
+            purpose=request.args.get('purpose'),
+            granularity=request.args.get('granularity', 'total'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"decisions": decisions, "total": sum(row["count"] for row in decisions)}), 200
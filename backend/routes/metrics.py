@@ -0,0 +1,32 @@
+import time
+from flask import Blueprint, Response, g, request
+from backend.utils.metrics import CONTENT_TYPE, registry
+
+metrics_bp = Blueprint('metrics', __name__)
+
+_request_seconds = registry.histogram(
+    'gateway_request_duration_seconds', 'Time to handle a gateway request, by route.', ('route',))
+_requests = registry.counter(
+    'gateway_requests_total', 'Gateway requests handled, by route and status code.', ('route', 'status'))
+
+def _route():
+    # The rule pattern, not the path, so /logs/<user_id> is one series.
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@metrics_bp.before_app_request
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+@metrics_bp.after_app_request
+def _record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = _route()
+        # Streamed responses are timed up to the start of the stream.
+        _request_seconds.labels(route).observe(time.perf_counter() - started)
+        _requests.labels(route, response.status_code).inc()
+    return response
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
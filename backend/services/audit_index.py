@@ -0,0 +1,184 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import threading
+
+# Locations are packed into a single 64-bit integer so posting lists can be
+# kept in compact, sorted ``array('q')`` buffers instead of lists of tuples.
+OFFSET_BITS = 40
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+def pack_location(location):
+    return (location[0] << OFFSET_BITS) | location[1]
+
+
+def unpack_location(packed):
+    return packed >> OFFSET_BITS, packed & OFFSET_MASK
+
+
+def encode_cursor(location):
+    """Returns an opaque pagination cursor pointing just past ``location``."""
+    return format(pack_location(location), 'x')
+
+
+def decode_cursor(cursor):
+    try:
+        packed = int(cursor, 16)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor.")
+    if packed < 0:
+        raise ValueError("Invalid cursor.")
+    return unpack_location(packed)
+
+
+class AuditIndex:
+    """
+    In-memory secondary indexes over a SegmentedAuditStore.
+
+    ``user_id`` and ``partner_id`` map to sorted posting lists of record
+    locations. Time is covered by a sparse zone map: records are grouped
+    into blocks of ``block_size`` in append order and each block keeps the
+    minimum and maximum timestamp it contains, so range queries skip whole
+    blocks without assuming timestamps are strictly ordered.
+    """
+
+    def __init__(self, block_size=256):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.by_user = {}
+        self.by_partner = {}
+        self._block_starts = array('q')
+        self._block_min = []
+        self._block_max = []
+        self._block_fill = 0
+        self.count = 0
+
+    def rebuild(self, records):
+        """
+        Rebuilds every index from ``(location, record)`` pairs.
+
+        :param records: Iterable such as ``SegmentedAuditStore.iter_records()``.
+        """
+        with self._lock:
+            self._reset()
+            for location, record in records:
+                self._add(pack_location(location), record)
+
+    def add(self, location, record):
+        with self._lock:
+            self._add(pack_location(location), record)
+
+    def _add(self, packed, record):
+        for index, key in ((self.by_user, record.get('user_id')), (self.by_partner, record.get('partner_id'))):
+            if key is None:
+                continue
+            postings = index.get(key)
+            if postings is None:
+                postings = index[key] = array('q')
+            postings.append(packed)
+        timestamp = record.get('timestamp') or ''
+        if self._block_fill == 0 or self._block_fill >= self.block_size:
+            self._block_starts.append(packed)
+            self._block_min.append(timestamp)
+            self._block_max.append(timestamp)
+            self._block_fill = 0
+        elif timestamp < self._block_min[-1]:
+            self._block_min[-1] = timestamp
+        elif timestamp > self._block_max[-1]:
+            self._block_max[-1] = timestamp
+        self._block_fill += 1
+        self.count += 1
+
+    def drop_segments(self, segment_ids):
+        """Forgets every location that lives in the given segments."""
+        dropped = set(segment_ids)
+        with self._lock:
+            for index in (self.by_user, self.by_partner):
+                for key in list(index):
+                    kept = array('q', (p for p in index[key] if (p >> OFFSET_BITS) not in dropped))
+                    if kept:
+                        index[key] = kept
+                    else:
+                        del index[key]
+            starts = self._block_starts
+            keep = [i for i, p in enumerate(starts) if (p >> OFFSET_BITS) not in dropped]
+            if len(keep) != len(starts):
+                # Dropped segments are always older than the kept ones, so the
+                # surviving blocks stay in append order. Blocks span segments:
+                # the last block starting in a dropped segment may run on into
+                # the first kept one, so it survives, clipped to start there.
+                # Its timestamp bounds may be wider than its records, which only
+                # costs a wasted read.
+                first_kept = (max(dropped) + 1) << OFFSET_BITS
+                spanning = not keep or starts[keep[0]] > first_kept
+                if spanning:
+                    keep.insert(0, keep[0] - 1 if keep else len(starts) - 1)
+                self._block_starts = array('q', (starts[i] for i in keep))
+                if spanning:
+                    self._block_starts[0] = first_kept
+                self._block_min = [self._block_min[i] for i in keep]
+                self._block_max = [self._block_max[i] for i in keep]
+
+    def _matching_blocks(self, since, until):
+        return [
+            i for i in range(len(self._block_starts))
+            if (since is None or self._block_max[i] >= since)
+            and (until is None or self._block_min[i] <= until)
+        ]
+
+    def time_ranges(self, since=None, until=None):
+        """
+        Returns ``(start, stop)`` location ranges that may hold records in the
+        given time window; ``stop`` is None for the still-growing last block.
+        Adjacent matching blocks are merged into one range.
+        """
+        with self._lock:
+            blocks = self._matching_blocks(since, until)
+            starts = self._block_starts
+            ranges = []
+            for i in blocks:
+                start = starts[i]
+                stop = starts[i + 1] if i + 1 < len(starts) else None
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1][1] = stop
+                else:
+                    ranges.append([start, stop])
+        return [
+            (unpack_location(start), unpack_location(stop) if stop is not None else None)
+            for start, stop in ranges
+        ]
+
+    def lookup(self, user_id=None, partner_id=None, since=None, until=None):
+        """
+        Returns the sorted candidate locations for a user and/or partner query,
+        narrowed to blocks overlapping the time window. Candidates still need
+        their timestamps checked. Returns None when neither key is given.
+        """
+        with self._lock:
+            postings = []
+            for index, key in ((self.by_user, user_id), (self.by_partner, partner_id)):
+                if key is not None:
+                    postings.append(index.get(key, array('q')))
+            if not postings:
+                return None
+            postings.sort(key=len)
+            candidates = postings[0]
+            if len(postings) > 1:
+                other = postings[1]
+                candidates = [p for p in candidates if _contains(other, p)]
+            else:
+                candidates = list(candidates)
+            if since is not None or until is not None:
+                blocks = self._matching_blocks(since, until)
+                starts = self._block_starts
+                allowed = set(blocks)
+                candidates = [p for p in candidates if bisect_right(starts, p) - 1 in allowed]
+        return [unpack_location(p) for p in candidates]
+
+
+def _contains(sorted_array, value):
+    i = bisect_left(sorted_array, value)
+    return i < len(sorted_array) and sorted_array[i] == value
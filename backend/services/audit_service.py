@@ -1,18 +1,86 @@
+from bisect import bisect_right
 from datetime import datetime
-import json
+import logging
 import os
+import threading
+
+from backend.config import Config
+from backend.services.audit_index import AuditIndex
+from backend.services.audit_stats import AuditStats
+from backend.services.audit_store import SegmentedAuditStore, migrate_legacy_log
+from backend.services.audit_writer import BatchWriter
+from backend.utils.metrics import registry, stage_timer
+
+_write_seconds = stage_timer('audit_write')
+_write_batch_seconds = stage_timer('audit_write_batch')
+_flush_seconds = stage_timer('audit_flush')
+_entries = registry.counter('audit_entries_total', 'Audit log entries submitted for writing.')
+
+logger = logging.getLogger(__name__)
 
 class AuditService:
-    def __init__(self, audit_log_file='backend/data/audit_logs.json'):
-        self.audit_log_file = audit_log_file
-        self.ensure_audit_log_exists()
+    def __init__(self, audit_log_dir=None, legacy_log_file=None, store=None, async_writes=None):
+        self.audit_log_dir = audit_log_dir or Config.AUDIT_LOG_DIR
+        self.legacy_log_file = legacy_log_file or Config.AUDIT_LEGACY_LOG_FILE
+        self.store = store or self._create_store()
+        self.index = AuditIndex()
+        self.stats = AuditStats(snapshot_size=Config.AUDIT_STATS_SNAPSHOT_SIZE)
+        self.index.rebuild(self._count_records(self.store.iter_records()))
+        for listener in (self.index, self.stats):
+            self.store.add_listener(listener.add)
+            self.store.add_drop_listener(listener.drop_segments)
+        if async_writes is None:
+            async_writes = Config.AUDIT_ASYNC_WRITES
+        self.writer = self._create_writer() if async_writes else None
+
+    def _count_records(self, records):
+        # Feeds the stats from the scan that rebuilds the index, so startup reads the log once.
+        for location, record in records:
+            self.stats.add(location, record)
+            yield location, record
+
+    def _create_store(self):
+        retention_seconds = Config.AUDIT_RETENTION_DAYS * 86400 if Config.AUDIT_RETENTION_DAYS else None
+        return SegmentedAuditStore(
+            self.audit_log_dir,
+            max_segment_bytes=Config.AUDIT_SEGMENT_MAX_BYTES,
+            max_segment_age=Config.AUDIT_SEGMENT_MAX_AGE,
+            compress_closed=Config.AUDIT_COMPRESS_SEGMENTS,
+            retention_segments=Config.AUDIT_RETENTION_SEGMENTS,
+            retention_seconds=retention_seconds,
+            fsync=Config.AUDIT_FSYNC,
+            multi_process=Config.AUDIT_MULTI_PROCESS,
+        )
+
+    def _create_writer(self):
+        return BatchWriter(
+            self._append_batch,
+            max_queue=Config.AUDIT_QUEUE_SIZE,
+            batch_size=Config.AUDIT_BATCH_SIZE,
+            flush_interval=Config.AUDIT_FLUSH_INTERVAL,
+            overflow=Config.AUDIT_OVERFLOW_POLICY,
+            block_timeout=Config.AUDIT_BLOCK_TIMEOUT,
+            name='audit-writer',
+        )
 
-    def ensure_audit_log_exists(self):
-        if not os.path.exists(self.audit_log_file):
-            with open(self.audit_log_file, 'w') as f:
-                json.dump([], f)
+    def _append_batch(self, log_entries):
+        # Runs on the writer thread; times the store write off the request path.
+        with _flush_seconds.time():
+            return self.store.append_many(log_entries)
 
-    def log_access(self, user_id, partner_id, purpose, data_accessed):
+    def migrate_legacy_log(self):
+        """
+        Folds entries written by earlier releases, which live in a single JSON
+        array, into the segmented store. Run once per deployment by
+        scripts/migrate_audit_logs.py; starting the service never migrates.
+
+        :return: Number of migrated entries.
+        """
+        if not self.legacy_log_file or not os.path.exists(self.legacy_log_file):
+            return 0
+        return migrate_legacy_log(self.legacy_log_file, self.store)
+
+    def log_access(self, user_id, partner_id, purpose, data_accessed, policy_version=None):
         log_entry = {
             "timestamp": datetime.utcnow().isoformat(),
             "user_id": user_id,
@@ -20,15 +88,140 @@ class AuditService:
             "purpose": purpose,
             "data_accessed": data_accessed
         }
-        self.append_log_entry(log_entry)
+        if policy_version is not None:
+            log_entry["policy_version"] = policy_version
+        with _write_seconds.time():
+            self.append_log_entry(log_entry)
+
+    def log_access_batch(self, accesses, policy_version=None):
+        """
+        Records many accesses with one append.
+
+        :param accesses: Iterable of ``(user_id, partner_id, purpose, data_accessed)``.
+        """
+        timestamp = datetime.utcnow().isoformat()
+        log_entries = []
+        for user_id, partner_id, purpose, data_accessed in accesses:
+            log_entry = {
+                "timestamp": timestamp,
+                "user_id": user_id,
+                "partner_id": partner_id,
+                "purpose": purpose,
+                "data_accessed": data_accessed
+            }
+            if policy_version is not None:
+                log_entry["policy_version"] = policy_version
+            log_entries.append(log_entry)
+        with _write_batch_seconds.time():
+            self.append_log_entries(log_entries)
+
+    def append_log_entries(self, log_entries):
+        _entries.inc(len(log_entries))
+        if self.writer is not None:
+            return self.writer.submit_many(log_entries)
+        return self.store.append_many(log_entries)
 
     def append_log_entry(self, log_entry):
-        with open(self.audit_log_file, 'r+') as f:
-            logs = json.load(f)
-            logs.append(log_entry)
-            f.seek(0)
-            json.dump(logs, f, indent=4)
+        _entries.inc()
+        if self.writer is not None:
+            return self.writer.submit(log_entry)
+        return self.store.append(log_entry)
+
+    def flush(self):
+        """Waits until every queued entry has reached the store."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def _sync(self):
+        # Other processes sharing the store may have appended since; index their entries first.
+        if self.store.multi_process:
+            self.store.sync()
+
+    def iter_audit_logs(self):
+        self._sync()
+        for _, log_entry in self.store.iter_records():
+            yield log_entry
 
     def get_audit_logs(self):
-        with open(self.audit_log_file, 'r') as f:
-            return json.load(f)
\ No newline at end of file
+        return list(self.iter_audit_logs())
+
+    def query(self, user_id=None, partner_id=None, since=None, until=None):
+        """
+        Returns audit entries matching every given filter, in append order.
+        See ``iter_query`` for the filter semantics.
+        """
+        return [record for _, record in self.iter_query(user_id, partner_id, since, until)]
+
+    def iter_query(self, user_id=None, partner_id=None, since=None, until=None, after=None):
+        """
+        Lazily yields ``(location, record)`` pairs matching every given filter,
+        in append order. User and partner filters are answered from the
+        posting lists and time filters from the block index, so only
+        candidate records are read.
+
+        :param since: Inclusive lower bound as an ISO 8601 UTC timestamp.
+        :param until: Inclusive upper bound as an ISO 8601 UTC timestamp.
+        :param after: Location to resume from; only later records are yielded.
+        """
+        self._sync()
+        locations = self.index.lookup(user_id=user_id, partner_id=partner_id, since=since, until=until)
+        if locations is not None:
+            if after is not None:
+                locations = locations[bisect_right(locations, after):]
+            records = self.store.read_locations(locations)
+        elif since is not None or until is not None:
+            records = self._iter_time_ranges(since, until, after)
+        else:
+            records = self.store.iter_records(start=after)
+        for location, record in records:
+            if after is not None and location <= after:
+                continue
+            timestamp = record.get('timestamp', '')
+            if (since is None or timestamp >= since) and (until is None or timestamp <= until):
+                yield location, record
+
+    def _iter_time_ranges(self, since, until, after):
+        for start, stop in self.index.time_ranges(since, until):
+            if after is not None:
+                if stop is not None and stop <= after:
+                    continue
+                start = max(start, after)
+            yield from self.store.iter_records(start=start, stop=stop)
+
+    def stats_query(self, group_by, since=None, until=None, partner_id=None, purpose=None, user_id=None,
+                    limit=None):
+        """
+        Access counts by partner, purpose, user and/or hour from the
+        incrementally maintained snapshots. See ``AuditStats.query``.
+        """
+        self._sync()
+        return self.stats.query(group_by, since=since, until=until, partner_id=partner_id, purpose=purpose,
+                                user_id=user_id, limit=limit)
+
+    def compact(self):
+        return self.store.compact()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.store.close()
+
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+def get_audit_service():
+    """
+    Returns the process-wide AuditService. The segmented store tracks the
+    active segment's size in memory, so every writer in a process must share
+    the same instance.
+    """
+    global _default_service
+    if _default_service is None:
+        with _default_service_lock:
+            if _default_service is None:
+                _default_service = AuditService()
+                if _default_service.legacy_log_file and os.path.exists(_default_service.legacy_log_file):
+                    logger.warning("Legacy audit log %s has not been migrated; run scripts/migrate_audit_logs.py",
+                                   _default_service.legacy_log_file)
+    return _default_service
@@ -0,0 +1,312 @@
+from array import array
+from datetime import datetime
+import threading
+
+DIMENSIONS = ('partner', 'purpose', 'user', 'hour')
+# Record field behind each dictionary-encoded dimension.
+_FIELDS = {'partner': 'partner_id', 'purpose': 'purpose', 'user': 'user_id'}
+_DELTA_KEYS = ('hour', 'partner', 'purpose', 'user', 'segment')
+# Snapshot tables by name: the group keys, time column first. Each keeps the
+# segment so retention can drop rows. A query reads the smallest table that
+# has the dimensions it groups and filters on.
+_TABLES = {
+    'detail': ('hour', 'partner', 'purpose', 'user', 'segment'),
+    'summary': ('hour', 'partner', 'purpose', 'segment'),
+    'daily': ('day', 'partner', 'purpose', 'segment'),
+    'hourly': ('hour', 'segment'),
+}
+_EPOCH = datetime(1970, 1, 1)
+# Hour of records whose timestamp is missing or unparseable; sorts before every real hour.
+_NO_HOUR = -1
+
+
+def _numpy():
+    # NumPy is only needed once counts are snapshotted or queried, not to
+    # import or start the audit service.
+    import numpy
+    return numpy
+
+
+def hour_of(timestamp):
+    """Returns whole hours since the Unix epoch for an ISO 8601 UTC timestamp, or None."""
+    try:
+        return int((datetime.fromisoformat(timestamp[:13]) - _EPOCH).total_seconds()) // 3600
+    except (TypeError, ValueError):
+        return None
+
+
+def _group(keys, columns):
+    """Sums ``count`` per distinct combination of ``keys``, sorted by the keys (time first)."""
+    np = _numpy()
+    # lexsort orders by its last key first.
+    order = np.lexsort([columns[key] for key in reversed(keys)])
+    ordered = {key: columns[key][order] for key in keys}
+    starts = np.zeros(len(order), dtype=bool)
+    starts[:1] = True
+    for key in keys:
+        starts[1:] |= ordered[key][1:] != ordered[key][:-1]
+    starts = np.flatnonzero(starts)
+    grouped = {key: ordered[key][starts] for key in keys}
+    grouped['count'] = np.add.reduceat(columns['count'][order], starts) if len(starts) else columns['count'][:0]
+    return grouped
+
+
+def _merge(table, keys, delta):
+    np = _numpy()
+    # Rows before the delta's earliest time cannot share a group with it and
+    # are kept as they are.
+    cut = int(np.searchsorted(table[keys[0]], delta[keys[0]].min(), side='left'))
+    tail = _group(keys, {key: np.concatenate([table[key][cut:], delta[key]]) for key in keys + ('count',)})
+    return {key: np.concatenate([table[key][:cut], tail[key]]) for key in keys + ('count',)}
+
+
+def _slice(table, time_key, low, high):
+    """Rows of a time-sorted table with ``low <= time <= high``; None leaves that side open."""
+    np = _numpy()
+    times = table[time_key]
+    start = int(np.searchsorted(times, low, side='left')) if low is not None else 0
+    stop = int(np.searchsorted(times, high, side='right')) if high is not None else len(times)
+    return {key: column[start:stop] for key, column in table.items()}
+
+
+def _filter(columns, mask):
+    return {key: column[mask] for key, column in columns.items()} if mask is not None else columns
+
+
+class AuditStats:
+    """
+    Access counts over the audit log by partner, purpose, user and hour.
+
+    Appended records go to a delta of dictionary-encoded ``array('q')``
+    columns, a few dictionary lookups per record. Every ``snapshot_size``
+    records the delta is folded into columnar snapshots: NumPy arrays of
+    counts per ``(hour, partner, purpose, user, segment)``, per the same
+    without ``user``, per ``(day, partner, purpose, segment)`` and per
+    ``(hour, segment)``, each sorted by time. Records arrive roughly in time
+    order, so a fold only regroups the snapshot rows from the delta's
+    earliest hour onwards.
+
+    For each grouped dimension a query binary-searches the smallest snapshot
+    that has the dimensions it needs for its window (whole days from the
+    daily table, the partial days at either end from an hourly one), filters
+    and sums with vectorized NumPy over the dense codes, and adds the delta;
+    the JSON log is never rescanned.
+    """
+
+    def __init__(self, snapshot_size=50000):
+        self.snapshot_size = snapshot_size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._codes = {dimension: {} for dimension in _FIELDS}
+        self._values = {dimension: [] for dimension in _FIELDS}
+        self._hours = {}
+        self._delta = {key: array('q') for key in _DELTA_KEYS}
+        self._tables = None
+        self.count = 0
+
+    def rebuild(self, records):
+        """
+        Rebuilds the counts from ``(location, record)`` pairs.
+
+        :param records: Iterable such as ``SegmentedAuditStore.iter_records()``.
+        """
+        with self._lock:
+            self._reset()
+            for location, record in records:
+                self._add(location, record)
+                if len(self._delta['hour']) >= self.snapshot_size:
+                    self._fold()
+
+    def add(self, location, record):
+        with self._lock:
+            self._add(location, record)
+            if len(self._delta['hour']) >= self.snapshot_size:
+                self._fold()
+
+    def _encode(self, dimension, value):
+        codes = self._codes[dimension]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self._values[dimension].append(value)
+        return code
+
+    def _hour(self, timestamp):
+        prefix = timestamp[:13] if isinstance(timestamp, str) else None
+        hour = self._hours.get(prefix)
+        if hour is None:
+            hour = hour_of(prefix) if prefix else None
+            hour = self._hours[prefix] = _NO_HOUR if hour is None else hour
+        return hour
+
+    def _add(self, location, record):
+        delta = self._delta
+        delta['hour'].append(self._hour(record.get('timestamp')))
+        delta['partner'].append(self._encode('partner', record.get('partner_id')))
+        delta['purpose'].append(self._encode('purpose', record.get('purpose')))
+        delta['user'].append(self._encode('user', record.get('user_id')))
+        delta['segment'].append(location[0])
+        self.count += 1
+
+    def snapshot(self):
+        """Folds pending records into the columnar snapshots now."""
+        with self._lock:
+            self._fold()
+
+    def _delta_columns(self):
+        np = _numpy()
+        columns = {key: np.array(self._delta[key], dtype=np.int64) for key in _DELTA_KEYS}
+        columns['day'] = columns['hour'] // 24
+        columns['count'] = np.ones(len(columns['hour']), dtype=np.int64)
+        return columns
+
+    def _fold(self):
+        np = _numpy()
+        if self._tables is None:
+            self._tables = {name: {key: np.empty(0, dtype=np.int64) for key in keys + ('count',)}
+                            for name, keys in _TABLES.items()}
+        if not self._delta['hour']:
+            return
+        delta = self._delta_columns()
+        self._delta = {key: array('q') for key in _DELTA_KEYS}
+        # Snapshots are replaced, never modified, so queries read them outside the lock.
+        self._tables = {name: _merge(self._tables[name], keys, delta) for name, keys in _TABLES.items()}
+
+    def drop_segments(self, segment_ids):
+        """Forgets the counts of records in segments removed by retention."""
+        np = _numpy()
+        dropped = np.array(sorted(segment_ids), dtype=np.int64)
+        with self._lock:
+            self._fold()
+            self._tables = {name: _filter(table, ~np.isin(table['segment'], dropped))
+                            for name, table in self._tables.items()}
+            self.count = int(self._tables['detail']['count'].sum())
+
+    def query(self, group_by=DIMENSIONS, since=None, until=None, partner_id=None, purpose=None, user_id=None,
+              limit=None):
+        """
+        Counts the audit records matching every given filter, grouped by
+        each dimension in ``group_by``.
+
+        :param group_by: Any of ``partner``, ``purpose``, ``user`` and ``hour``.
+        :param since: Inclusive ISO 8601 UTC lower bound, widened to the start of its hour.
+        :param until: Inclusive ISO 8601 UTC upper bound, widened to the end of its hour.
+        :param limit: Keep only the ``limit`` largest groups (the latest hours for ``hour``).
+        :return: Tuple of ``{dimension: [{dimension: value, "count": n}, ...]}``,
+                 ordered by count, highest first (by hour for ``hour``), and
+                 the number of matching records.
+        """
+        for dimension in group_by:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Invalid group_by: must be any of {list(DIMENSIONS)}.")
+        low = hour_of(since) if since else None
+        high = hour_of(until) if until else None
+        if (since and low is None) or (until and high is None):
+            raise ValueError("Invalid window: start and end must be ISO 8601 timestamps.")
+        if high is not None and low is None:
+            # Records without a timestamp fall outside every window.
+            low = 0
+        filters = {'partner': partner_id, 'purpose': purpose, 'user': user_id}
+
+        with self._lock:
+            if self._tables is None:
+                self._fold()
+            tables = self._tables
+            delta = self._delta_columns()
+            codes = {dimension: self._codes[dimension].get(value, -1)
+                     for dimension, value in filters.items() if value is not None}
+            sizes = {dimension: len(self._values[dimension]) for dimension in _FIELDS}
+            values = {dimension: self._values[dimension] for dimension in group_by if dimension in _FIELDS}
+
+        np = _numpy()
+        in_window = None
+        if low is not None:
+            in_window = delta['hour'] >= low
+        if high is not None:
+            in_window = delta['hour'] <= high if in_window is None else in_window & (delta['hour'] <= high)
+        delta = self._match(_filter(delta, in_window), codes)
+
+        total = len(delta['count']) + sum(int(part['count'].sum())
+                                          for part in self._plan(tables, None, low, high, codes))
+        groups = {}
+        for dimension in group_by:
+            parts = self._plan(tables, dimension, low, high, codes) + [delta]
+            if dimension == 'hour':
+                groups[dimension] = self._count_hours(parts, limit)
+                continue
+            counts = np.zeros(sizes[dimension], dtype=np.int64)
+            for part in parts:
+                counts += np.bincount(part[dimension], weights=part['count'],
+                                      minlength=sizes[dimension]).astype(np.int64)
+            found = np.flatnonzero(counts)
+            # Highest count first, ties in first-seen order.
+            found = found[np.argsort(-counts[found], kind='stable')]
+            if limit is not None:
+                found = found[:limit]
+            groups[dimension] = [{dimension: values[dimension][code], "count": int(counts[code])}
+                                 for code in found.tolist()]
+        return groups, total
+
+    def _plan(self, tables, dimension, low, high, codes):
+        """
+        Selects the snapshot rows in hours ``[low, high]`` that match
+        ``codes`` from the smallest tables that have ``dimension`` (None for
+        just the count) and the filtered dimensions.
+        """
+        needed = set(codes)
+        if dimension is not None:
+            needed.add(dimension)
+        if 'user' in needed:
+            return [self._match(_slice(tables['detail'], 'hour', low, high), codes)]
+        if needed == {'hour'}:
+            return [_slice(tables['hourly'], 'hour', low, high)]
+        first_day = -(-low // 24) if low is not None else None
+        last_day = (high + 1) // 24 - 1 if high is not None else None
+        if 'hour' in needed or (first_day is not None and last_day is not None and first_day > last_day):
+            return [self._match(_slice(tables['summary'], 'hour', low, high), codes)]
+        # Whole days come from the daily table and the hours either side of
+        # them from the hourly one.
+        parts = [self._match(_slice(tables['daily'], 'day', first_day, last_day), codes)]
+        if low is not None and low < first_day * 24:
+            parts.append(self._match(_slice(tables['summary'], 'hour', low, first_day * 24 - 1), codes))
+        if high is not None and high > last_day * 24 + 23:
+            parts.append(self._match(_slice(tables['summary'], 'hour', last_day * 24 + 24, high), codes))
+        return parts
+
+    @staticmethod
+    def _match(columns, codes):
+        mask = None
+        for dimension, code in codes.items():
+            match = columns[dimension] == code
+            mask = match if mask is None else mask & match
+        return _filter(columns, mask)
+
+    @staticmethod
+    def _count_hours(parts, limit):
+        np = _numpy()
+        untimed = 0
+        timed = []
+        for part in parts:
+            hours = part['hour']
+            missing = hours == _NO_HOUR
+            if missing.any():
+                untimed += int(part['count'][missing].sum())
+                hours, weights = hours[~missing], part['count'][~missing]
+            else:
+                weights = part['count']
+            if len(hours):
+                timed.append((hours, weights))
+        groups = [{"hour": None, "count": untimed}] if untimed else []
+        if timed:
+            first = min(int(hours.min()) for hours, _ in timed)
+            last = max(int(hours.max()) for hours, _ in timed)
+            counts = np.zeros(last - first + 1, dtype=np.int64)
+            for hours, weights in timed:
+                counts += np.bincount(hours - first, weights=weights, minlength=len(counts)).astype(np.int64)
+            found = np.flatnonzero(counts)
+            starts = np.datetime_as_string((found + first).astype('datetime64[h]'), unit='s')
+            groups.extend({"hour": start, "count": count}
+                          for start, count in zip(starts.tolist(), counts[found].tolist()))
+        return groups[-limit:] if limit is not None else groups
@@ -0,0 +1,409 @@
+from contextlib import contextmanager
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.ndjson'
+COMPRESSED_SUFFIX = '.ndjson.gz'
+LOCK_FILE = '.lock'
+
+
+class SegmentedAuditStore:
+    """
+    Append-only audit log stored as newline-delimited JSON segment files.
+
+    Records are appended to a single active segment. Once it grows past
+    ``max_segment_bytes`` or ``max_segment_age`` seconds it is closed,
+    optionally gzip-compressed, and a new segment is started. Each record is
+    addressed by a ``(segment_id, offset)`` location, where ``offset`` is the
+    byte offset of the record in the uncompressed segment.
+
+    With ``multi_process`` several processes may append to the same
+    directory: writes, rotation and retention run under an ``flock`` on the
+    directory's lock file, and each process first catches up with what the
+    others appended, passing those records to its listeners too, so every
+    process's offsets and indexes cover the whole log. ``sync`` catches up
+    without writing.
+    """
+
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024, max_segment_age=None,
+                 compress_closed=False, retention_segments=None, retention_seconds=None,
+                 fsync=False, multi_process=False):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.compress_closed = compress_closed
+        self.retention_segments = retention_segments
+        self.retention_seconds = retention_seconds
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._drop_listeners = []
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = None
+        self._lock_depth = 0
+        if multi_process:
+            import fcntl
+            self._fcntl = fcntl
+            self._lock_file = open(os.path.join(self.directory, LOCK_FILE), 'ab')
+        self._segments = {}
+        self._active_id = None
+        self._active_file = None
+        self._active_size = 0
+        self._active_opened = 0.0
+        with self._exclusive(sync=False):
+            self._segments = self._discover_segments()
+            self._open_active()
+
+    @property
+    def multi_process(self):
+        return self._lock_file is not None
+
+    @contextmanager
+    def _exclusive(self, sync=True):
+        """
+        Holds the store lock and, for a multi-process store, the directory
+        lock, after catching up with other processes' appends.
+        """
+        with self._lock:
+            if self._lock_file is None:
+                yield
+                return
+            if self._lock_depth == 0:
+                self._fcntl.flock(self._lock_file.fileno(), self._fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                if sync and self._lock_depth == 1:
+                    self._catch_up()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    self._fcntl.flock(self._lock_file.fileno(), self._fcntl.LOCK_UN)
+
+    def sync(self):
+        """Catches up with records other processes appended to a multi-process store."""
+        with self._exclusive():
+            pass
+
+    def _catch_up(self):
+        segments = self._discover_segments()
+        dropped = [segment_id for segment_id in self._segments if segment_id not in segments]
+        # Only closed segments are ever removed, so ours is still listed.
+        segments.setdefault(self._active_id, False)
+        newest = next(reversed(segments))
+        self._segments = segments
+        if dropped:
+            for listener in self._drop_listeners:
+                listener(dropped)
+        if newest == self._active_id and os.fstat(self._active_file.fileno()).st_size == self._active_size:
+            return
+        for segment_id in [segment_id for segment_id in segments if segment_id >= self._active_id]:
+            first_offset = self._active_size if segment_id == self._active_id else 0
+            if self._listeners:
+                try:
+                    handle = self._open_segment(segment_id)
+                except FileNotFoundError:
+                    continue
+                with handle:
+                    for location, record in self._iter_segment(handle, segment_id, first_offset, None):
+                        for listener in self._listeners:
+                            listener(location, record)
+        if newest != self._active_id:
+            self._active_file.close()
+            self._active_id = newest
+            self._active_file = open(self._segment_path(newest), 'ab')
+            self._active_opened = time.time()
+        self._active_size = self._active_file.seek(0, os.SEEK_END)
+
+    # Segment bookkeeping
+
+    def _segment_path(self, segment_id, compressed=False):
+        suffix = COMPRESSED_SUFFIX if compressed else SEGMENT_SUFFIX
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment_id:08d}{suffix}")
+
+    def _discover_segments(self):
+        segments = {}
+        for name in os.listdir(self.directory):
+            if not name.startswith(SEGMENT_PREFIX):
+                continue
+            if name.endswith(COMPRESSED_SUFFIX):
+                compressed, stem = True, name[len(SEGMENT_PREFIX):-len(COMPRESSED_SUFFIX)]
+            elif name.endswith(SEGMENT_SUFFIX):
+                compressed, stem = False, name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+            else:
+                continue
+            if stem.isdigit():
+                segment_id = int(stem)
+                # A plain file wins over a compressed copy left behind by an
+                # interrupted compression.
+                if not compressed or segment_id not in segments:
+                    segments[segment_id] = compressed
+        return dict(sorted(segments.items()))
+
+    def _open_active(self):
+        if self._segments:
+            last_id = next(reversed(self._segments))
+            if not self._segments[last_id]:
+                self._active_id = last_id
+            else:
+                self._active_id = last_id + 1
+        else:
+            self._active_id = 1
+        self._segments[self._active_id] = False
+        path = self._segment_path(self._active_id)
+        self._active_file = open(path, 'ab')
+        self._active_size = self._active_file.tell()
+        self._active_opened = time.time()
+
+    def segment_ids(self):
+        with self._lock:
+            return list(self._segments)
+
+    def add_listener(self, listener):
+        """
+        Registers a callable invoked as ``listener(location, record)`` for every
+        appended record.
+        """
+        self._listeners.append(listener)
+
+    def add_drop_listener(self, listener):
+        """
+        Registers a callable invoked as ``listener(segment_ids)`` whenever
+        segments are removed by retention.
+        """
+        self._drop_listeners.append(listener)
+
+    # Writes
+
+    @staticmethod
+    def _encode(record):
+        return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+    def _should_rotate(self):
+        if self._active_size == 0:
+            return False
+        if self.max_segment_bytes and self._active_size >= self.max_segment_bytes:
+            return True
+        if self.max_segment_age and time.time() - self._active_opened >= self.max_segment_age:
+            return True
+        return False
+
+    def append(self, record):
+        return self.append_many([record])[0]
+
+    def append_many(self, records):
+        """
+        Appends records with a single write and returns their locations.
+
+        :param records: Iterable of JSON-serialisable dictionaries.
+        :return: List of ``(segment_id, offset)`` tuples, one per record.
+        """
+        records = list(records)
+        if not records:
+            return []
+        encoded = [self._encode(record) for record in records]
+        with self._exclusive():
+            if self._should_rotate():
+                self.rotate()
+            locations = []
+            offset = self._active_size
+            for line in encoded:
+                locations.append((self._active_id, offset))
+                offset += len(line)
+            self._active_file.write(b''.join(encoded))
+            self._active_file.flush()
+            if self.fsync:
+                os.fsync(self._active_file.fileno())
+            self._active_size = offset
+            for location, record in zip(locations, records):
+                for listener in self._listeners:
+                    listener(location, record)
+        return locations
+
+    def rotate(self):
+        """Closes the active segment and starts a new one."""
+        with self._exclusive():
+            closed_id = self._active_id
+            self._active_file.close()
+            if self._active_size == 0:
+                os.remove(self._segment_path(closed_id))
+                del self._segments[closed_id]
+            elif self.compress_closed:
+                self._compress_segment(closed_id)
+            self._segments[closed_id + 1] = False
+            self._open_active()
+            self._apply_retention()
+
+    def _compress_segment(self, segment_id):
+        source = self._segment_path(segment_id)
+        target = self._segment_path(segment_id, compressed=True)
+        tmp_target = target + '.tmp'
+        with open(source, 'rb') as src, gzip.open(tmp_target, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_target, target)
+        os.remove(source)
+        self._segments[segment_id] = True
+
+    def _apply_retention(self):
+        closed = [segment_id for segment_id in self._segments if segment_id != self._active_id]
+        expired = set()
+        if self.retention_segments is not None and len(closed) > self.retention_segments:
+            expired.update(closed[:len(closed) - self.retention_segments])
+        if self.retention_seconds:
+            cutoff = time.time() - self.retention_seconds
+            for segment_id in closed:
+                path = self._segment_path(segment_id, self._segments[segment_id])
+                if os.path.getmtime(path) < cutoff:
+                    expired.add(segment_id)
+        for segment_id in sorted(expired):
+            os.remove(self._segment_path(segment_id, self._segments.pop(segment_id)))
+        if expired:
+            for listener in self._drop_listeners:
+                listener(sorted(expired))
+        return sorted(expired)
+
+    def apply_retention(self):
+        """
+        Drops closed segments outside the retention window, as rotation does.
+
+        :return: List of removed segment ids.
+        """
+        with self._exclusive():
+            return self._apply_retention()
+
+    def compact(self):
+        """
+        Compresses closed segments that are still stored uncompressed and drops
+        segments outside the retention window.
+
+        :return: List of removed segment ids.
+        """
+        with self._exclusive():
+            for segment_id, compressed in list(self._segments.items()):
+                if segment_id != self._active_id and not compressed:
+                    self._compress_segment(segment_id)
+            return self._apply_retention()
+
+    def close(self):
+        with self._lock:
+            if self._active_file and not self._active_file.closed:
+                self._active_file.close()
+            if self._lock_file is not None and not self._lock_file.closed:
+                self._lock_file.close()
+
+    # Reads
+
+    def _open_segment(self, segment_id):
+        compressed = self._segments[segment_id]
+        path = self._segment_path(segment_id, compressed)
+        return gzip.open(path, 'rb') if compressed else open(path, 'rb')
+
+    def iter_records(self, start=None, stop=None):
+        """
+        Yields ``(location, record)`` pairs in append order.
+
+        :param start: Optional location; records before it are skipped.
+        :param stop: Optional location; iteration ends before it.
+        """
+        with self._lock:
+            segments = list(self._segments)
+            active_id, active_size = self._active_id, self._active_size
+        for segment_id in segments:
+            if start is not None and segment_id < start[0]:
+                continue
+            if stop is not None and segment_id > stop[0]:
+                return
+            limit = active_size if segment_id == active_id else None
+            first_offset = start[1] if start is not None and segment_id == start[0] else 0
+            try:
+                handle = self._open_segment(segment_id)
+            except (FileNotFoundError, KeyError):
+                # Dropped by retention while we were iterating.
+                continue
+            with handle:
+                for location, record in self._iter_segment(handle, segment_id, first_offset, limit):
+                    if stop is not None and location >= stop:
+                        return
+                    yield location, record
+
+    def read_locations(self, locations):
+        """
+        Yields ``(location, record)`` for each of the given locations, which
+        must be sorted. Plain segments are read with a seek per record;
+        compressed segments are streamed once per segment.
+        """
+        by_segment = {}
+        for location in locations:
+            by_segment.setdefault(location[0], []).append(location[1])
+        for segment_id, offsets in by_segment.items():
+            try:
+                handle = self._open_segment(segment_id)
+            except (FileNotFoundError, KeyError):
+                continue
+            with handle:
+                if isinstance(handle, gzip.GzipFile):
+                    wanted = set(offsets)
+                    last = offsets[-1]
+                    for location, record in self._iter_segment(handle, segment_id, offsets[0], None):
+                        if location[1] in wanted:
+                            yield location, record
+                        if location[1] >= last:
+                            break
+                else:
+                    for offset in offsets:
+                        handle.seek(offset)
+                        line = handle.readline()
+                        if line.endswith(b'\n'):
+                            yield (segment_id, offset), json.loads(line)
+
+    @staticmethod
+    def _iter_segment(handle, segment_id, first_offset, limit):
+        offset = 0
+        if first_offset and not isinstance(handle, gzip.GzipFile):
+            handle.seek(first_offset)
+            offset = first_offset
+        for line in handle:
+            line_offset = offset
+            offset += len(line)
+            if limit is not None and offset > limit:
+                break
+            if line_offset < first_offset or not line.endswith(b'\n'):
+                continue
+            yield (segment_id, line_offset), json.loads(line)
+
+
+def load_legacy_audit_logs(path):
+    """
+    Reads the pre-segment audit log format: a JSON array, or an object with an
+    ``audit_logs`` array.
+    """
+    with open(path, 'r') as f:
+        content = f.read().strip()
+    if not content:
+        return []
+    logs = json.loads(content)
+    if isinstance(logs, dict):
+        logs = logs.get('audit_logs', [])
+    return logs
+
+
+def migrate_legacy_log(path, store):
+    """
+    Copies entries from a legacy JSON audit file into the segmented store and
+    renames the file to ``<path>.migrated`` so it is not imported twice.
+
+    :return: Number of migrated entries.
+    """
+    # Under the store lock, so of several processes sharing the store only one migrates.
+    with store._exclusive():
+        if not os.path.exists(path):
+            return 0
+        logs = load_legacy_audit_logs(path)
+        store.append_many(logs)
+        os.replace(path, path + '.migrated')
+    return len(logs)
@@ -0,0 +1,131 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST)
+
+_STOP = object()
+
+
+class BatchWriter:
+    """
+    Background writer that moves log writes off the request thread.
+
+    Entries are queued in a bounded in-memory queue and handed to ``sink`` in
+    batches, so one write (and one fsync, if the sink does one) covers many
+    entries. A batch is flushed once it holds ``batch_size`` entries or the
+    oldest entry has waited ``flush_interval`` seconds.
+
+    When the queue is full, ``overflow`` decides what happens: ``block`` waits
+    up to ``block_timeout`` seconds for space and then drops the entry,
+    ``drop_newest`` drops the incoming entry and ``drop_oldest`` evicts the
+    oldest queued entry to make room.
+    """
+
+    def __init__(self, sink, max_queue=10000, batch_size=512, flush_interval=0.05,
+                 overflow=OVERFLOW_BLOCK, block_timeout=None, name='batch-writer'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow policy: must be one of {list(OVERFLOW_POLICIES)}.")
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.stats = {"submitted": 0, "written": 0, "dropped": 0, "batches": 0, "failed": 0}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, entry):
+        """
+        Queues an entry for writing.
+
+        :return: True if the entry was queued, False if it was dropped.
+        """
+        if self._closed:
+            raise RuntimeError("BatchWriter is closed")
+        self.stats["submitted"] += 1
+        if self.overflow == OVERFLOW_BLOCK:
+            try:
+                self._queue.put(entry, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                pass
+        elif self.overflow == OVERFLOW_DROP_NEWEST:
+            try:
+                self._queue.put_nowait(entry)
+                return True
+            except queue.Full:
+                pass
+        else:
+            while True:
+                try:
+                    self._queue.put_nowait(entry)
+                    return True
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        continue
+                    self._queue.task_done()
+                    self.stats["dropped"] += 1
+        self.stats["dropped"] += 1
+        return False
+
+    def submit_many(self, entries):
+        return [self.submit(entry) for entry in entries]
+
+    def flush(self):
+        """Blocks until every queued entry has been handed to the sink."""
+        self._queue.join()
+
+    def close(self, timeout=None):
+        """Stops accepting entries, drains the queue and stops the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._write(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        try:
+            self.sink(batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception:
+            self.stats["failed"] += len(batch)
+            logger.exception("Failed to write batch of %d entries", len(batch))
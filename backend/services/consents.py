@@ -0,0 +1,61 @@
+import json
+import os
+
+
+def iter_consent_file(consent_file):
+    """
+    Yields ``(user_id, granted_purposes)`` from a consent file: JSON Lines of
+    ``{"user_id": ..., "consent": {purpose: bool}}`` (as written by
+    ``scripts/generate_mock_data.py --consents-output``), or a JSON array of
+    the same objects. A missing file yields nothing.
+    """
+    if not consent_file or not os.path.exists(consent_file):
+        return
+    with open(consent_file, 'r') as file:
+        head = file.read(1)
+        while head and head.isspace():
+            head = file.read(1)
+        file.seek(0)
+        entries = json.load(file) if head == '[' else (json.loads(line) for line in file if line.strip())
+        for entry in entries:
+            granted = frozenset(purpose for purpose, given in entry.get('consent', {}).items() if given)
+            yield entry['user_id'], granted
+
+
+class ConsentIndex:
+    """In-memory map of each user's consented purposes."""
+
+    def __init__(self, consents=()):
+        self._granted = dict(consents)
+
+    def __len__(self):
+        return len(self._granted)
+
+    def allows(self, user_id, purpose):
+        """
+        Returns True if ``user_id`` consented to ``purpose``, False if not,
+        and None if the user has no consent record.
+        """
+        granted = self._granted.get(user_id)
+        return None if granted is None else purpose in granted
+
+    def changed_since(self, previous):
+        """Returns the ids of users whose consents differ from those in ``previous``."""
+        old, new = previous._granted, self._granted
+        changed = {user_id for user_id, granted in old.items() if new.get(user_id) != granted}
+        changed.update(user_id for user_id in new if user_id not in old)
+        return changed
+
+    @classmethod
+    def from_file(cls, consent_file):
+        return cls(iter_consent_file(consent_file))
+
+
+def changed_users(old, new):
+    """
+    Returns the ids of users whose consents differ between two consent
+    indexes of the same kind, or None when they cannot be compared.
+    """
+    if old is None or new is None or type(old) is not type(new):
+        return None
+    return new.changed_since(old)
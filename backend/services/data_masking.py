@@ -1,6 +1,42 @@
+from backend.config import Config
+from backend.services.masking_plan import MaskingPlan
+from backend.services.tokenization import Tokenizer, TokenVault
+from backend.utils.metrics import stage_timer
+
+_mask_seconds = stage_timer('masking')
+_mask_batch_seconds = stage_timer('masking_batch')
+_tokenize_seconds = stage_timer('tokenization')
+_tokenize_batch_seconds = stage_timer('tokenization_batch')
+
+
+def _numpy():
+    # numpy and pandas are only needed for columnar masking; import them on
+    # first use so the per-record path does not pay for them.
+    import numpy
+    return numpy
+
+
+def _is_dataframe(columns):
+    return type(columns).__name__ == 'DataFrame' and hasattr(columns, 'columns')
+
+
+def create_tokenizer():
+    """Builds the Tokenizer described by Config, with a token vault if one is configured."""
+    vault = TokenVault(Config.TOKEN_VAULT_FILE) if Config.TOKEN_VAULT_FILE else None
+    return Tokenizer(Config.TOKENIZATION_KEY, cache_size=Config.TOKENIZATION_CACHE_SIZE, vault=vault)
+
+
 class DataMaskingService:
-    def __init__(self):
-        pass
+    def __init__(self, tokenizer=None):
+        self._masks = {}
+        self._plans = {}
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = create_tokenizer()
+        return self._tokenizer
 
     def mask_data(self, data, fields_to_mask):
         """
@@ -10,11 +46,35 @@ class DataMaskingService:
         :param fields_to_mask: List of field names to be masked.
         :return: Dictionary with masked fields.
         """
-        masked_data = data.copy()
-        for field in fields_to_mask:
-            if field in masked_data:
-                masked_data[field] = self._mask_value(masked_data[field])
-        return masked_data
+        with _mask_seconds.time():
+            masked_data = data.copy()
+            for field in fields_to_mask:
+                if field in masked_data:
+                    masked_data[field] = self._mask_value(masked_data[field])
+            return masked_data
+
+    def compile_plan(self, paths):
+        """
+        Compiles field paths such as ``transaction_history[].description``
+        into a reusable MaskingPlan that masks values like ``mask_data``.
+        """
+        return MaskingPlan(paths, self._mask_value)
+
+    def mask_paths(self, data, paths):
+        """
+        Masks nested field paths in the provided data, compiling each
+        distinct set of paths only once.
+
+        :param data: Dictionary containing the data to be masked.
+        :param paths: List of field paths; ``[]`` matches every list element.
+        :return: The masked data; unchanged parts are shared with ``data``.
+        """
+        with _mask_seconds.time():
+            key = tuple(paths)
+            plan = self._plans.get(key)
+            if plan is None:
+                plan = self._plans[key] = self.compile_plan(key)
+            return plan.apply(data)
 
     def _mask_value(self, value):
         """
@@ -25,25 +85,139 @@ class DataMaskingService:
         """
         return '*' * len(value) if isinstance(value, str) else value
 
-    def tokenize_data(self, data):
+    def _mask_for_length(self, length):
+        mask = self._masks.get(length)
+        if mask is None:
+            mask = self._masks[length] = '*' * length
+        return mask
+
+    def mask_batch(self, records, fields_to_mask):
+        """
+        Masks the same fields in many records at once.
+
+        Equivalent to ``[mask_data(record, fields_to_mask) for record in
+        records]``, but masks one field across all records at a time and
+        reuses the mask string for each value length.
+
+        :param records: Iterable of dictionaries.
+        :param fields_to_mask: List of field names to be masked.
+        :return: List of new dictionaries with masked fields.
+        """
+        with _mask_batch_seconds.time():
+            masked_records = [record.copy() for record in records]
+            mask_for_length = self._mask_for_length
+            for field in fields_to_mask:
+                for masked in masked_records:
+                    value = masked.get(field)
+                    if isinstance(value, str):
+                        masked[field] = mask_for_length(len(value))
+            return masked_records
+
+    def mask_columns(self, columns, fields_to_mask):
+        """
+        Masks fields of a column set: a pandas DataFrame, or a dictionary
+        mapping field names to lists or NumPy arrays.
+
+        Each column is masked as a whole with NumPy; string values are
+        replaced exactly as ``mask_data`` would replace them and other values
+        are kept. The input is not modified.
+
+        :return: A new column set of the same kind.
+        """
+        with _mask_batch_seconds.time():
+            if _is_dataframe(columns):
+                masked = columns.copy(deep=False)
+                for field in fields_to_mask:
+                    if field in masked.columns:
+                        masked[field] = self._mask_series(masked[field])
+                return masked
+            masked = dict(columns)
+            for field in fields_to_mask:
+                if field in masked:
+                    values = masked[field]
+                    result = self._mask_array(values)
+                    masked[field] = result.tolist() if isinstance(values, list) else result
+            return masked
+
+    def _mask_array(self, values):
+        np = _numpy()
+        values = np.asarray(values, dtype=object)
+        is_str = np.frompyfunc(lambda value: isinstance(value, str), 1, 1)(values).astype(bool)
+        if not is_str.any():
+            return values.copy()
+        lengths = np.frompyfunc(len, 1, 1)(values[is_str]).astype(np.intp)
+        masked = values.copy()
+        masked[is_str] = self._mask_table(lengths.max())[lengths]
+        return masked
+
+    def _mask_series(self, series):
+        np = _numpy()
+        import pandas
+        from pandas.api.types import infer_dtype
+
+        if series.dtype.kind in 'biufcmM':
+            # Numeric, boolean and datetime columns hold no strings.
+            return series
+        if infer_dtype(series, skipna=True) != 'string':
+            return pandas.Series(self._mask_array(series.to_numpy(dtype=object)), index=series.index,
+                                 name=series.name)
+        lengths = series.str.len()
+        present = lengths.notna().to_numpy()
+        if not present.any():
+            return series
+        lengths = lengths.to_numpy()[present].astype(np.intp)
+        masked = series.copy()
+        masked[present] = self._mask_table(lengths.max())[lengths]
+        return masked
+
+    def _mask_table(self, max_length):
+        """Object array whose element ``n`` is the mask for a value of length ``n``."""
+        np = _numpy()
+        table = np.empty(max_length + 1, dtype=object)
+        table[:] = [self._mask_for_length(length) for length in range(max_length + 1)]
+        return table
+
+    def tokenize_data(self, data, fields_to_tokenize=None):
         """
         Tokenizes sensitive data fields.
 
         :param data: Dictionary containing the data to be tokenized.
+        :param fields_to_tokenize: List of field names; defaults to
+                                   ``Config.TOKENIZED_FIELDS``.
         :return: Dictionary with tokenized fields.
         """
-        # Implement tokenization logic here
-        tokenized_data = data.copy()
-        # Example: Replace sensitive fields with tokens
-        # tokenized_data['sensitive_field'] = generate_token(tokenized_data['sensitive_field'])
-        return tokenized_data
+        if fields_to_tokenize is None:
+            fields_to_tokenize = Config.TOKENIZED_FIELDS
+        with _tokenize_seconds.time():
+            tokenized_data = data.copy()
+            for field in fields_to_tokenize:
+                if field in tokenized_data:
+                    tokenized_data[field] = self.tokenizer.tokenize(tokenized_data[field])
+            return tokenized_data
+
+    def tokenize_batch(self, records, fields_to_tokenize=None):
+        """
+        Tokenizes the same fields in many records, one field at a time, so
+        each distinct value is tokenized once per batch.
+
+        :return: List of new dictionaries with tokenized fields.
+        """
+        if fields_to_tokenize is None:
+            fields_to_tokenize = Config.TOKENIZED_FIELDS
+        with _tokenize_batch_seconds.time():
+            tokenized_records = [record.copy() for record in records]
+            for field in fields_to_tokenize:
+                holders = [record for record in tokenized_records if field in record]
+                tokens = self.tokenizer.tokenize_many([record[field] for record in holders])
+                for record, token in zip(holders, tokens):
+                    record[field] = token
+            return tokenized_records
 
     def generate_token(self, value):
         """
         Generates a token for the given value.
 
         :param value: The value to be tokenized.
-        :return: A token representing the value.
+        :return: A deterministic, format-preserving token representing the value.
         """
-        # Implement token generation logic here
-        return f"token-{value}"  # Placeholder implementation
\ No newline at end of file
+        return self.tokenizer.tokenize(value)
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class DecisionCache:
+    """
+    Bounded TTL + LRU cache of policy decisions keyed by
+    ``(partner_id, user_id, purpose)``.
+
+    Entries expire ``ttl`` seconds after they are stored, and the least
+    recently used entry is evicted once ``maxsize`` is reached. Secondary
+    indexes by partner and by user let a policy or consent change drop only
+    the affected entries. Only decisions are cached, never tokens.
+
+    Every invalidation bumps ``generation``. Callers read it before computing
+    a decision and pass it to ``put``, which discards the value if an
+    invalidation happened in between, so a decision computed from a
+    superseded policy is never stored.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._by_partner = {}
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, partner_id, user_id, purpose):
+        key = (partner_id, user_id, purpose)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, partner_id, user_id, purpose, value, generation=None):
+        key = (partner_id, user_id, purpose)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                while len(self._entries) >= self.maxsize:
+                    oldest = next(iter(self._entries))
+                    self._remove(oldest)
+                    self.stats["evictions"] += 1
+                self._by_partner.setdefault(partner_id, set()).add(key)
+                self._by_user.setdefault(user_id, set()).add(key)
+            self._entries[key] = (value, self._clock() + self.ttl)
+
+    def _remove(self, key):
+        del self._entries[key]
+        for index, name in ((self._by_partner, key[0]), (self._by_user, key[1])):
+            keys = index.get(name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[name]
+
+    def _invalidate(self, index, name):
+        with self._lock:
+            self.generation += 1
+            keys = list(index.get(name, ()))
+            for key in keys:
+                self._remove(key)
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def invalidate_partner(self, partner_id):
+        """Drops every cached decision for ``partner_id``; returns the count."""
+        return self._invalidate(self._by_partner, partner_id)
+
+    def invalidate_user(self, user_id):
+        """Drops every cached decision for ``user_id``; returns the count."""
+        return self._invalidate(self._by_user, user_id)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._by_partner.clear()
+            self._by_user.clear()
@@ -0,0 +1,294 @@
+from collections import Counter, OrderedDict
+from datetime import datetime
+import atexit
+import logging
+import threading
+import time
+import uuid
+
+from backend.config import Config
+from backend.services.audit_store import SegmentedAuditStore
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = {"Policy approved": "approved", "Policy denied": "denied", "Policy not found": "no_policy"}
+GRANULARITIES = {'minute': 60, 'hour': 3600, 'day': 86400, 'total': None}
+
+
+def outcome_of(decision):
+    """
+    Maps a Decision or a bare allowed flag to ``approved``, ``denied`` or
+    ``no_policy``; a string is taken as the outcome itself.
+    """
+    if isinstance(decision, str):
+        return decision
+    if isinstance(decision, bool):
+        return "approved" if decision else "denied"
+    outcome = OUTCOMES.get(getattr(decision, 'reason', None))
+    if outcome is None:
+        outcome = "approved" if getattr(decision, 'allowed', False) else "denied"
+    return outcome
+
+
+def _iso(epoch_seconds):
+    return datetime.utcfromtimestamp(epoch_seconds).isoformat()
+
+
+def _epoch(timestamp):
+    return int((datetime.fromisoformat(timestamp) - datetime(1970, 1, 1)).total_seconds())
+
+
+class _Bucket:
+    __slots__ = ('start', 'counts', 'stored', 'flushed')
+
+    def __init__(self, start):
+        self.start = start
+        # Decisions recorded here, and rows loaded from the store; only
+        # ``counts`` is flushed. ``stored`` is replaced, never updated.
+        self.counts = Counter()
+        self.stored = Counter()
+        self.flushed = False
+
+
+class DecisionRollup:
+    """
+    Counts policy decisions per ``(partner_id, purpose, outcome)`` in
+    fixed-size time buckets (one minute by default).
+
+    ``record`` increments one counter under a lock, so logging a decision
+    costs the same whatever the traffic. A background thread writes each
+    bucket to ``sink`` as compact summary rows once the bucket has closed,
+    every ``flush_interval`` seconds; the last ``retention`` seconds of
+    buckets stay in memory for ``summary`` queries.
+
+    When several processes flush to one store, each tags its rows with its
+    ``origin`` and ``load`` skips its own. ``sync`` is called before each
+    summary to load the rows the others flushed since.
+    """
+
+    def __init__(self, sink=None, bucket_seconds=60, flush_interval=10.0, retention=24 * 3600, clock=time.time,
+                 origin=None, sync=None):
+        self.sink = sink
+        self.origin = origin
+        self.sync = sync
+        self.bucket_seconds = bucket_seconds
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "flushed_rows": 0, "failed_flushes": 0}
+        self._stop = threading.Event()
+        self._thread = None
+        if sink is not None and flush_interval:
+            self._thread = threading.Thread(target=self._run, name='decision-rollup', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _bucket(self, now):
+        start = int(now // self.bucket_seconds) * self.bucket_seconds
+        bucket = self._buckets.get(start)
+        if bucket is None:
+            late = bool(self._buckets) and next(reversed(self._buckets)) > start
+            bucket = self._buckets[start] = _Bucket(start)
+            if late:
+                # The clock stepped back, or older rows are being loaded; keep buckets in time order.
+                self._buckets = OrderedDict(sorted(self._buckets.items()))
+        return bucket
+
+    def _own_bucket(self, now):
+        bucket = self._bucket(now)
+        if bucket.flushed and not bucket.counts:
+            # It only held loaded rows; what is recorded now still needs flushing.
+            bucket.flushed = False
+        return bucket
+
+    def record(self, partner_id, purpose, outcome, count=1):
+        """Counts ``count`` decisions with ``outcome`` for one partner and purpose."""
+        now = self._clock()
+        with self._lock:
+            self._own_bucket(now).counts[(partner_id, purpose, outcome)] += count
+            self.stats["recorded"] += count
+
+    def record_many(self, partner_id, outcomes):
+        """Counts decisions for one partner from ``(purpose, outcome)`` pairs, in one locked update."""
+        counts = Counter(outcomes)
+        now = self._clock()
+        with self._lock:
+            bucket_counts = self._own_bucket(now).counts
+            for (purpose, outcome), count in counts.items():
+                bucket_counts[(partner_id, purpose, outcome)] += count
+            self.stats["recorded"] += sum(counts.values())
+
+    def load(self, rows):
+        """
+        Adds flushed summary rows, e.g. from the sink's store after a restart
+        or as other processes flush them. They are counted in summaries but
+        never flushed again.
+        """
+        oldest = self._clock() - self.retention
+        loaded = {}
+        for row in rows:
+            if self.origin is not None and row.get('origin') == self.origin:
+                continue
+            start = _epoch(row['minute'])
+            if start < oldest:
+                continue
+            counts = loaded.get(start)
+            if counts is None:
+                counts = loaded[start] = Counter()
+            counts[(row['partner_id'], row['purpose'], row['outcome'])] += row['count']
+        if not loaded:
+            return
+        with self._lock:
+            for start, counts in loaded.items():
+                bucket = self._bucket(start)
+                bucket.stored = bucket.stored + counts
+                if not bucket.counts:
+                    bucket.flushed = True
+
+    def flush(self, final=False):
+        """
+        Writes every closed, unflushed bucket to the sink (every bucket when
+        ``final``) and drops buckets past the retention window.
+
+        :return: Number of summary rows written.
+        """
+        now = self._clock()
+        current = int(now // self.bucket_seconds) * self.bucket_seconds
+        rows = []
+        flushed = []
+        with self._lock:
+            for start, bucket in self._buckets.items():
+                if start >= current and not final:
+                    break
+                if not bucket.flushed:
+                    minute = _iso(start)
+                    rows.extend(
+                        {"minute": minute, "partner_id": partner_id, "purpose": purpose, "outcome": outcome,
+                         "count": count}
+                        for (partner_id, purpose, outcome), count in bucket.counts.items()
+                    )
+                    flushed.append(bucket)
+            if self.origin is not None:
+                for row in rows:
+                    row["origin"] = self.origin
+        if rows and self.sink is not None:
+            try:
+                self.sink(rows)
+            except Exception:
+                self.stats["failed_flushes"] += 1
+                logger.exception("Failed to flush %d decision summary rows", len(rows))
+                return 0
+            self.stats["flushed_rows"] += len(rows)
+        with self._lock:
+            for bucket in flushed:
+                bucket.flushed = True
+            while self._buckets:
+                start = next(iter(self._buckets))
+                if start >= now - self.retention or not self._buckets[start].flushed:
+                    break
+                del self._buckets[start]
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def summary(self, since=None, until=None, partner_id=None, purpose=None, granularity='total'):
+        """
+        Aggregates the retained buckets.
+
+        :param since: Inclusive lower bound on the bucket start, as an ISO 8601 UTC timestamp.
+        :param until: Inclusive upper bound on the bucket start, as an ISO 8601 UTC timestamp.
+        :param granularity: ``minute``, ``hour``, ``day`` or ``total``.
+        :return: List of ``{"partner_id", "purpose", "outcome", "count"}`` rows, each
+                 with a ``period`` start unless ``granularity`` is ``total``,
+                 ordered by period and then by count, highest first.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Invalid granularity: must be one of {list(GRANULARITIES)}.")
+        period_seconds = GRANULARITIES[granularity]
+        low = _epoch(since) if since else None
+        high = _epoch(until) if until else None
+        if self.sync is not None:
+            self.sync()
+        totals = Counter()
+        with self._lock:
+            # Flushed buckets no longer change; only open ones need copying.
+            buckets = [(bucket.start, bucket.counts if bucket.flushed else bucket.counts.copy(), bucket.stored)
+                       for bucket in self._buckets.values()
+                       if (low is None or bucket.start >= low) and (high is None or bucket.start <= high)]
+        for start, counts, stored in buckets:
+            period = start // period_seconds * period_seconds if period_seconds else None
+            for source in (counts, stored):
+                for key, count in source.items():
+                    if (partner_id is None or key[0] == partner_id) and (purpose is None or key[1] == purpose):
+                        totals[(period,) + key] += count
+        rows = []
+        for (period, partner, rule_purpose, outcome), count in sorted(
+                totals.items(), key=lambda item: (item[0][0] or 0, -item[1], item[0][1:])):
+            row = {"partner_id": partner, "purpose": rule_purpose, "outcome": outcome, "count": count}
+            if period is not None:
+                row["period"] = _iso(period)
+            rows.append(row)
+        return rows
+
+    def close(self):
+        """Stops the flush thread and writes every remaining bucket."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.sink is not None:
+            self.flush(final=True)
+
+
+def create_decision_rollup(rollup_dir=None):
+    """
+    Builds a DecisionRollup from Config that flushes summaries to a
+    segmented store in ``rollup_dir`` and restores the retained ones from it.
+    The store starts a segment every hour and drops segments older than
+    the rollup's retention, so startup reads only about that window.
+
+    With AUDIT_MULTI_PROCESS, every worker's summaries also count the rows
+    the other workers flushed, so they lag those workers' decisions by at
+    most a bucket and a flush interval.
+    """
+    retention = Config.DECISION_ROLLUP_RETENTION_HOURS * 3600
+    store = SegmentedAuditStore(rollup_dir or Config.POLICY_DECISION_ROLLUP_DIR,
+                                max_segment_age=3600,
+                                retention_seconds=retention,
+                                multi_process=Config.AUDIT_MULTI_PROCESS)
+    multi_process = store.multi_process
+    rollup = DecisionRollup(
+        sink=store.append_many,
+        flush_interval=Config.DECISION_ROLLUP_FLUSH_INTERVAL,
+        retention=retention,
+        origin=uuid.uuid4().hex if multi_process else None,
+        sync=store.sync if multi_process else None,
+    )
+    # Segments expire on rotation; drop those that aged out while nothing was written.
+    store.apply_retention()
+    rollup.load(record for _, record in store.iter_records())
+    if multi_process:
+        # The store hands over each row appended after the ones just read.
+        store.add_listener(lambda location, record: rollup.load((record,)))
+    return rollup
+
+
+_default_rollup = None
+_default_rollup_lock = threading.Lock()
+
+def get_decision_rollup():
+    """
+    Returns the process-wide DecisionRollup, shared by the policy engine
+    that records decisions and the dashboard routes that read them.
+    """
+    global _default_rollup
+    if _default_rollup is None:
+        with _default_rollup_lock:
+            if _default_rollup is None:
+                _default_rollup = create_decision_rollup()
+    return _default_rollup
@@ -1,60 +1,257 @@
+from collections import namedtuple
 from datetime import datetime
-import json
+import logging
 import os
+import random
+import threading
+
+from backend.config import Config
+from backend.services.audit_store import SegmentedAuditStore
+from backend.services.audit_writer import BatchWriter
+from backend.services.consents import changed_users
+from backend.services.decision_cache import DecisionCache
+from backend.services.decision_rollup import outcome_of
+from backend.services.policy_index import changed_partners
+from backend.services.policy_snapshot import PolicySnapshotManager, read_policy_file
+from backend.services.shared_snapshot import SNAPSHOT_SUFFIX, MappedPolicies, SharedSnapshotManager
+from backend.utils.metrics import registry, stage_timer
+
+logger = logging.getLogger(__name__)
+
+Decision = namedtuple('Decision', ['allowed', 'reason', 'policy_version'])
+
+_evaluate_seconds = stage_timer('policy_evaluate')
+_evaluate_batch_seconds = stage_timer('policy_evaluate_batch')
+_decisions = registry.counter('policy_decisions_total', 'Policy decisions made, by outcome.', ('outcome',))
+_allowed = _decisions.labels('allowed')
+_denied = _decisions.labels('denied')
+_cache_lookups = registry.counter('policy_decision_cache_lookups_total', 'Decision cache lookups, by result.',
+                                  ('result',))
+_cache_hits = _cache_lookups.labels('hit')
+_cache_misses = _cache_lookups.labels('miss')
 
 class PolicyEngine:
-    def __init__(self, policy_file='data/policies.json'):
+    def __init__(self, policy_file='data/policies.json', decision_log_dir=None, decision_writer=None,
+                 reload_interval=None, decision_cache=None, decision_rollup=None, decision_sample_rate=None,
+                 consent_file=None, shared_snapshot=None):
         self.policy_file = policy_file
-        self.policies = self.load_policies()
+        if reload_interval is None:
+            reload_interval = Config.POLICY_RELOAD_INTERVAL
+        if decision_cache is None and Config.DECISION_CACHE_SIZE:
+            decision_cache = DecisionCache(maxsize=Config.DECISION_CACHE_SIZE, ttl=Config.DECISION_CACHE_TTL)
+        self.decision_cache = decision_cache
+        if consent_file is None:
+            consent_file = Config.CONSENT_FILE
+        if shared_snapshot is None:
+            shared_snapshot = Config.POLICY_SHARED_SNAPSHOT
+            if shared_snapshot is None and Config.POLICY_SNAPSHOT_CACHE and os.path.exists(policy_file):
+                shared_snapshot = policy_file + SNAPSHOT_SUFFIX
+        # Processes map the compiled snapshot file, built by whichever starts
+        # first after the policies change, instead of each parsing the JSON.
+        self.snapshots = None
+        if shared_snapshot:
+            try:
+                self.snapshots = SharedSnapshotManager(policy_file, shared_snapshot, poll_interval=reload_interval,
+                                                       consent_file=consent_file)
+            except OSError:
+                logger.warning("Policy snapshot %s is unavailable; compiling %s in this process",
+                               shared_snapshot, policy_file, exc_info=True)
+        if self.snapshots is None:
+            self.snapshots = PolicySnapshotManager(policy_file, poll_interval=reload_interval,
+                                                   consent_file=consent_file)
+        self.snapshots.add_listener(self._on_snapshot_swap)
+        self.snapshots.start()
+        self.decision_log_dir = decision_log_dir or Config.POLICY_DECISION_LOG_DIR
+        self._decision_writer = decision_writer
+        self._decision_writer_lock = threading.Lock()
+        # With a rollup, every decision is counted there and only a sample
+        # is written to the decision log as a raw event.
+        self.decision_rollup = decision_rollup
+        if decision_sample_rate is None:
+            decision_sample_rate = Config.DECISION_LOG_SAMPLE_RATE
+        self.decision_sample_rate = decision_sample_rate
+
+    @property
+    def snapshot(self):
+        return self.snapshots.current
+
+    @property
+    def policies(self):
+        return list(self.snapshot.policies)
+
+    @property
+    def index(self):
+        return self.snapshot.index
 
     def load_policies(self):
-        if not os.path.exists(self.policy_file):
-            return []
-        with open(self.policy_file, 'r') as file:
-            return json.load(file)
+        return read_policy_file(self.policy_file)[1]
 
-    def enforce_policy(self, partner_id, user_id, purpose):
-        policy = self.get_policy(partner_id)
+    def reload_policies(self):
+        return self.snapshots.reload()
+
+    def _on_snapshot_swap(self, old, new):
+        # Only partners whose compiled rules changed, and users whose
+        # consents changed, lose their cached decisions; everyone else keeps
+        # hitting the cache across reloads.
+        if self.decision_cache is None:
+            return
+        if old.consent_version != new.consent_version:
+            # Consents only change by rewriting the consent file, which the
+            # reloader picks up as a new snapshot.
+            users = changed_users(old.consents, new.consents)
+            if users is None:
+                self.decision_cache.clear()
+                return
+            for user_id in users:
+                self.decision_cache.invalidate_user(user_id)
+            if old.version == new.version:
+                return
+        if isinstance(old.index, MappedPolicies) and isinstance(new.index, MappedPolicies):
+            # Compares the mapped bytes instead of decoding every partner.
+            changed = new.index.changed_since(old.index)
+        else:
+            changed = changed_partners(old.index, new.index)
+        for partner_id in changed:
+            self.decision_cache.invalidate_partner(partner_id)
+
+    def evaluate(self, partner_id, user_id, purpose):
+        """
+        Decides a request against a single policy snapshot, consulting the
+        decision cache first when one is configured.
+
+        :return: Decision with the outcome, a reason and the version of the
+                 snapshot that made it.
+        """
+        with _evaluate_seconds.time():
+            cache = self.decision_cache
+            if cache is None:
+                decision = self._evaluate(partner_id, user_id, purpose)
+            else:
+                decision = cache.get(partner_id, user_id, purpose)
+                if decision is None:
+                    _cache_misses.inc()
+                    generation = cache.generation
+                    decision = self._evaluate(partner_id, user_id, purpose)
+                    cache.put(partner_id, user_id, purpose, decision, generation=generation)
+                else:
+                    _cache_hits.inc()
+        (_allowed if decision.allowed else _denied).inc()
+        if self.decision_rollup is not None:
+            self.log_policy_decision(partner_id, user_id, purpose, decision, decision.policy_version)
+        return decision
+
+    def _evaluate(self, partner_id, user_id, purpose):
+        snapshot = self.snapshot
+        policy = snapshot.index.get(partner_id)
         if not policy:
-            return False, "Policy not found"
+            return Decision(False, "Policy not found", snapshot.version)
         
-        if self.is_policy_compliant(policy, user_id, purpose):
-            return True, "Policy approved"
-        return False, "Policy denied"
+        if self.is_policy_compliant(policy, user_id, purpose, snapshot.consents):
+            return Decision(True, "Policy approved", snapshot.version)
+        return Decision(False, "Policy denied", snapshot.version)
+
+    def evaluate_batch(self, partner_id, requests):
+        """
+        Decides many ``(user_id, purpose)`` requests for one partner against a
+        single snapshot, resolving the partner's policy once.
+
+        :return: List of Decision, in request order.
+        """
+        with _evaluate_batch_seconds.time():
+            snapshot = self.snapshot
+            policy = snapshot.index.get(partner_id)
+            if not policy:
+                denied = Decision(False, "Policy not found", snapshot.version)
+                decisions = [denied for _ in requests]
+            else:
+                approved = Decision(True, "Policy approved", snapshot.version)
+                denied = Decision(False, "Policy denied", snapshot.version)
+                decisions = [
+                    approved if self.is_policy_compliant(policy, user_id, purpose, snapshot.consents) else denied
+                    for user_id, purpose in requests
+                ]
+        allowed = sum(1 for decision in decisions if decision.allowed)
+        _allowed.inc(allowed)
+        _denied.inc(len(decisions) - allowed)
+        if self.decision_rollup is not None:
+            self.decision_rollup.record_many(partner_id, [
+                (purpose, outcome_of(decision)) for (_, purpose), decision in zip(requests, decisions)
+            ])
+            if self.decision_sample_rate:
+                for (user_id, purpose), decision in zip(requests, decisions):
+                    if random.random() < self.decision_sample_rate:
+                        self.append_to_log(self._decision_entry(partner_id, user_id, purpose,
+                                                                outcome_of(decision), snapshot.version))
+        return decisions
+
+    def enforce_policy(self, partner_id, user_id, purpose):
+        decision = self.evaluate(partner_id, user_id, purpose)
+        return decision.allowed, decision.reason
+
+    def is_authorized(self, partner_id, user_id, purpose):
+        return self.evaluate(partner_id, user_id, purpose).allowed
 
     def get_policy(self, partner_id):
-        for policy in self.policies:
-            if policy['partner_id'] == partner_id:
-                return policy
-        return None
-
-    def is_policy_compliant(self, policy, user_id, purpose):
-        # Implement compliance checks based on policy rules
-        allowed_purposes = policy.get('allowed_purposes', [])
-        if purpose not in allowed_purposes:
+        return self.index.get(partner_id)
+
+    def allowed_data(self, partner_id, purpose):
+        return self.index.allowed_data(partner_id, purpose)
+
+    def is_policy_compliant(self, policy, user_id, purpose, consents=None):
+        if purpose not in policy.purposes:
             return False
-        
-        # Additional checks can be added here
+
+        # Consent is only enforced when consent records are loaded; a user
+        # without a record has not consented.
+        if policy.consent_required and consents is not None:
+            return consents.allows(user_id, purpose) is True
         return True
 
-    def log_policy_decision(self, partner_id, user_id, purpose, decision):
-        log_entry = {
+    def log_policy_decision(self, partner_id, user_id, purpose, decision, policy_version=None):
+        """
+        Records a decision: counted in the decision rollup when the engine
+        has one, with only ``decision_sample_rate`` of decisions also written
+        to the decision log; without a rollup, every decision is written.
+
+        :param decision: A Decision, an allowed flag or an outcome string.
+        """
+        rollup = self.decision_rollup
+        if rollup is not None:
+            outcome = outcome_of(decision)
+            rollup.record(partner_id, purpose, outcome)
+            if not self.decision_sample_rate or random.random() >= self.decision_sample_rate:
+                return
+            decision = outcome
+        self.append_to_log(self._decision_entry(partner_id, user_id, purpose, decision, policy_version))
+
+    def _decision_entry(self, partner_id, user_id, purpose, decision, policy_version=None):
+        return {
             "timestamp": datetime.utcnow().isoformat(),
             "partner_id": partner_id,
             "user_id": user_id,
             "purpose": purpose,
-            "decision": decision
+            "decision": decision,
+            "policy_version": policy_version or self.snapshot.version
         }
-        self.append_to_log(log_entry)
 
     def append_to_log(self, log_entry):
-        log_file = 'data/policy_logs.json'
-        if not os.path.exists(log_file):
-            with open(log_file, 'w') as file:
-                json.dump([], file)
-        
-        with open(log_file, 'r+') as file:
-            logs = json.load(file)
-            logs.append(log_entry)
-            file.seek(0)
-            json.dump(logs, file)
\ No newline at end of file
+        self.decision_writer.submit(log_entry)
+
+    @property
+    def decision_writer(self):
+        # Created on first use so engines that never log decisions do not
+        # touch the filesystem or start a thread.
+        if self._decision_writer is None:
+            with self._decision_writer_lock:
+                if self._decision_writer is None:
+                    store = SegmentedAuditStore(self.decision_log_dir, multi_process=Config.AUDIT_MULTI_PROCESS)
+                    self._decision_writer = BatchWriter(
+                        store.append_many,
+                        max_queue=Config.AUDIT_QUEUE_SIZE,
+                        batch_size=Config.AUDIT_BATCH_SIZE,
+                        flush_interval=Config.AUDIT_FLUSH_INTERVAL,
+                        overflow=Config.AUDIT_OVERFLOW_POLICY,
+                        block_timeout=Config.AUDIT_BLOCK_TIMEOUT,
+                        name='policy-decision-writer',
+                    )
+        return self._decision_writer
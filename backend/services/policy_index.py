@@ -0,0 +1,108 @@
+from collections import namedtuple
+from types import MappingProxyType
+
+PurposeRule = namedtuple('PurposeRule', ['allowed_data', 'conditions', 'masked_fields'], defaults=((),))
+PartnerPolicy = namedtuple('PartnerPolicy', ['partner_id', 'purposes', 'rules', 'consent_required', 'policy_ids'])
+
+_EMPTY = frozenset()
+
+
+class CompiledPolicies:
+    """
+    Immutable decision structure built from a set of policies.
+
+    Each partner maps to a single PartnerPolicy whose ``purposes`` is a
+    frozenset and whose ``rules`` map each purpose to the data segments it
+    may release, so an authorization decision is two hash lookups regardless
+    of how many policies are loaded.
+    """
+
+    __slots__ = ('_partners',)
+
+    def __init__(self, partners):
+        object.__setattr__(self, '_partners', MappingProxyType(dict(partners)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledPolicies is immutable")
+
+    def __len__(self):
+        return len(self._partners)
+
+    def __contains__(self, partner_id):
+        return partner_id in self._partners
+
+    def __iter__(self):
+        return iter(self._partners.values())
+
+    def get(self, partner_id):
+        return self._partners.get(partner_id)
+
+    def allows(self, partner_id, purpose):
+        partner = self._partners.get(partner_id)
+        return partner is not None and purpose in partner.purposes
+
+    def allowed_data(self, partner_id, purpose):
+        partner = self._partners.get(partner_id)
+        if partner is None:
+            return _EMPTY
+        rule = partner.rules.get(purpose)
+        return rule.allowed_data if rule is not None else _EMPTY
+
+    def masked_fields(self, partner_id, purpose):
+        """Returns the field paths the policy requires masked for ``purpose``."""
+        partner = self._partners.get(partner_id)
+        rule = partner.rules.get(purpose) if partner is not None else None
+        return rule.masked_fields if rule is not None else ()
+
+
+def compile_policies(policies):
+    """
+    Merges Policy objects into a CompiledPolicies index. Several policies for
+    the same partner are combined: purposes and allowed data are unioned and
+    consent is required if any of them requires it. Masked field paths are
+    unioned in the order they first appear.
+
+    :param policies: Iterable of ``models.policy.Policy``.
+    """
+    merged = {}
+    for policy in policies:
+        entry = merged.setdefault(policy.partner_id, {"rules": {}, "consent_required": False, "policy_ids": []})
+        entry["consent_required"] = entry["consent_required"] or policy.consent_required
+        entry["policy_ids"].append(policy.policy_id)
+        for purpose, rule in policy.data_usage_rules.items():
+            allowed, conditions, masked = entry["rules"].setdefault(purpose, (set(), [], []))
+            allowed.update(rule.get('allowed_data', []))
+            conditions.extend(c for c in rule.get('conditions', []) if c not in conditions)
+            masked.extend(f for f in rule.get('masked_fields', []) if f not in masked)
+
+    partners = {}
+    for partner_id, entry in merged.items():
+        rules = {
+            purpose: PurposeRule(frozenset(allowed), tuple(conditions), tuple(masked))
+            for purpose, (allowed, conditions, masked) in entry["rules"].items()
+        }
+        partners[partner_id] = PartnerPolicy(
+            partner_id=partner_id,
+            purposes=frozenset(rules),
+            rules=MappingProxyType(rules),
+            consent_required=entry["consent_required"],
+            policy_ids=tuple(entry["policy_ids"]),
+        )
+    return CompiledPolicies(partners)
+
+
+def decision_rules(partner):
+    """The parts of a partner's policy that decide requests; None for an unknown partner."""
+    return None if partner is None else (partner.purposes, partner.rules, partner.consent_required)
+
+
+def changed_partners(old, new):
+    """
+    Returns the partner ids whose decision-relevant rules differ between two
+    indexes. Policy ids are ignored since they can shift when unrelated
+    policies are added or removed.
+    """
+    changed = {partner.partner_id for partner in old
+               if decision_rules(new.get(partner.partner_id)) != decision_rules(partner)}
+    changed.update(partner.partner_id for partner in new if partner.partner_id not in old)
+    return changed
@@ -0,0 +1,178 @@
+from collections import namedtuple
+from contextlib import contextmanager
+import gc
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from backend.models.policy import PolicyManager
+from backend.services.consents import ConsentIndex
+
+logger = logging.getLogger(__name__)
+
+# ``consents`` is None when no consent file is configured; ``file_stat`` holds
+# the stats of the policy and consent files the snapshot was built from.
+PolicySnapshot = namedtuple('PolicySnapshot', ['version', 'generation', 'policies', 'index', 'file_stat', 'loaded_at',
+                                               'consents', 'consent_version'], defaults=(None, None))
+
+
+@contextmanager
+def gc_paused():
+    """
+    Suspends the cyclic garbage collector while a snapshot is parsed and
+    compiled. Everything allocated survives into the snapshot, so the
+    collections that the allocations would trigger find no garbage and only
+    rescan the growing object graph.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_policy_file(policy_file):
+    """
+    Reads a policy file and returns ``(raw_bytes, policy_dicts)``. Both the
+    ``{"policies": [...]}`` layout and a bare list are accepted; a missing
+    file yields no policies.
+    """
+    if not os.path.exists(policy_file):
+        return b'', []
+    with open(policy_file, 'rb') as file:
+        raw = file.read()
+    policies = json.loads(raw) if raw.strip() else []
+    if isinstance(policies, dict):
+        policies = policies.get('policies', [])
+    return raw, policies
+
+
+def build_snapshot(policy_file, generation=1, consent_file=None, previous=None):
+    """
+    Parses and compiles a policy file, and loads the consent file if one is
+    given, into a PolicySnapshot. The version is derived from the policy
+    file contents, so every process that loads the same file reports the
+    same version. Consents are reused from ``previous`` when the consent
+    file has not changed.
+    """
+    file_stat = source_stats(policy_file, consent_file)
+    with gc_paused():
+        raw, policies = read_policy_file(policy_file)
+        index = PolicyManager.from_dicts(policies).compile()
+        consents = consent_version = None
+        if consent_file:
+            consent_version = stat_version(file_stat[1])
+            if previous is not None and previous.consent_version == consent_version:
+                consents = previous.consents
+            else:
+                consents = ConsentIndex.from_file(consent_file)
+    return PolicySnapshot(
+        version=hashlib.sha256(raw).hexdigest()[:12],
+        generation=generation,
+        policies=tuple(policies),
+        index=index,
+        file_stat=file_stat,
+        loaded_at=time.time(),
+        consents=consents,
+        consent_version=consent_version,
+    )
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def source_stats(policy_file, consent_file=None):
+    return (_stat(policy_file), _stat(consent_file) if consent_file else None)
+
+
+def stat_version(file_stat):
+    # Consent files can be large, so they are versioned by their stat rather
+    # than by hashing their contents.
+    return hashlib.sha256(repr(file_stat).encode('ascii')).hexdigest()[:12]
+
+
+class PolicySnapshotManager:
+    """
+    Keeps the current PolicySnapshot and replaces it when the policy or
+    consent file changes.
+
+    A background thread polls the files' mtime, size and inode every
+    ``poll_interval`` seconds. On a change the new snapshot is parsed and
+    compiled on that thread, then published with a single reference
+    assignment, so request threads that read ``current`` always see one
+    complete, consistent snapshot without taking a lock. A file that fails
+    to parse (for example while it is being rewritten) leaves the previous
+    snapshot in place and is retried on the next poll.
+    """
+
+    def __init__(self, policy_file, poll_interval=2.0, consent_file=None):
+        self.policy_file = policy_file
+        self.consent_file = consent_file
+        self.poll_interval = poll_interval
+        self._listeners = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.current = self._load()
+
+    def _load(self):
+        return build_snapshot(self.policy_file, consent_file=self.consent_file)
+
+    def add_listener(self, listener):
+        """Registers ``listener(old_snapshot, new_snapshot)``, called after each swap."""
+        self._listeners.append(listener)
+
+    def start(self):
+        if self._thread is None and self.poll_interval:
+            self._thread = threading.Thread(target=self._poll, name='policy-reloader', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
+
+    def reload_if_changed(self):
+        if source_stats(self.policy_file, self.consent_file) != self.current.file_stat:
+            return self.reload()
+        return False
+
+    def reload(self):
+        """
+        Builds a snapshot from the policy file and swaps it in.
+
+        :return: True if a new snapshot was published.
+        """
+        with self._reload_lock:
+            old = self.current
+            try:
+                new = build_snapshot(self.policy_file, generation=old.generation + 1,
+                                     consent_file=self.consent_file, previous=old)
+            except (OSError, ValueError, KeyError, TypeError):
+                logger.exception("Failed to reload policies from %s; keeping version %s",
+                                 self.policy_file, old.version)
+                return False
+            if new.version == old.version and new.consent_version == old.consent_version:
+                # Touched but unchanged: remember the new stat, keep the snapshot.
+                self.current = old._replace(file_stat=new.file_stat)
+                return False
+            self.current = new
+        logger.info("Loaded policy snapshot %s (generation %d)", new.version, new.generation)
+        for listener in self._listeners:
+            listener(old, new)
+        return True
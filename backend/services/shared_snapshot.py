@@ -0,0 +1,472 @@
+"""
+Policy and consent snapshots shared by gateway worker processes.
+
+A snapshot file is built once from the policy and consent files and every
+worker maps it read-only, so the compiled policies and the consent table
+live once in the page cache however many workers run. Layout:
+
+- a header: magic, then the offset and length of the metadata;
+- the partner table and the consent table. Each table is an entry count,
+  the sorted 64-bit BLAKE2b hashes of its keys, one
+  ``(offset, key_length, value_length)`` per entry in the same order, and
+  the key and value bytes. Partner values are the compiled PartnerPolicy as
+  JSON; consent values are a 64-bit mask of consented purposes;
+- the raw policy list as JSON, decoded only when asked for;
+- the metadata as JSON: versions, generation, the stats of the source files
+  the snapshot was built from, the purpose bit order and section offsets.
+
+A lookup binary-searches the mapped hashes and decodes one entry. Reloads
+are coordinated through a lock file next to the snapshot: the first worker
+to notice a changed source rebuilds the snapshot and atomically replaces
+the file, and the others, finding it current, just map the new file.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from types import MappingProxyType
+
+from backend.models.policy import PolicyManager
+from backend.services.consents import iter_consent_file
+from backend.services.policy_index import PartnerPolicy, PurposeRule, decision_rules
+from backend.services.policy_snapshot import (PolicySnapshot, PolicySnapshotManager, gc_paused, read_policy_file,
+                                              source_stats, stat_version)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PSS1'
+# Appended to the policy file's path for the default snapshot location.
+SNAPSHOT_SUFFIX = '.snapshot'
+_HEADER = struct.Struct('<4s4xQQ')
+_COUNT = struct.Struct('<Q')
+_HASH = struct.Struct('<Q')
+_LOCATION = struct.Struct('<QII')
+_MASK = struct.Struct('<Q')
+MAX_PURPOSES = 64
+# One encoder for every entry: json.dumps with separators builds a new one per call.
+_COMPACT = json.JSONEncoder(separators=(',', ':'))
+
+
+def key_hash(encoded_key):
+    return int.from_bytes(hashlib.blake2b(encoded_key, digest_size=8).digest(), 'big')
+
+
+@contextmanager
+def file_lock(path):
+    """Holds an exclusive ``flock`` on ``path`` across processes."""
+    import fcntl
+    with open(path, 'a') as file:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def _encode_partner(partner):
+    rules = {purpose: [sorted(rule.allowed_data), list(rule.conditions), list(rule.masked_fields)]
+             for purpose, rule in partner.rules.items()}
+    return _COMPACT.encode({"rules": rules, "consent_required": partner.consent_required,
+                            "policy_ids": list(partner.policy_ids)}).encode('utf-8')
+
+
+def _decode_partner(partner_id, value):
+    data = json.loads(value)
+    rules = {purpose: PurposeRule(frozenset(allowed), tuple(conditions), tuple(masked))
+             for purpose, (allowed, conditions, masked) in data["rules"].items()}
+    return PartnerPolicy(
+        partner_id=partner_id,
+        purposes=frozenset(rules),
+        rules=MappingProxyType(rules),
+        consent_required=data["consent_required"],
+        policy_ids=tuple(data["policy_ids"]),
+    )
+
+
+def _write_table(file, entries):
+    """Writes ``(key, value_bytes)`` entries as a hashed table at the file's (8-byte aligned) position."""
+    packed = sorted((key_hash(key.encode('utf-8')), key.encode('utf-8'), value) for key, value in entries)
+    file.write(_COUNT.pack(len(packed)))
+    file.write(b''.join(_HASH.pack(hashed) for hashed, _, _ in packed))
+    offset = 0
+    for _, key, value in packed:
+        file.write(_LOCATION.pack(offset, len(key), len(value)))
+        offset += len(key) + len(value)
+    for _, key, value in packed:
+        file.write(key)
+        file.write(value)
+    _align(file)
+
+
+def _align(file):
+    padding = -file.tell() % 8
+    if padding:
+        file.write(b'\0' * padding)
+
+
+def build_shared_snapshot(snapshot_path, policy_file, consent_file=None, previous=None):
+    """
+    Builds a snapshot file from the policy and consent files and atomically
+    replaces ``snapshot_path`` with it.
+
+    :param previous: Metadata of the snapshot being replaced; its generation
+                     is kept if neither version changes, else incremented.
+    :return: The new snapshot's metadata.
+    """
+    file_stat = source_stats(policy_file, consent_file)
+    with gc_paused():
+        raw, policies = read_policy_file(policy_file)
+        index = PolicyManager.from_dicts(policies).compile()
+    meta = {
+        "version": hashlib.sha256(raw).hexdigest()[:12],
+        "consent_version": stat_version(file_stat[1]) if consent_file else None,
+        "file_stat": file_stat,
+        "built_at": time.time(),
+    }
+    generation = 1
+    if previous is not None:
+        unchanged = (previous["version"], previous["consent_version"]) == (meta["version"], meta["consent_version"])
+        generation = previous["generation"] + (0 if unchanged else 1)
+    meta["generation"] = generation
+
+    temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    # Every table entry is held until the table is sorted and written.
+    with gc_paused(), open(temp_path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, 0, 0))
+        meta["partners"] = file.tell()
+        _write_table(file, ((partner.partner_id, _encode_partner(partner)) for partner in index))
+        purposes = {}
+        if consent_file:
+            meta["consents"] = file.tell()
+            _write_table(file, ((user_id, _MASK.pack(_purpose_mask(granted, purposes)))
+                                for user_id, granted in iter_consent_file(consent_file)))
+        meta["purposes"] = sorted(purposes, key=purposes.get)
+        encoded_policies = _COMPACT.encode(policies).encode('utf-8')
+        meta["policies"] = [file.tell(), len(encoded_policies)]
+        file.write(encoded_policies)
+        meta_offset = file.tell()
+        encoded_meta = json.dumps(meta).encode('utf-8')
+        file.write(encoded_meta)
+        file.seek(0)
+        file.write(_HEADER.pack(MAGIC, meta_offset, len(encoded_meta)))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, snapshot_path)
+    return meta
+
+
+def _purpose_mask(granted, purposes):
+    mask = 0
+    for purpose in granted:
+        bit = purposes.get(purpose)
+        if bit is None:
+            if len(purposes) >= MAX_PURPOSES:
+                raise ValueError(f"Consent files may name at most {MAX_PURPOSES} purposes")
+            bit = purposes[purpose] = len(purposes)
+        mask |= 1 << bit
+    return mask
+
+
+def read_snapshot_meta(snapshot_path):
+    """Returns the metadata of the snapshot at ``snapshot_path``, or None if it is missing or unreadable."""
+    try:
+        with open(snapshot_path, 'rb') as file:
+            magic, meta_offset, meta_length = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != MAGIC:
+                return None
+            file.seek(meta_offset)
+            return _load_meta(file.read(meta_length))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _load_meta(encoded):
+    meta = json.loads(encoded)
+    meta["file_stat"] = tuple(tuple(stat) if stat is not None else None for stat in meta["file_stat"])
+    return meta
+
+
+class _Hashes:
+    """Sequence view of a hash section for big-endian hosts, where it cannot be cast in place."""
+
+    def __init__(self, view):
+        self._view = view
+
+    def __len__(self):
+        return len(self._view) // _HASH.size
+
+    def __getitem__(self, i):
+        return _HASH.unpack_from(self._view, i * _HASH.size)[0]
+
+
+class _MappedTable:
+    def __init__(self, buffer, offset):
+        self._buffer = buffer
+        (self._count,) = _COUNT.unpack_from(buffer, offset)
+        hashes_at = offset + _COUNT.size
+        self._locations_at = hashes_at + self._count * _HASH.size
+        self._blob_at = self._locations_at + self._count * _LOCATION.size
+        view = memoryview(buffer)[hashes_at:self._locations_at]
+        # bisect then runs over the mapped hashes in C.
+        self._hashes = view.cast('Q') if sys.byteorder == 'little' else _Hashes(view)
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, i):
+        offset, key_length, value_length = _LOCATION.unpack_from(self._buffer, self._locations_at + i * _LOCATION.size)
+        start = self._blob_at + offset
+        return start, key_length, value_length
+
+    def get(self, key):
+        """Returns the value bytes stored for ``key``, or None."""
+        encoded = key.encode('utf-8')
+        target = key_hash(encoded)
+        hashes = self._hashes
+        i = bisect_left(hashes, target)
+        while i < self._count and hashes[i] == target:
+            start, key_length, value_length = self._entry(i)
+            if self._buffer[start:start + key_length] == encoded:
+                return self._buffer[start + key_length:start + key_length + value_length]
+            i += 1
+        return None
+
+    def items(self):
+        for i in range(self._count):
+            start, key_length, value_length = self._entry(i)
+            yield (self._buffer[start:start + key_length].decode('utf-8'),
+                   self._buffer[start + key_length:start + key_length + value_length])
+
+
+class MappedPolicies:
+    """
+    The CompiledPolicies interface over a snapshot's partner table. Each
+    partner is decoded on first lookup and kept for the life of the
+    snapshot.
+    """
+
+    def __init__(self, table):
+        self._table = table
+        self._decoded = {}
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, partner_id):
+        return self.get(partner_id) is not None
+
+    def __iter__(self):
+        for partner_id, _ in self._table.items():
+            yield self.get(partner_id)
+
+    def get(self, partner_id):
+        partner = self._decoded.get(partner_id)
+        if partner is None and isinstance(partner_id, str):
+            value = self._table.get(partner_id)
+            if value is not None:
+                partner = self._decoded[partner_id] = _decode_partner(partner_id, value)
+        return partner
+
+    def allows(self, partner_id, purpose):
+        partner = self.get(partner_id)
+        return partner is not None and purpose in partner.purposes
+
+    def allowed_data(self, partner_id, purpose):
+        partner = self.get(partner_id)
+        rule = partner.rules.get(purpose) if partner is not None else None
+        return rule.allowed_data if rule is not None else frozenset()
+
+    def masked_fields(self, partner_id, purpose):
+        partner = self.get(partner_id)
+        rule = partner.rules.get(purpose) if partner is not None else None
+        return rule.masked_fields if rule is not None else ()
+
+    def changed_since(self, previous):
+        """
+        ``changed_partners(previous, self)`` for two mapped snapshots. The
+        encoded partners are compared first, so only a partner whose bytes
+        differ is decoded (outside the lookup cache) to tell a rule change
+        from a shifted policy id.
+        """
+        old_table, new_table = previous._table, self._table
+        changed = set()
+        for partner_id, value in old_table.items():
+            current = new_table.get(partner_id)
+            if current is None:
+                changed.add(partner_id)
+            elif current != value and (decision_rules(_decode_partner(partner_id, value))
+                                       != decision_rules(_decode_partner(partner_id, current))):
+                changed.add(partner_id)
+        changed.update(partner_id for partner_id, _ in new_table.items() if old_table.get(partner_id) is None)
+        return changed
+
+
+class MappedConsents:
+    """The ConsentIndex interface over a snapshot's consent table; nothing is decoded ahead of a lookup."""
+
+    def __init__(self, table, purposes):
+        self._table = table
+        self._bits = {purpose: bit for bit, purpose in enumerate(purposes)}
+
+    def __len__(self):
+        return len(self._table)
+
+    def allows(self, user_id, purpose):
+        value = self._table.get(user_id) if isinstance(user_id, str) else None
+        if value is None:
+            return None
+        bit = self._bits.get(purpose)
+        return bit is not None and bool(_MASK.unpack(value)[0] >> bit & 1)
+
+    def _granted(self, value):
+        mask = _MASK.unpack(value)[0]
+        return frozenset(purpose for purpose, bit in self._bits.items() if mask >> bit & 1)
+
+    def changed_since(self, previous):
+        """
+        Returns the ids of users whose consents differ from those in
+        ``previous``. Masks are compared as stored while both snapshots
+        number the purposes alike; otherwise as sets of purposes.
+        """
+        old_table, new_table = previous._table, self._table
+        same_bits = previous._bits == self._bits
+        changed = set()
+        for user_id, value in old_table.items():
+            current = new_table.get(user_id)
+            if current is None:
+                changed.add(user_id)
+            elif current != value and (same_bits or previous._granted(value) != self._granted(current)):
+                changed.add(user_id)
+        changed.update(user_id for user_id, _ in new_table.items() if old_table.get(user_id) is None)
+        return changed
+
+
+class _StoredPolicies:
+    """The raw policy list of a snapshot, decoded from the map on each iteration."""
+
+    def __init__(self, buffer, offset, length):
+        self._buffer = buffer
+        self._offset = offset
+        self._length = length
+
+    def __iter__(self):
+        return iter(json.loads(self._buffer[self._offset:self._offset + self._length]))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def open_shared_snapshot(snapshot_path):
+    """
+    Maps a snapshot file read-only.
+
+    :return: ``(PolicySnapshot, file_stat)``, with the stat of the mapped file.
+    """
+    with open(snapshot_path, 'rb') as file:
+        st = os.fstat(file.fileno())
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, meta_offset, meta_length = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{snapshot_path} is not a policy snapshot")
+    meta = _load_meta(buffer[meta_offset:meta_offset + meta_length])
+    consents = None
+    if meta.get("consents") is not None:
+        consents = MappedConsents(_MappedTable(buffer, meta["consents"]), meta["purposes"])
+    snapshot = PolicySnapshot(
+        version=meta["version"],
+        generation=meta["generation"],
+        policies=_StoredPolicies(buffer, *meta["policies"]),
+        index=MappedPolicies(_MappedTable(buffer, meta["partners"])),
+        file_stat=meta["file_stat"],
+        loaded_at=time.time(),
+        consents=consents,
+        consent_version=meta["consent_version"],
+    )
+    return snapshot, (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class SharedSnapshotManager(PolicySnapshotManager):
+    """
+    PolicySnapshotManager for several worker processes sharing one snapshot
+    file.
+
+    Each poll checks the source files against the stats recorded in the
+    mapped snapshot. On a change the worker takes the snapshot lock and,
+    unless another worker has already done so, rebuilds the file; then any
+    worker whose mapped file was replaced maps the new one and swaps it in
+    with a single reference assignment. Snapshots are never modified in
+    place, so request threads keep reading the one they started with.
+    """
+
+    def __init__(self, policy_file, snapshot_path, poll_interval=2.0, consent_file=None):
+        self.snapshot_path = snapshot_path
+        self.lock_path = snapshot_path + '.lock'
+        self._mapped_stat = None
+        super().__init__(policy_file, poll_interval=poll_interval, consent_file=consent_file)
+
+    def _load(self):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not self._rebuild(force=False) and not os.path.exists(self.snapshot_path):
+            raise OSError(f"Could not build the policy snapshot {self.snapshot_path}")
+        snapshot, self._mapped_stat = open_shared_snapshot(self.snapshot_path)
+        return snapshot
+
+    def reload_if_changed(self):
+        if source_stats(self.policy_file, self.consent_file) != self.current.file_stat:
+            self._rebuild(force=False)
+        return self._remap_if_replaced()
+
+    def reload(self):
+        """
+        Rebuilds the snapshot file from the sources and maps it.
+
+        :return: True if a new snapshot was published.
+        """
+        self._rebuild(force=True)
+        return self._remap_if_replaced()
+
+    def _rebuild(self, force):
+        """Rebuilds the snapshot file unless it is already current; returns True if it is current now."""
+        with self._reload_lock, file_lock(self.lock_path):
+            previous = read_snapshot_meta(self.snapshot_path)
+            stats = source_stats(self.policy_file, self.consent_file)
+            if not force and previous is not None and previous["file_stat"] == stats:
+                return True
+            try:
+                build_shared_snapshot(self.snapshot_path, self.policy_file, self.consent_file, previous)
+            except (OSError, ValueError, KeyError, TypeError):
+                logger.exception("Failed to rebuild policy snapshot %s from %s", self.snapshot_path, self.policy_file)
+                return False
+            return True
+
+    def _remap_if_replaced(self):
+        with self._reload_lock:
+            try:
+                st = os.stat(self.snapshot_path)
+            except FileNotFoundError:
+                return False
+            if (st.st_mtime_ns, st.st_size, st.st_ino) == self._mapped_stat:
+                return False
+            old = self.current
+            try:
+                new, self._mapped_stat = open_shared_snapshot(self.snapshot_path)
+            except (OSError, ValueError, struct.error):
+                logger.exception("Failed to map policy snapshot %s; keeping version %s", self.snapshot_path,
+                                 old.version)
+                return False
+            # The previous map is released once no request holds its snapshot.
+            self.current = new
+        if new.version == old.version and new.consent_version == old.consent_version:
+            return False
+        logger.info("Mapped policy snapshot %s (generation %d)", new.version, new.generation)
+        for listener in self._listeners:
+            listener(old, new)
+        return True
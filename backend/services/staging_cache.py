@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import json
+import logging
+import os
+import threading
+import time
+
+from backend.services.masking_plan import MaskingPlanCache
+from backend.utils.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+_build_seconds = stage_timer('staging_build')
+
+
+def load_user_records(path):
+    """
+    Loads user records from a ``{"users": [...]}`` (or bare list) JSON file
+    and returns them keyed by ``user_id``. A missing file yields no records.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        users = json.load(file)
+    if isinstance(users, dict):
+        users = users.get('users', [])
+    return {user['user_id']: user for user in users}
+
+
+def scope_record(record, allowed_data):
+    """Returns the ``user_id`` and the ``allowed_data`` fields of ``record`` only."""
+    scoped = {"user_id": record.get('user_id')}
+    for field in allowed_data:
+        if field in record:
+            scoped[field] = record[field]
+    return scoped
+
+
+class _Entry:
+    __slots__ = ('future', 'payload', 'size', 'expires_at')
+
+    def __init__(self, future, expires_at):
+        self.future = future
+        self.payload = None
+        self.size = 0
+        self.expires_at = expires_at
+
+
+class StagedRecordCache:
+    """
+    Holds masked, purpose-scoped payloads prepared ahead of a vault fetch.
+
+    When a request is approved, ``stage(token, loader, ttl)`` runs
+    ``loader()`` on a small worker pool and keeps its result under the
+    token until the token expires. The vault then takes the payload with
+    ``pop(token)`` instead of looking up and masking the record after the
+    partner connects. A payload still being prepared is waited for up to
+    ``wait_timeout`` seconds; a loader that fails or returns None simply
+    leaves nothing staged, so the vault falls back to its usual path.
+
+    Memory is capped at ``max_entries`` payloads and ``max_bytes`` of
+    encoded JSON; past either cap the oldest staged payloads are evicted.
+    ``stats`` counts hits, misses, evictions, expirations and failures.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, workers=2, wait_timeout=0.5,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='record-stager')
+        self.stats = {"staged": 0, "hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "failures": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def bytes_used(self):
+        return self._bytes
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def stage(self, token, loader, ttl):
+        """
+        Prepares ``loader()`` in the background and stores it under ``token``
+        for ``ttl`` seconds.
+        """
+        entry = _Entry(None, self._clock() + ttl)
+        with self._lock:
+            self._purge_expired()
+            self._discard(token)
+            self._entries[token] = entry
+            self._evict_over_cap()
+            entry.future = self._executor.submit(self._prepare, token, entry, loader)
+
+    def _prepare(self, token, entry, loader):
+        try:
+            payload = loader()
+            size = len(json.dumps(payload, separators=(',', ':'))) if payload is not None else 0
+        except Exception:
+            logger.exception("Failed to stage record for a token")
+            payload, size = None, 0
+        with self._lock:
+            if payload is None:
+                self.stats["failures"] += 1
+                if self._entries.get(token) is entry:
+                    del self._entries[token]
+                return None
+            entry.payload = payload
+            entry.size = size
+            if self._entries.get(token) is entry:
+                self._bytes += size
+                self.stats["staged"] += 1
+                self._evict_over_cap()
+        return payload
+
+    def pop(self, token):
+        """Removes and returns the payload staged for ``token``, or None."""
+        with self._lock:
+            entry = self._entries.pop(token, None)
+            if entry is not None:
+                self._bytes -= entry.size
+        if entry is None:
+            return self._miss()
+        if entry.expires_at <= self._clock():
+            self.stats["expirations"] += 1
+            return self._miss()
+        payload = entry.payload
+        if payload is None and entry.future is not None:
+            try:
+                payload = entry.future.result(timeout=self.wait_timeout)
+            except FutureTimeoutError:
+                payload = None
+        if payload is None:
+            return self._miss()
+        self.stats["hits"] += 1
+        return payload
+
+    def discard(self, token):
+        with self._lock:
+            self._discard(token)
+
+    def _discard(self, token):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _miss(self):
+        self.stats["misses"] += 1
+        return None
+
+    def _purge_expired(self):
+        # Entries are kept in staging order and usually share the token TTL,
+        # so expired ones collect at the front.
+        now = self._clock()
+        while self._entries:
+            token, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            self._discard(token)
+            self.stats["expirations"] += 1
+
+    def _evict_over_cap(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            token = next(iter(self._entries))
+            self._discard(token)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.clear()
+
+
+class RecordStager:
+    """
+    Stages the payload a partner will fetch once a request is approved: the
+    user's record, reduced to the fields the partner's policy allows for
+    the purpose, with ``masked_fields`` and the rule's own masked field
+    paths masked by a plan compiled once per policy version.
+    """
+
+    def __init__(self, cache, records, policy_engine, masking_service, masked_fields=(), ttl=300):
+        self.cache = cache
+        self.records = records
+        self.policy_engine = policy_engine
+        self.plans = MaskingPlanCache(policy_engine, masking_service, masked_fields)
+        self.ttl = ttl
+
+    def build_payload(self, partner_id, user_id, purpose):
+        record = self.records.get(user_id)
+        if record is None:
+            return None
+        with _build_seconds.time():
+            scoped = scope_record(record, self.policy_engine.allowed_data(partner_id, purpose))
+            return self.plans.plan_for(partner_id, purpose).apply(scoped)
+
+    def stage(self, token, partner_id, user_id, purpose):
+        self.cache.stage(token, lambda: self.build_payload(partner_id, user_id, purpose), self.ttl)
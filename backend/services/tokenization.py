@@ -0,0 +1,240 @@
+from functools import lru_cache
+import hashlib
+import hmac
+import logging
+import os
+import struct
+import threading
+
+_DIGITS = '0123456789'
+_LOWER = 'abcdefghijklmnopqrstuvwxyz'
+_UPPER = _LOWER.upper()
+
+# For each character class, the replacement picked by a keystream byte.
+_TABLES = {}
+for _alphabet in (_DIGITS, _LOWER, _UPPER):
+    _row = tuple(_alphabet[b % len(_alphabet)] for b in range(256))
+    for _char in _alphabet:
+        _TABLES[_char] = _row
+_NONZERO = tuple('123456789'[b % 9] for b in range(256))
+
+VAULT_MAGIC = b'TKV1'
+_RECORD = struct.Struct('>cHI')
+_TYPE_STR = b's'
+_TYPE_INT = b'i'
+
+logger = logging.getLogger(__name__)
+
+
+def _vault_key(token):
+    # Integer and string tokens with the same digits are different tokens.
+    return (int, token) if isinstance(token, int) else (str, str(token))
+
+
+class TokenVault:
+    """
+    Reverse lookup from token to original value, for authorised
+    detokenization.
+
+    Mappings are held in memory and appended to ``path`` as compact binary
+    records: a type byte, the token and value lengths, then both as UTF-8.
+    Tokens have the type of their values, so the type byte gives both, and
+    an integer token never shares an entry with a string token of the same
+    digits. A token is recorded once; since tokenization is deterministic, the same
+    value always produces the same token and adds nothing. If two values
+    ever produce the same token the first one is kept, and the collision is
+    logged and counted in ``stats``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._values = {}
+        self._lock = threading.Lock()
+        self.stats = {"records": 0, "collisions": 0}
+        self._load()
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(VAULT_MAGIC)
+            self._file.flush()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            return
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        if not data:
+            return
+        if not data.startswith(VAULT_MAGIC):
+            raise ValueError(f"{self.path} is not a token vault file")
+        view = memoryview(data)
+        offset = len(VAULT_MAGIC)
+        while offset + _RECORD.size <= len(data):
+            kind, token_length, value_length = _RECORD.unpack_from(data, offset)
+            start = offset + _RECORD.size
+            end = start + token_length + value_length
+            if end > len(data):
+                # A record cut short by a crash; it is overwritten on the next write.
+                break
+            token = str(view[start:start + token_length], 'utf-8')
+            value = str(view[start + token_length:end], 'utf-8')
+            if kind == _TYPE_INT:
+                token, value = int(token), int(value)
+            self._values.setdefault(_vault_key(token), value)
+            offset = end
+        if offset < len(data):
+            with open(self.path, 'r+b') as file:
+                file.truncate(offset)
+        self.stats["records"] = len(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, token):
+        return _vault_key(token) in self._values
+
+    def get(self, token):
+        return self._values.get(_vault_key(token))
+
+    def record_many(self, pairs):
+        """Stores ``(token, value)`` pairs not seen before, in one write."""
+        chunks = []
+        with self._lock:
+            for token, value in pairs:
+                key = _vault_key(token)
+                existing = self._values.get(key)
+                if existing is not None:
+                    if existing != value:
+                        # The token cannot be detokenized to this value; values are never logged.
+                        self.stats["collisions"] += 1
+                        logger.warning("Token vault collision: token %r already maps to another value", token)
+                    continue
+                self._values[key] = value
+                kind = _TYPE_INT if isinstance(value, int) else _TYPE_STR
+                token_bytes = str(token).encode('utf-8')
+                value_bytes = str(value).encode('utf-8')
+                chunks.append(_RECORD.pack(kind, len(token_bytes), len(value_bytes)))
+                chunks.append(token_bytes)
+                chunks.append(value_bytes)
+            if chunks:
+                self._file.write(b''.join(chunks))
+                self._file.flush()
+                self.stats["records"] = len(self._values)
+
+    def record(self, token, value):
+        self.record_many(((token, value),))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Tokenizer:
+    """
+    Deterministic, format-preserving tokenization keyed by a secret.
+
+    Each character of a value is replaced using a keystream derived from
+    HMAC-SHA256(key, value): digits become digits, letters become letters
+    of the same case, and all other characters are kept, so a token has
+    the same length and shape as the value. Equal values always give equal
+    tokens under the same key, which lets partners join on tokens without
+    seeing the values. Integers are tokenized to integers with the same
+    number of digits.
+
+    Tokens cannot be reversed without the optional ``vault``; short values
+    from a small domain (for example four digits) can collide.
+
+    Recently tokenized values are kept in an LRU cache of ``cache_size``
+    entries, and ``tokenize_many`` tokenizes each distinct value once.
+    """
+
+    def __init__(self, key, cache_size=65536, vault=None):
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        self._base_mac = hmac.new(key, digestmod=hashlib.sha256)
+        self.vault = vault
+        self._cached = lru_cache(maxsize=cache_size, typed=True)(self._tokenize)
+
+    def _keystream(self, data, length):
+        mac = self._base_mac.copy()
+        mac.update(data)
+        stream = mac.digest()
+        counter = 0
+        while len(stream) < length:
+            counter += 1
+            block = self._base_mac.copy()
+            block.update(stream[:32] + counter.to_bytes(4, 'big'))
+            stream += block.digest()
+        return stream
+
+    def _tokenize(self, value):
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            return value
+        if isinstance(value, int):
+            digits = str(abs(value))
+            stream = self._keystream(b'i' + digits.encode('ascii'), len(digits))
+            token = _NONZERO[stream[0]] + ''.join(_DIGITS[b % 10] for b in stream[1:len(digits)]) \
+                if len(digits) > 1 else _DIGITS[stream[0] % 10]
+            return -int(token) if value < 0 else int(token)
+        stream = self._keystream(b's' + value.encode('utf-8'), len(value))
+        tables = _TABLES
+        return ''.join([
+            tables[char][byte] if char in tables else char
+            for char, byte in zip(value, stream)
+        ])
+
+    def tokenize(self, value):
+        """
+        :param value: A string or integer; other values are returned unchanged.
+        :return: The token for ``value``.
+        """
+        token = self._cached(value)
+        if self.vault is not None and token != value and self.vault.get(token) != value:
+            # Records a new token, or logs a collision with a different value.
+            self.vault.record(token, value)
+        return token
+
+    def tokenize_many(self, values):
+        """
+        Tokenizes a sequence of values, computing each distinct value once.
+
+        :return: List of tokens in the order of ``values``.
+        """
+        if not isinstance(values, (list, tuple)):
+            values = list(values)
+        tokenize = self._cached
+        distinct = {}
+        tokens = []
+        for value in values:
+            if type(value) is str:
+                token = distinct.get(value)
+                if token is None:
+                    token = distinct[value] = tokenize(value)
+            else:
+                token = tokenize(value)
+            tokens.append(token)
+        if self.vault is not None:
+            # As in tokenize, a value that is its own token is not recorded.
+            self.vault.record_many((token, value) for value, token in distinct.items() if token != value)
+            self.vault.record_many((token, value) for value, token in zip(values, tokens)
+                                   if type(value) is int and token != value)
+        return tokens
+
+    def detokenize(self, token):
+        """
+        Returns the original value for ``token``. Callers are responsible
+        for checking that the requester may see it.
+
+        :raises LookupError: If no vault is configured or the token is unknown.
+        """
+        if self.vault is None:
+            raise LookupError("Detokenization requires a token vault")
+        value = self.vault.get(token)
+        if value is None:
+            raise LookupError("Unknown token")
+        return value
+
+    def cache_info(self):
+        return self._cached.cache_info()
@@ -0,0 +1,217 @@
+"""
+In-process counters and fixed-bucket latency histograms, rendered in the
+Prometheus text exposition format.
+
+Metrics are created once, at import time of the module that records them,
+and each labelled series is resolved once with ``labels()`` and kept, so
+recording on a hot path is a bisect and an increment under a per-series
+lock. Histograms use fixed bucket bounds; quantiles are computed by the
+scraper, never in the request path.
+"""
+from bisect import bisect_left
+import math
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds, from 50 microseconds to 5 seconds.
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+class _CounterSeries:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _Timer:
+    __slots__ = ('_series', '_start')
+
+    def __init__(self, series):
+        self._series = series
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._series.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramSeries:
+    __slots__ = ('_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        # One count per bucket plus the overflow (+Inf) bucket; cumulated on render.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(self._bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+
+    def time(self):
+        """Context manager that observes the duration of its block."""
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Returns the series for ``values``, one per label name. Keep it rather than calling this per event."""
+        values = tuple(str(value) for value in values)
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._series.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in self._items():
+            lines.extend(self._render_series(list(zip(self.labelnames, values)), series))
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count. Name it with a ``_total`` suffix."""
+    kind = 'counter'
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_series(self, labels, series):
+        yield f"{self.name}{_format_labels(labels)} {_format_value(series.value)}"
+
+
+class Histogram(_Metric):
+    """Distribution of durations in seconds over fixed ``buckets`` (upper bounds)."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, seconds):
+        self.labels().observe(seconds)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_series(self, labels, series):
+        with series._lock:
+            counts = list(series.counts)
+            total = series.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            yield f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(float(bound)))])} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+        yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """The set of metrics exposed together on one endpoint."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Returns the counter called ``name``, creating it on first use."""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Returns the histogram called ``name``, creating it on first use."""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Time spent in each stage of serving a gateway request, labelled by stage.
+STAGE_SECONDS = registry.histogram(
+    'gateway_stage_duration_seconds', 'Time spent in each stage of handling a gateway request.', ('stage',))
+
+
+def stage_timer(stage):
+    """Returns the STAGE_SECONDS series for ``stage``; resolve it once at import time."""
+    return STAGE_SECONDS.labels(stage)
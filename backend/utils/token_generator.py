@@ -1,24 +1,29 @@
-from datetime import datetime, timedelta
-import jwt
+from datetime import timedelta
+import os
+from backend.utils.metrics import stage_timer
+from backend.utils.token_service import HS256TokenService
 
-SECRET_KEY = "your_secret_key"  # Replace with your actual secret key
+# Shared with the data vault (its TOKEN_SECRET_KEY), which verifies the tokens.
+SECRET_KEY = os.environ.get('TOKEN_SECRET_KEY') or "your_secret_key"  # Replace with your actual secret key
 ALGORITHM = "HS256"
+# The vault refuses tokens that outlive its TOKEN_EXPIRY (300 seconds).
+TOKEN_LIFETIME = timedelta(seconds=300)
 
-def generate_token(user_id, expires_delta=None):
-    to_encode = {"sub": user_id}
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)  # Default expiration time
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+token_service = HS256TokenService(SECRET_KEY, default_expires=TOKEN_LIFETIME)
+_mint_seconds = stage_timer('token_mint')
+_mint_batch_seconds = stage_timer('token_mint_batch')
+
+def generate_token(user_id, expires_delta=None, claims=None):
+    with _mint_seconds.time():
+        return token_service.mint(user_id, expires_delta, claims)
+
+def generate_tokens(user_ids, expires_delta=None, claims=None):
+    """Mints one token per user id, sharing a single expiry time; ``claims`` holds one dict per user id."""
+    with _mint_batch_seconds.time():
+        return token_service.mint_many(user_ids, expires_delta, claims)
 
 def decode_token(token):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["sub"]
-    except jwt.ExpiredSignatureError:
+    payload = token_service.verify(token)
+    if payload is None:
         return None
-    except jwt.JWTError:
-        return None
\ No newline at end of file
+    return payload.get("sub")
@@ -0,0 +1,144 @@
+import base64
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+_HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+class HS256TokenService:
+    """
+    Mints and verifies HS256 JWTs without going through a generic JWT library.
+
+    The encoded header never changes, so it is computed once, and the HMAC
+    state after absorbing ``header.`` is kept and copied for every token;
+    minting only hashes the payload. Tokens are byte-compatible with PyJWT.
+
+    Verified tokens are remembered in a small LRU cache keyed by signature
+    for ``verify_cache_ttl`` seconds (never past the token's own expiry), so
+    re-verifying the same token skips the HMAC. A cache hit still requires
+    the signed part of the token to match the cached one exactly.
+    """
+
+    def __init__(self, secret_key, default_expires=timedelta(minutes=15), verify_cache_size=10000,
+                 verify_cache_ttl=30.0, clock=time.time):
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode('utf-8')
+        self.default_expires = default_expires
+        self.verify_cache_size = verify_cache_size
+        self.verify_cache_ttl = verify_cache_ttl
+        self._clock = clock
+        self._header = _b64encode(json.dumps(_HEADER, separators=(',', ':')).encode('utf-8'))
+        self._prefix = self._header + b'.'
+        self._base_mac = hmac.new(secret_key, self._prefix, hashlib.sha256)
+        self._key = secret_key
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"minted": 0, "verified": 0, "cache_hits": 0, "rejected": 0}
+
+    def _sign(self, encoded_payload):
+        mac = self._base_mac.copy()
+        mac.update(encoded_payload)
+        return _b64encode(mac.digest())
+
+    def _expiry(self, expires_delta):
+        return int(self._clock() + (expires_delta or self.default_expires).total_seconds())
+
+    def _encode(self, claims):
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        return (self._prefix + payload + b'.' + self._sign(payload)).decode('ascii')
+
+    def mint(self, user_id, expires_delta=None, claims=None):
+        """
+        :param user_id: Subject of the token.
+        :param expires_delta: Lifetime; defaults to ``default_expires``.
+        :param claims: Optional extra claims merged into the payload; they
+                       never override ``sub`` or ``exp``.
+        :return: Encoded JWT string.
+        """
+        self.stats["minted"] += 1
+        return self._encode(dict(claims or {}, sub=user_id, exp=self._expiry(expires_delta)))
+
+    def mint_many(self, user_ids, expires_delta=None, claims=None):
+        """
+        Mints one token per user id, all sharing a single expiry time.
+
+        :param claims: Optional list of extra claims, one dict per user id.
+        """
+        expire = self._expiry(expires_delta)
+        if claims is None:
+            tokens = [self._encode({"sub": user_id, "exp": expire}) for user_id in user_ids]
+        else:
+            tokens = [self._encode(dict(extra, sub=user_id, exp=expire)) for user_id, extra in zip(user_ids, claims)]
+        self.stats["minted"] += len(tokens)
+        return tokens
+
+    def verify(self, token):
+        """
+        Checks the signature and expiry of a token.
+
+        :return: The decoded claims, or None if the token is malformed,
+                 forged or expired.
+        """
+        if isinstance(token, str):
+            token = token.encode('ascii', 'replace')
+        signing_input, dot, signature = token.rpartition(b'.')
+        if not dot:
+            return self._reject()
+        now = self._clock()
+
+        with self._lock:
+            cached = self._verified.get(signature)
+            if cached is not None:
+                cached_input, claims, valid_until = cached
+                if cached_input == signing_input and now < valid_until:
+                    self._verified.move_to_end(signature)
+                    self.stats["cache_hits"] += 1
+                    return claims
+                if now >= valid_until:
+                    del self._verified[signature]
+
+        header, dot, payload = signing_input.partition(b'.')
+        if not dot:
+            return self._reject()
+        try:
+            if header == self._header:
+                mac = self._base_mac.copy()
+                mac.update(payload)
+            elif json.loads(_b64decode(header)).get('alg') == 'HS256':
+                # Same algorithm, differently serialised header (another issuer).
+                mac = hmac.new(self._key, signing_input, hashlib.sha256)
+            else:
+                return self._reject()
+            if not hmac.compare_digest(_b64decode(signature), mac.digest()):
+                return self._reject()
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, AttributeError):
+            return self._reject()
+        exp = claims.get('exp') if isinstance(claims, dict) else None
+        if not isinstance(exp, (int, float)) or now >= exp:
+            return self._reject()
+
+        self.stats["verified"] += 1
+        if self.verify_cache_size:
+            with self._lock:
+                self._verified[signature] = (signing_input, claims, min(exp, now + self.verify_cache_ttl))
+                if len(self._verified) > self.verify_cache_size:
+                    self._verified.popitem(last=False)
+        return claims
+
+    def _reject(self):
+        self.stats["rejected"] += 1
+        return None
@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 def validate_user_id(user_id):
     if not isinstance(user_id, str) or len(user_id) == 0:
         raise ValueError("Invalid user ID: must be a non-empty string.")
@@ -14,6 +16,21 @@ def validate_purpose(purpose):
         raise ValueError(f"Invalid purpose: must be one of {valid_purposes}.")
     return True
 
+def parse_timestamp(value):
+    """
+    Parses an ISO 8601 timestamp and returns it as a naive UTC ISO string,
+    the format audit entries are stored in.
+    """
+    if not isinstance(value, str) or len(value) == 0:
+        raise ValueError("Invalid timestamp: must be a non-empty ISO 8601 string.")
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value} is not ISO 8601.")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
 def validate_request_data(request_data):
     if not isinstance(request_data, dict):
         raise ValueError("Request data must be a dictionary.")
@@ -27,4 +44,28 @@ def validate_request_data(request_data):
     validate_user_id(request_data["user_id"])
     validate_purpose(request_data["purpose"])
     
-    return True
\ No newline at end of file
+    return True
+
+def validate_batch_request_data(request_data, max_items):
+    if not isinstance(request_data, dict):
+        raise ValueError("Request data must be a dictionary.")
+    if "partner_id" not in request_data:
+        raise ValueError("Missing required field: partner_id")
+    validate_partner_id(request_data["partner_id"])
+
+    items = request_data.get("items")
+    if not isinstance(items, list) or len(items) == 0:
+        raise ValueError("Invalid items: must be a non-empty list.")
+    if len(items) > max_items:
+        raise ValueError(f"Invalid items: at most {max_items} items per batch.")
+    return True
+
+def validate_batch_item(item):
+    if not isinstance(item, dict):
+        raise ValueError("Batch item must be a dictionary.")
+    for field in ["user_id", "purpose"]:
+        if field not in item:
+            raise ValueError(f"Missing required field: {field}")
+    validate_user_id(item["user_id"])
+    validate_purpose(item["purpose"])
+    return True
@@ -0,0 +1,10 @@
+"""
+WSGI entry point for the gateway. Run several worker processes with
+
+    gunicorn -c backend/gunicorn.conf.py backend.wsgi:app
+
+from the repository root.
+"""
+from backend.app import create_app
+
+app = create_app()
@@ -0,0 +1,93 @@
+"""
+Audit append cost as the log grows.
+
+Grows a synchronous AuditService in a temporary directory to each log size
+in turn and measures, at that size, the cost of single ``append_log_entry``
+calls, of batched ``append_log_entries`` calls, and of reopening the
+service (which rebuilds its index from the store). Appends should stay
+flat as the log grows; reopening grows with it.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_audit_append
+"""
+from datetime import datetime, timedelta
+import os
+import random
+import tempfile
+import time
+
+from backend.services.audit_service import AuditService
+from benchmarks.bench_policy_lookup import PURPOSES
+
+LOG_SIZES = [0, 50000, 200000]
+SAMPLE = 2000
+BATCH_SIZE = 100
+
+
+def make_entries(count, start_index, seed=17):
+    rng = random.Random(f"{seed}:{start_index}")
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            "timestamp": (base + timedelta(seconds=start_index + i)).isoformat(),
+            "user_id": f"user_{rng.randrange(10000)}",
+            "partner_id": f"partner_{rng.randrange(100)}",
+            "purpose": rng.choice(PURPOSES),
+            "data_accessed": ["credit_score"],
+        }
+        for i in range(count)
+    ]
+
+
+def open_service(directory):
+    return AuditService(audit_log_dir=os.path.join(directory, 'audit_logs'),
+                        legacy_log_file=os.path.join(directory, 'audit_logs.json'), async_writes=False)
+
+
+def run(log_sizes=LOG_SIZES, sample=SAMPLE):
+    """Returns ``{log_size: {"append_us": ..., "batch_append_us": ..., "open_ms": ...}}`` per entry."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        service = open_service(directory)
+        size = 0
+        try:
+            for log_size in log_sizes:
+                while size < log_size:
+                    count = min(10000, log_size - size)
+                    service.append_log_entries(make_entries(count, size))
+                    size += count
+
+                entries = make_entries(sample, size)
+                start = time.perf_counter()
+                for entry in entries:
+                    service.append_log_entry(entry)
+                single = (time.perf_counter() - start) / sample
+                size += sample
+
+                entries = make_entries(sample, size)
+                start = time.perf_counter()
+                for i in range(0, sample, BATCH_SIZE):
+                    service.append_log_entries(entries[i:i + BATCH_SIZE])
+                batched = (time.perf_counter() - start) / sample
+                size += sample
+
+                service.close()
+                start = time.perf_counter()
+                service = open_service(directory)
+                reopen = time.perf_counter() - start
+                results[log_size] = {"append_us": single * 1e6, "batch_append_us": batched * 1e6,
+                                     "open_ms": reopen * 1e3}
+        finally:
+            service.close()
+    return results
+
+
+def main():
+    print(f"{'log size':>10} {'append us':>10} {'batch us':>10} {'open ms':>10}")
+    for log_size, result in run().items():
+        print(f"{log_size:>10} {result['append_us']:>10.2f} {result['batch_append_us']:>10.2f} "
+              f"{result['open_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
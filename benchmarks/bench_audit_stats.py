@@ -0,0 +1,73 @@
+"""
+/logs/stats query latency over a year of audit history.
+
+Feeds ``records`` audit entries spread evenly over 365 days into an
+AuditStats (the object behind ``GET /logs/stats``) through the same
+``add`` listener the store calls on append, then times typical dashboard
+queries: every dimension over the whole year, one partner's top users
+over a month, and hourly counts for one day. Also reports the cost of
+counting an appended record, snapshot folds included.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_audit_stats
+"""
+import random
+import statistics
+import time
+
+from backend.services.audit_stats import AuditStats
+from benchmarks.bench_policy_lookup import PURPOSES
+
+RECORDS = 2000000
+REPEAT = 20
+HOURS = 365 * 24
+
+QUERIES = {
+    "year_all": {},
+    "month_partner_users": {"group_by": ("user",), "since": "2024-06-01T00:00:00",
+                            "until": "2024-06-30T23:59:59", "partner_id": "partner_7", "limit": 20},
+    "day_hourly": {"group_by": ("hour",), "since": "2024-03-15T00:00:00", "until": "2024-03-15T23:59:59"},
+}
+
+
+def make_records(count, seed=23):
+    rng = random.Random(seed)
+    step = HOURS * 3600 / count
+    base = 1704067200  # 2024-01-01T00:00:00
+    for i in range(count):
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(base + int(i * step)))
+        yield (i // 100000, i), {
+            "timestamp": timestamp,
+            "user_id": f"user_{rng.randrange(10000)}",
+            "partner_id": f"partner_{rng.randrange(100)}",
+            "purpose": rng.choice(PURPOSES),
+        }
+
+
+def run(records=RECORDS, repeat=REPEAT):
+    """Returns ``{"add_us": ..., "<query>": {"p50_ms": ..., "max_ms": ...}}``."""
+    stats = AuditStats()
+    start = time.perf_counter()
+    for location, record in make_records(records):
+        stats.add(location, record)
+    results = {"add_us": (time.perf_counter() - start) / records * 1e6}
+    for name, query in QUERIES.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stats.query(**query)
+            samples.append((time.perf_counter() - start) * 1e3)
+        results[name] = {"p50_ms": statistics.median(samples), "max_ms": max(samples)}
+    return results
+
+
+def main():
+    results = run()
+    print(f"add: {results.pop('add_us'):.2f} us per record ({RECORDS} records over a year)")
+    print(f"{'query':>22} {'p50 ms':>10} {'max ms':>10}")
+    for name, result in results.items():
+        print(f"{name:>22} {result['p50_ms']:>10.2f} {result['max_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+/authorize throughput and latency benchmark.
+
+Serves the auth blueprint from an in-process Flask app against a generated
+policy file, with audit and decision logs written to a temporary
+directory, and drives it through the test client. Reports requests per
+second and p50/p99 latency for single requests, and items per second for
+``/authorize/batch``.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_authorize [requests] [policies]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from flask import Flask
+
+from backend.config import Config
+from backend.services.audit_service import AuditService
+from backend.services.decision_rollup import create_decision_rollup
+from backend.services.policy_engine import PolicyEngine
+from benchmarks.bench_policy_lookup import PURPOSES, make_policies
+
+REQUESTS = 5000
+POLICIES = 1000
+USERS = 2000
+BATCH_SIZE = 100
+
+# Settings pointed at the temporary directory while the app is built, so
+# importing the routes never touches the repository's data files; nor does
+# the engine built on import cache a compiled snapshot next to its policy file.
+_ISOLATED_SETTINGS = {
+    "POLICY_FILE": "policies.json",
+    "AUDIT_LOG_DIR": "audit_logs",
+    "AUDIT_LEGACY_LOG_FILE": "audit_logs.json",
+    "POLICY_DECISION_LOG_DIR": "policy_logs",
+    "POLICY_LEGACY_DECISION_LOG_FILE": "policy_logs.json",
+    "POLICY_DECISION_ROLLUP_DIR": "policy_rollups",
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def make_app(directory, policies):
+    """Returns ``(app, close)`` for a gateway serving ``policies`` from ``directory``."""
+    policy_file = os.path.join(directory, 'policies.json')
+    with open(policy_file, 'w') as f:
+        json.dump({"policies": policies}, f)
+    saved = {name: getattr(Config, name) for name in list(_ISOLATED_SETTINGS) + ["POLICY_SNAPSHOT_CACHE"]}
+    for name, path in _ISOLATED_SETTINGS.items():
+        setattr(Config, name, os.path.join(directory, path))
+    Config.POLICY_SNAPSHOT_CACHE = False
+    first_import = 'backend.routes.auth' not in sys.modules
+    try:
+        from backend.routes import auth
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+    # The default services created on import live in this directory too.
+    closing = ([auth.audit_service.close, auth.policy_engine.decision_rollup.close, auth.policy_engine.snapshots.stop]
+               if first_import else [])
+    auth.policy_engine = PolicyEngine(policy_file, decision_log_dir=os.path.join(directory, 'policy_logs'),
+                                      reload_interval=0,
+                                      decision_rollup=create_decision_rollup(os.path.join(directory, 'policy_rollups')))
+    auth.audit_service = AuditService(audit_log_dir=os.path.join(directory, 'audit_logs'),
+                                      legacy_log_file=os.path.join(directory, 'audit_logs.json'))
+    closing += [auth.audit_service.close, auth.policy_engine.decision_rollup.close, auth.policy_engine.snapshots.stop]
+    app = Flask(__name__)
+    app.register_blueprint(auth.auth_bp)
+
+    def close():
+        for stop in closing:
+            stop()
+
+    return app, close
+
+
+def run(requests=REQUESTS, policies=POLICIES):
+    """
+    Returns ``{"authorize": {"requests_per_sec", "p50_ms", "p99_ms", "approved"},
+    "authorize_batch": {"items_per_sec", "p50_ms", "p99_ms"}}``.
+    """
+    rng = random.Random(13)
+    bodies = [
+        {"partner_id": f"partner_{rng.randrange(policies)}", "user_id": f"user_{rng.randrange(USERS)}",
+         "purpose": rng.choice(PURPOSES), "requested_data": ["credit_score"]}
+        for _ in range(requests)
+    ]
+    batches = [
+        {"partner_id": f"partner_{rng.randrange(policies)}",
+         "items": [{"user_id": f"user_{rng.randrange(USERS)}", "purpose": rng.choice(PURPOSES)}
+                   for _ in range(BATCH_SIZE)]}
+        for _ in range(max(1, requests // BATCH_SIZE))
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        app, close = make_app(directory, make_policies(policies))
+        try:
+            client = app.test_client()
+            latencies = []
+            approved = 0
+            start = time.perf_counter()
+            for body in bodies:
+                began = time.perf_counter()
+                response = client.post('/authorize', json=body)
+                latencies.append(time.perf_counter() - began)
+                approved += response.status_code == 200
+            elapsed = time.perf_counter() - start
+
+            batch_latencies = []
+            batch_start = time.perf_counter()
+            for body in batches:
+                began = time.perf_counter()
+                client.post('/authorize/batch', json=body)
+                batch_latencies.append(time.perf_counter() - began)
+            batch_elapsed = time.perf_counter() - batch_start
+        finally:
+            close()
+    latencies.sort()
+    batch_latencies.sort()
+    return {
+        "authorize": {
+            "requests_per_sec": requests / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1e3,
+            "p99_ms": percentile(latencies, 0.99) * 1e3,
+            "approved": approved,
+        },
+        "authorize_batch": {
+            "items_per_sec": len(batches) * BATCH_SIZE / batch_elapsed,
+            "p50_ms": percentile(batch_latencies, 0.50) * 1e3,
+            "p99_ms": percentile(batch_latencies, 0.99) * 1e3,
+        },
+    }
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    policies = int(sys.argv[2]) if len(sys.argv) > 2 else POLICIES
+    results = run(requests, policies)
+    single, batch = results["authorize"], results["authorize_batch"]
+    print(f"{requests} requests against {policies} partner policies ({single['approved']} approved)")
+    print(f"{'endpoint':>16} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'/authorize':>16} {single['requests_per_sec']:>10.0f} {single['p50_ms']:>8.3f} {single['p99_ms']:>8.3f}")
+    print(f"{'/authorize/batch':>16} {batch['items_per_sec']:>10.0f} {batch['p50_ms']:>8.3f} {batch['p99_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Policy lookup micro-benchmark.
+
+Compares the compiled partner/purpose index against the linear scan it
+replaced, for growing numbers of partner policies. The compiled lookup
+should stay flat while the scan grows with the policy count.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_policy_lookup
+"""
+import random
+import timeit
+
+from backend.models.policy import PolicyManager
+
+PURPOSES = ["loan_application", "credit_scoring", "regulatory_reporting", "third_party_integration"]
+POLICY_COUNTS = [10, 100, 1000, 10000]
+LOOKUPS = 20000
+
+
+def make_policies(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "partner_id": f"partner_{i}",
+            "data_usage": {
+                "purpose": rng.choice(PURPOSES),
+                "allowed_data": ["transaction_history", "credit_score"],
+                "conditions": ["User consent must be obtained"],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def linear_allows(policies, partner_id, purpose):
+    for policy in policies:
+        if policy['partner_id'] == partner_id:
+            return purpose in [policy['data_usage']['purpose']]
+    return False
+
+
+def run(policy_counts=POLICY_COUNTS, lookups=LOOKUPS):
+    """Returns ``{policy_count: {"compiled_ns": ..., "linear_ns": ...}}`` per lookup."""
+    results = {}
+    rng = random.Random(11)
+    for count in policy_counts:
+        policies = make_policies(count)
+        index = PolicyManager.from_dicts(policies).compile()
+        queries = [(f"partner_{rng.randrange(count)}", rng.choice(PURPOSES)) for _ in range(lookups)]
+        compiled = timeit.timeit(lambda: [index.allows(p, purpose) for p, purpose in queries], number=1)
+        # The linear scan is sampled on fewer queries so large counts finish quickly.
+        sample = queries[:max(lookups // max(count // 100, 1), 100)]
+        linear = timeit.timeit(lambda: [linear_allows(policies, p, purpose) for p, purpose in sample], number=1)
+        results[count] = {
+            "compiled_ns": compiled / len(queries) * 1e9,
+            "linear_ns": linear / len(sample) * 1e9,
+        }
+    return results
+
+
+def main():
+    print(f"{'policies':>10} {'compiled ns/op':>16} {'linear ns/op':>16}")
+    for count, result in run().items():
+        print(f"{count:>10} {result['compiled_ns']:>16.1f} {result['linear_ns']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Cold-start benchmark for the gateway and the data vault.
+
+Starts each in fresh interpreters and reports the time to import it
+(for the gateway this includes the services its routes build on import),
+to build it (``create_app()`` or ``DataVaultServer(...)``) and to answer
+its first request, plus ``ready_ms``, the wall time from spawning the
+interpreter to that first response. The gateway's data files are kept in
+a temporary directory holding a generated policy file, so every file it
+creates stays there: ``gateway_cold`` starts without a compiled policy snapshot and
+builds one, ``gateway_warm`` maps the snapshot an earlier start left
+behind. Each figure is the median over ``runs`` starts.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup [runs] [policies]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend.services.shared_snapshot import SNAPSHOT_SUFFIX
+from benchmarks.bench_policy_lookup import make_policies
+
+RUNS = 7
+POLICIES = 10000
+REPOSITORY = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# The gateway's data files, kept in each run's scratch directory
+DATA_FILES = {
+    'POLICY_FILE': 'policies.json',
+    'AUDIT_LOG_DIR': 'audit_logs',
+    'AUDIT_LEGACY_LOG_FILE': 'audit_logs.json',
+    'POLICY_DECISION_LOG_DIR': 'policy_logs',
+    'POLICY_LEGACY_DECISION_LOG_FILE': 'policy_logs.json',
+    'POLICY_DECISION_ROLLUP_DIR': 'policy_rollups',
+}
+
+# Each child prints one JSON line of perf_counter offsets from its first
+# statement, and the wall clock time of its first response.
+_GATEWAY = """
+import time
+start = time.perf_counter()
+from backend.app import create_app
+imported = time.perf_counter()
+app = create_app()
+built = time.perf_counter()
+response = app.test_client().post('/authorize', json={"partner_id": "partner_1", "user_id": "user_1",
+                                                       "purpose": "loan_application"})
+answered = time.perf_counter()
+answered_at = time.time()
+assert response.status_code in (200, 403), response.status_code
+"""
+
+_VAULT = """
+import time
+start = time.perf_counter()
+import sys
+sys.path.insert(0, {vault_dir!r})
+from server import DataVaultServer
+imported = time.perf_counter()
+server = DataVaultServer(host="127.0.0.1", port=0)
+built = time.perf_counter()
+import socket, threading
+from utils.framing import recv_message, send_message
+threading.Thread(target=server.start, daemon=True).start()
+with socket.create_connection(("127.0.0.1", server.port), timeout=10) as connection:
+    send_message(connection, b'{{"action": "retrieve_data", "parameters": {{"user_id": "user_1"}}}}')
+    assert recv_message(connection)
+answered = time.perf_counter()
+answered_at = time.time()
+"""
+
+_REPORT = """
+import json, os, sys
+sys.stdout.write(json.dumps({"import_ms": (imported - start) * 1e3, "init_ms": (built - imported) * 1e3,
+                             "first_request_ms": (answered - built) * 1e3, "answered_at": answered_at}) + "\\n")
+sys.stdout.flush()
+# Skip waiting for the writer and reloader threads; only startup is measured.
+os._exit(0)
+"""
+
+
+def start_once(code, directory):
+    """
+    Runs ``code`` in a new interpreter in ``directory``, with the gateway's
+    data files there; returns its timings in milliseconds.
+    """
+    env = dict(os.environ, PYTHONPATH=REPOSITORY, PYTHONDONTWRITEBYTECODE='1')
+    env.update((name, os.path.join(directory, path)) for name, path in DATA_FILES.items())
+    spawned_at = time.time()
+    completed = subprocess.run([sys.executable, '-c', code + _REPORT], cwd=directory, env=env,
+                               capture_output=True, text=True, timeout=120)
+    if completed.returncode != 0:
+        raise RuntimeError(f"startup run failed:\n{completed.stderr}")
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings["ready_ms"] = (timings.pop("answered_at") - spawned_at) * 1e3
+    return timings
+
+
+def median_timings(samples):
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def run(runs=RUNS, policies=POLICIES):
+    """
+    Returns ``{"gateway_cold" | "gateway_warm" | "vault": {...}}`` with
+    ``import_ms``, ``init_ms``, ``first_request_ms`` and ``ready_ms``.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        policy_file = os.path.join(directory, DATA_FILES['POLICY_FILE'])
+        with open(policy_file, 'w') as f:
+            json.dump({"policies": make_policies(policies)}, f)
+        snapshot = policy_file + SNAPSHOT_SUFFIX
+        cold, warm = [], []
+        for _ in range(runs):
+            if os.path.exists(snapshot):
+                os.remove(snapshot)
+            cold.append(start_once(_GATEWAY, directory))
+            warm.append(start_once(_GATEWAY, directory))
+        vault = [start_once(_VAULT.format(vault_dir=os.path.join(REPOSITORY, 'data-exchange')), directory)
+                 for _ in range(runs)]
+    return {"gateway_cold": median_timings(cold), "gateway_warm": median_timings(warm),
+            "vault": median_timings(vault)}
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else RUNS
+    policies = int(sys.argv[2]) if len(sys.argv) > 2 else POLICIES
+    results = run(runs, policies)
+    print(f"median of {runs} starts, {policies} policies")
+    print(f"{'process':>14} {'import ms':>10} {'init ms':>10} {'first req ms':>13} {'ready ms':>10}")
+    for name, result in results.items():
+        print(f"{name:>14} {result['import_ms']:>10.1f} {result['init_ms']:>10.1f} "
+              f"{result['first_request_ms']:>13.1f} {result['ready_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
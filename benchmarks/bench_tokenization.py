@@ -0,0 +1,80 @@
+"""
+Tokenization throughput benchmark.
+
+Tokenizes a column of account numbers in which values repeat, as they do
+in transaction exports: without the LRU cache, with it, and through
+``tokenize_many`` with and without a token vault. Reports values per
+second for each mode.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_tokenization [values] [distinct]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from backend.services.tokenization import Tokenizer, TokenVault
+
+VALUES = 1000000
+DISTINCT = 100000
+KEY = b'benchmark-tokenization-key'
+
+
+def make_column(count, distinct, seed=3):
+    rng = random.Random(seed)
+    accounts = [f"{rng.randrange(10 ** 12):012d}-{rng.randrange(10 ** 4):04d}" for _ in range(distinct)]
+    # Skewed reuse: a few hot accounts appear in many rows.
+    return [accounts[min(int(rng.paretovariate(1.2)) - 1, distinct - 1)] if i % 2 else rng.choice(accounts)
+            for i in range(count)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(values=VALUES, distinct=DISTINCT):
+    """Returns ``{mode: {"seconds": ..., "values_per_sec": ...}}``."""
+    column = make_column(values, distinct)
+    results = {}
+
+    uncached = Tokenizer(KEY, cache_size=0)
+    cached = Tokenizer(KEY, cache_size=distinct)
+    batched = Tokenizer(KEY, cache_size=distinct)
+    modes = {
+        "uncached": lambda: [uncached.tokenize(value) for value in column],
+        "lru_cached": lambda: [cached.tokenize(value) for value in column],
+        "tokenize_many": lambda: batched.tokenize_many(column),
+    }
+    for mode, fn in modes.items():
+        seconds = timed(fn)
+        results[mode] = {"seconds": seconds, "values_per_sec": values / seconds}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'vault.bin')
+        vault = TokenVault(path)
+        with_vault = Tokenizer(KEY, cache_size=distinct, vault=vault)
+        seconds = timed(lambda: with_vault.tokenize_many(column))
+        vault.close()
+        results["tokenize_many_vault"] = {"seconds": seconds, "values_per_sec": values / seconds,
+                                          "vault_bytes": os.path.getsize(path), "vault_records": len(vault)}
+    return results
+
+
+def main():
+    values = int(sys.argv[1]) if len(sys.argv) > 1 else VALUES
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else DISTINCT
+    print(f"{values} values, {distinct} distinct accounts")
+    print(f"{'mode':>20} {'values/s':>12}")
+    results = run(values, distinct)
+    for mode, result in results.items():
+        print(f"{mode:>20} {result['values_per_sec']:>12.0f}")
+    vault = results["tokenize_many_vault"]
+    print(f"vault: {vault['vault_records']} records in {vault['vault_bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Data vault connection-rate load test.
+
+Starts the threaded and the asyncio DataVaultServer on loopback ports and
+drives each with many concurrent clients that connect, send one request,
+read the response and disconnect. Reports sustained connections per second
+and failed connections for each mode. The ``session`` mode sends the same
+number of requests through pooled, pipelined VaultSession connections to
+the threaded server, for comparison with connection-per-request clients.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_vault_connections [connections] [concurrency]
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'data-exchange'))
+
+from async_server import AsyncDataVaultServer  # noqa: E402
+from server import DataVaultServer  # noqa: E402
+from session import VaultSession  # noqa: E402
+from utils.framing import FrameError, recv_message, send_message  # noqa: E402
+
+CONNECTIONS = 2000
+CONCURRENCY = 50
+REQUEST = b'{"action": "retrieve_data", "parameters": {"user_id": "user_123"}}'
+
+
+def one_request(port):
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=10) as s:
+            send_message(s, REQUEST)
+            return bool(recv_message(s))
+    except (OSError, FrameError):
+        return False
+
+
+def drive(port, connections, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: one_request(port), range(connections)))
+    elapsed = time.perf_counter() - start
+    return {"connections_per_sec": connections / elapsed, "requests_per_sec": connections / elapsed,
+            "failed": results.count(False)}
+
+
+def bench_threaded(connections, concurrency):
+    server = DataVaultServer(host="127.0.0.1", port=0, max_connections=concurrency)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    try:
+        return drive(server.port, connections, concurrency)
+    finally:
+        server.stop()
+
+
+def bench_asyncio(connections, concurrency):
+    server = AsyncDataVaultServer(host="127.0.0.1", port=0, max_connections=concurrency)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.serve(), loop).result()
+    try:
+        return drive(server.port, connections, concurrency)
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def bench_session(requests, concurrency, batch_size=20):
+    server = DataVaultServer(host="127.0.0.1", port=0, max_connections=concurrency)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    session = VaultSession("127.0.0.1", server.port, pool_size=concurrency)
+    batch = [("token", json.loads(REQUEST))] * batch_size
+
+    def one_batch(_):
+        try:
+            return len(session.retrieve_many(batch))
+        except (OSError, ConnectionError):
+            return 0
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            served = sum(pool.map(one_batch, range(max(1, requests // batch_size))))
+        elapsed = time.perf_counter() - start
+        return {"connections_per_sec": session.stats["connections_opened"] / elapsed,
+                "requests_per_sec": served / elapsed,
+                "failed": max(1, requests // batch_size) * batch_size - served}
+    finally:
+        session.close()
+        server.stop()
+
+
+def run(connections=CONNECTIONS, concurrency=CONCURRENCY):
+    """Returns ``{mode: {"connections_per_sec": ..., "requests_per_sec": ..., "failed": ...}}``."""
+    # The servers log every connection; keep the report readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {
+            "threaded": bench_threaded(connections, concurrency),
+            "asyncio": bench_asyncio(connections, concurrency),
+            "session": bench_session(connections, concurrency),
+        }
+
+
+def main():
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else CONNECTIONS
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else CONCURRENCY
+    print(f"{connections} connections, {concurrency} concurrent clients")
+    print(f"{'mode':>10} {'conn/s':>10} {'req/s':>10} {'failed':>8}")
+    for mode, result in run(connections, concurrency).items():
+        print(f"{mode:>10} {result['connections_per_sec']:>10.0f} {result['requests_per_sec']:>10.0f} "
+              f"{result['failed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
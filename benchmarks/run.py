@@ -0,0 +1,163 @@
+"""
+Runs the benchmark suite and compares it against a stored baseline.
+
+Every benchmark runs in this process or against loopback servers it
+starts itself, through the same ``run()`` its own module's ``main`` uses.
+Results are written as JSON. With ``--compare`` each metric is checked
+against a baseline results file: a throughput (``*_per_sec``, ``speedup``)
+that drops, or a time (``*_ns``, ``*_us``, ``*_ms``, ``seconds``) or
+failure count that rises, by more than ``--threshold`` is reported as a
+regression and the command exits with status 1.
+
+Baselines are machine-specific; record one on the machine that will run
+the comparison with ``--save-baseline``.
+
+Usage (from the repository root):
+    python -m benchmarks.run [--quick] [--only NAME ...] [--output FILE]
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --compare [BASELINE] [--threshold 0.15]
+"""
+import argparse
+from datetime import datetime
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+
+DEFAULT_OUTPUT = 'bench_results.json'
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_THRESHOLD = 0.15
+
+# name: (module, keyword arguments for a full run, keyword arguments for --quick)
+SUITE = {
+    "authorize": ("benchmarks.bench_authorize", {}, {"requests": 1000, "policies": 200}),
+    "policy_lookup": ("benchmarks.bench_policy_lookup", {}, {"policy_counts": [10, 1000], "lookups": 5000}),
+    "tokens": ("benchmarks.bench_tokens", {}, {"count": 2000}),
+    "masking": ("benchmarks.bench_masking", {}, {"records": 20000}),
+    "tokenization": ("benchmarks.bench_tokenization", {}, {"values": 20000}),
+    "audit_append": ("benchmarks.bench_audit_append", {}, {"log_sizes": [0, 20000], "sample": 500}),
+    "audit_stats": ("benchmarks.bench_audit_stats", {}, {"records": 200000, "repeat": 5}),
+    "vault": ("benchmarks.bench_vault_connections", {}, {"connections": 300, "concurrency": 10}),
+    "startup": ("benchmarks.bench_startup", {}, {"runs": 3, "policies": 1000}),
+}
+
+_HIGHER_IS_BETTER = ('_per_sec', 'speedup')
+_LOWER_IS_BETTER = ('_ns', '_us', '_ms', 'seconds', 'failed')
+
+
+def run_suite(names, quick=False):
+    results = {}
+    for name in names:
+        module_name, full, reduced = SUITE[name]
+        module = importlib.import_module(module_name)
+        print(f"running {name}...", file=sys.stderr)
+        start = time.perf_counter()
+        results[name] = module.run(**(reduced if quick else full))
+        print(f"  done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return results
+
+
+def flatten(results, prefix=''):
+    """Flattens nested result dictionaries into ``{"name.key.metric": value}``."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def direction(metric):
+    """Returns 1 if higher values of ``metric`` are better, -1 if lower are, else None."""
+    if metric.endswith(_HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(_LOWER_IS_BETTER):
+        return -1
+    return None
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares two results dictionaries metric by metric.
+
+    :return: List of ``(metric, baseline_value, value, change)`` for the
+             metrics that regressed by more than ``threshold``, where
+             ``change`` is the relative change in the bad direction.
+    """
+    current = flatten(results)
+    regressions = []
+    for metric, before in sorted(flatten(baseline).items()):
+        better = direction(metric)
+        after = current.get(metric)
+        if better is None or after is None:
+            continue
+        if before == 0:
+            change = float('inf') if (after - before) * better < 0 else 0.0
+        else:
+            change = (before - after) / abs(before) * better
+        if change > threshold:
+            regressions.append((metric, before, after, change))
+    return regressions
+
+
+def write_results(path, results, quick):
+    document = {
+        "created": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": quick,
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument('--only', nargs='+', choices=sorted(SUITE), metavar='NAME',
+                        help=f"benchmarks to run (default: all of {', '.join(SUITE)})")
+    parser.add_argument('--quick', action='store_true', help='run reduced workloads')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='results file to write')
+    parser.add_argument('--save-baseline', action='store_true', help=f'also write the results to {DEFAULT_BASELINE}')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='BASELINE',
+                        help='baseline results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative change that counts as a regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    baseline = load_results(args.compare) if args.compare else None
+    results = run_suite(args.only or list(SUITE), quick=args.quick)
+    write_results(args.output, results, args.quick)
+    print(f"Wrote results to {args.output}")
+    if args.save_baseline:
+        write_results(DEFAULT_BASELINE, results, args.quick)
+        print(f"Saved baseline to {DEFAULT_BASELINE}")
+
+    if baseline is None:
+        return 0
+    if baseline.get("quick") != args.quick:
+        print("warning: baseline and results were run with different workloads", file=sys.stderr)
+    regressions = compare(results, baseline["results"], args.threshold)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+        return 0
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against {args.compare}:")
+    for metric, before, after, change in regressions:
+        print(f"  {metric}: {before:.4g} -> {after:.4g} ({change:+.0%} worse)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
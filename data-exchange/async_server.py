@@ -0,0 +1,129 @@
+import asyncio
+import signal
+import time
+
+from config import (HOST, PORT, MAX_CONNECTIONS, ACCEPT_BACKLOG, READ_TIMEOUT, WRITE_TIMEOUT,
+                    QUEUE_TIMEOUT, DRAIN_TIMEOUT, MAX_REQUEST_SIZE, SESSION_IDLE_TIMEOUT, METRICS_PORT)
+from server import DataVaultServer, default_backends, record_request
+from utils.framing import FrameError, read_message, write_json
+from utils.metrics import registry, serve_metrics, stage_timer
+
+_connections = registry.counter('vault_connections_total', 'Connections accepted by the vault.')
+_send_seconds = stage_timer('send')
+
+class AsyncDataVaultServer(DataVaultServer):
+    """
+    asyncio mode of the data vault server.
+
+    Each connection is a coroutine on a single event loop instead of a
+    thread. At most ``max_connections`` are served at once; further
+    connections wait up to ``queue_timeout`` seconds for a free slot before
+    being closed. Reads and writes are bounded by ``read_timeout`` and
+    ``write_timeout``, and ``stop()`` stops accepting, then gives in-flight
+    connections ``drain_timeout`` seconds to finish. Requests go through
+    the same ``handle_request``, wire codec and session protocol as the
+    threaded server.
+    """
+
+    def __init__(self, host=HOST, port=PORT, max_connections=MAX_CONNECTIONS, backlog=ACCEPT_BACKLOG,
+                 read_timeout=READ_TIMEOUT, write_timeout=WRITE_TIMEOUT, queue_timeout=QUEUE_TIMEOUT,
+                 drain_timeout=DRAIN_TIMEOUT, session_idle_timeout=SESSION_IDLE_TIMEOUT, token_validator=None,
+                 staging_cache=None, record_store=None):
+        self.write_timeout = write_timeout
+        self.queue_timeout = queue_timeout
+        self.drain_timeout = drain_timeout
+        self.server = None
+        self._connections = set()
+        self._slots = None
+        super().__init__(host, port, max_connections, backlog, read_timeout, session_idle_timeout, token_validator,
+                         staging_cache, record_store)
+
+    def _listen(self):
+        # The listening socket is created on the event loop in serve().
+        pass
+
+    async def handle_connection(self, reader, writer):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            writer.close()
+            return
+        try:
+            timeout = self.read_timeout
+            while True:
+                message = await asyncio.wait_for(read_message(reader, max_size=MAX_REQUEST_SIZE), timeout)
+                if message is None:
+                    return
+                started = time.perf_counter()
+                request = message.decode('utf-8')
+                session_request = self.parse_session_request(request)
+                if session_request is None:
+                    response = self.handle_request(request)
+                    with _send_seconds.time():
+                        await asyncio.wait_for(write_json(writer, response), self.write_timeout)
+                    record_request('plain', response, started)
+                    return
+                if self.staging_cache is not None:
+                    # pop() may wait for a payload that is still being staged.
+                    response = await asyncio.get_running_loop().run_in_executor(
+                        None, self.handle_session_request, session_request)
+                else:
+                    response = self.handle_session_request(session_request)
+                with _send_seconds.time():
+                    await asyncio.wait_for(write_json(writer, response), self.write_timeout)
+                record_request('session', response, started)
+                timeout = self.session_idle_timeout
+        except (asyncio.TimeoutError, ConnectionError, FrameError, UnicodeDecodeError):
+            pass
+        finally:
+            self._slots.release()
+            writer.close()
+
+    def _track(self, reader, writer):
+        _connections.inc()
+        task = asyncio.ensure_future(self.handle_connection(reader, writer))
+        self._connections.add(task)
+        task.add_done_callback(self._connections.discard)
+
+    async def serve(self):
+        """Starts listening; returns once the socket is bound."""
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self.server = await asyncio.start_server(self._track, self.host, self.port, backlog=self.backlog,
+                                                 reuse_address=True)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"Data Vault Server (asyncio) running on {self.host}:{self.port}")
+
+    async def stop(self):
+        """Stops accepting connections and drains the ones in flight."""
+        if self.server is None:
+            return
+        self.server.close()
+        await self.server.wait_closed()
+        if self._connections:
+            done, pending = await asyncio.wait(set(self._connections), timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+        self.server = None
+
+    async def serve_until_stopped(self):
+        await self.serve()
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stopped.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        await stopped.wait()
+        await self.stop()
+
+    def run(self):
+        asyncio.run(self.serve_until_stopped())
+
+    def start(self):
+        self.run()
+
+if __name__ == "__main__":
+    if METRICS_PORT:
+        serve_metrics(HOST, METRICS_PORT)
+    AsyncDataVaultServer(**default_backends()).run()
@@ -1,50 +1,50 @@
-import socket
-import json
 import sys
 
-def connect_to_data_vault(host, port, token):
+from session import VaultSession
+
+def connect_to_data_vault(host, port, tokens, user_ids=None):
+    """
+    Retrieves one record per token over a single pooled session. ``tokens``
+    may be a single token or a list. Each token is bound to the user it
+    was minted for; ``user_ids`` only restates them.
+    """
+    if isinstance(tokens, str):
+        tokens = [tokens]
+    user_ids = user_ids or [None] * len(tokens)
     try:
-        # Create a socket connection to the data vault server
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.connect((host, port))
+        with VaultSession(host, port) as session:
             print("Connected to data vault.")
-
-            # Send the token for authentication
-            s.sendall(token.encode())
-            response = s.recv(1024).decode()
-            print("Response from server:", response)
-
-            # If the response is valid, proceed to request data
-            if response == "Token accepted":
-                request_data(s)
-            else:
-                print("Invalid token. Exiting.")
-                sys.exit(1)
-
+            responses = request_data(session, zip(tokens, user_ids))
     except Exception as e:
         print(f"Error connecting to data vault: {e}")
         sys.exit(1)
 
-def request_data(socket):
-    # Example request for data
-    request = {
-        "action": "retrieve_data",
-        "parameters": {
-            "user_id": "user_123"
-        }
-    }
-    socket.sendall(json.dumps(request).encode())
-    response = socket.recv(4096).decode()
-    print("Data received:", response)
+    for response in responses:
+        if response.get("status") != "success":
+            print("Request rejected:", response.get("message"))
+        else:
+            print("Data received:", response.get("data"))
+    return responses
+
+def request_data(session, token_user_pairs):
+    # Example request for data, pipelined over one connection
+    requests = [
+        (token, {
+            "action": "retrieve_data",
+            "parameters": {"user_id": user_id} if user_id is not None else {}
+        })
+        for token, user_id in token_user_pairs
+    ]
+    return session.retrieve_many(requests)
 
 if __name__ == "__main__":
     # Configuration for the data vault connection
     DATA_VAULT_HOST = "localhost"
     DATA_VAULT_PORT = 9999
-    TOKEN = sys.argv[1] if len(sys.argv) > 1 else None
+    TOKENS = sys.argv[1:]
 
-    if TOKEN is None:
-        print("Usage: python client.py <token>")
+    if not TOKENS:
+        print("Usage: python client.py <token> [<token> ...]")
         sys.exit(1)
 
-    connect_to_data_vault(DATA_VAULT_HOST, DATA_VAULT_PORT, TOKEN)
\ No newline at end of file
+    connect_to_data_vault(DATA_VAULT_HOST, DATA_VAULT_PORT, TOKENS)
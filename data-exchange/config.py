@@ -1,8 +1,11 @@
 # Configuration settings for the data exchange
+import os
 
 HOST = 'localhost'
 PORT = 9999
 TOKEN_EXPIRY = 300  # Token expiry time in seconds
+# Key the policy gateway signs its tokens with (its token_generator.SECRET_KEY)
+TOKEN_SECRET_KEY = os.environ.get('TOKEN_SECRET_KEY') or 'your_secret_key'
 MAX_CONNECTIONS = 5  # Maximum number of simultaneous connections
 
 # Encryption settings
@@ -11,4 +14,28 @@ AES_BLOCK_SIZE = 16  # AES block size in bytes
 
 # Logging settings
 LOG_FILE = 'data_exchange.log'  # Log file for data exchange activities
-LOG_LEVEL = 'INFO'  # Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
\ No newline at end of file
+LOG_LEVEL = 'INFO'  # Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+# Server settings
+SERVER_MODE = 'threaded'  # 'threaded' (thread per connection) or 'asyncio'
+ACCEPT_BACKLOG = 128  # Pending connections queued by the kernel before accept
+READ_TIMEOUT = 10  # Seconds to wait for a client request
+WRITE_TIMEOUT = 10  # Seconds to wait for a response to be flushed to the client
+QUEUE_TIMEOUT = 5  # Seconds a connection may wait for a free slot when MAX_CONNECTIONS are busy
+DRAIN_TIMEOUT = 30  # Seconds to let in-flight connections finish on shutdown
+
+# Wire protocol
+CHUNK_SIZE = 64 * 1024  # Largest frame payload; bigger messages are split into chunks
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024  # Largest message a client will accept
+MAX_REQUEST_SIZE = 1024 * 1024  # Largest message the server will accept
+
+# Sessions
+SESSION_IDLE_TIMEOUT = 60  # Seconds the server keeps an idle session connection open
+SESSION_POOL_SIZE = 4  # Connections a client session keeps to the vault
+SESSION_MAX_IDLE = 30  # Seconds a client reuses a pooled connection; keep below SESSION_IDLE_TIMEOUT
+PIPELINE_DEPTH = 32  # Requests a client session sends before reading their responses
+
+# Customer records, built with scripts/build_record_store.py; served if the directory exists
+RECORD_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'data', 'records')
+
+# Metrics
+METRICS_PORT = 9102  # Port serving GET /metrics in Prometheus text format; 0 disables it
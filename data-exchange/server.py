@@ -1,35 +1,224 @@
-from socket import socket, AF_INET, SOCK_STREAM
+from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, SHUT_RDWR
 import json
+import os
+import sys
 import threading
+import time
+
+from config import (HOST, PORT, MAX_CONNECTIONS, ACCEPT_BACKLOG, READ_TIMEOUT, SERVER_MODE, MAX_REQUEST_SIZE,
+                    SESSION_IDLE_TIMEOUT, RECORD_STORE_DIR, METRICS_PORT, TOKEN_SECRET_KEY)
+from utils.framing import FrameError, recv_message, send_json
+from utils.masking import release_record
+from utils.metrics import registry, serve_metrics, stage_timer
+
+_connections = registry.counter('vault_connections_total', 'Connections accepted by the vault.')
+_request_seconds = registry.histogram(
+    'vault_request_duration_seconds', 'Time from reading a vault request to sending its response, by kind.',
+    ('kind',))
+_requests = registry.counter('vault_requests_total', 'Vault requests answered, by kind and response status.',
+                             ('kind', 'status'))
+_authorize_seconds = stage_timer('authorize')
+_staging_seconds = stage_timer('staging_lookup')
+_record_seconds = stage_timer('record_lookup')
+_send_seconds = stage_timer('send')
+
+def record_request(kind, response, started):
+    """Records a request of ``kind`` ('plain' or 'session') answered with ``response``."""
+    _request_seconds.labels(kind).observe(time.perf_counter() - started)
+    _requests.labels(kind, response.get('status', 'unknown') if isinstance(response, dict) else 'unknown').inc()
 
 class DataVaultServer:
-    def __init__(self, host='localhost', port=9999):
+    """
+    Serves data vault requests over the framed wire protocol.
+
+    A connection either carries a single plain request, answered before the
+    connection is closed, or is a session: a stream of messages of the form
+    ``{"id": ..., "token": ..., "request": {...}}``, each answered with a
+    response carrying the same ``id``. Session connections stay open
+    between requests for up to ``session_idle_timeout`` seconds, so a
+    client can pipeline many retrievals over one connection. Every session
+    request is authorised by its own token; with a ``token_validator`` the
+    token is consumed, so ephemerality lives with the token rather than
+    the TCP connection.
+
+    With a ``staging_cache`` (any object with ``pop(token)``, such as the
+    gateway's StagedRecordCache when both run in one process), a session
+    request whose payload was staged at authorisation time is answered
+    straight from the cache, and refused if it was not staged and there is
+    no ``record_store`` to fall back on. Otherwise, with a ``record_store``, a
+    ``retrieve_data`` request is answered from the store with the record of
+    the user its token was minted for, reduced to the fields the token's
+    release allows and masked as it specifies; any other request goes
+    through ``handle_request``. A record store is only served behind a
+    ``token_validator``, and only for tokens minted by the gateway.
+    """
+
+    def __init__(self, host=HOST, port=PORT, max_connections=MAX_CONNECTIONS, backlog=ACCEPT_BACKLOG,
+                 read_timeout=READ_TIMEOUT, session_idle_timeout=SESSION_IDLE_TIMEOUT, token_validator=None,
+                 staging_cache=None, record_store=None):
+        if record_store is not None and token_validator is None:
+            raise ValueError("A record store is only served behind a token validator")
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.backlog = backlog
+        self.read_timeout = read_timeout
+        self.session_idle_timeout = session_idle_timeout
+        self.token_validator = token_validator
+        self.staging_cache = staging_cache
+        self.record_store = record_store
+        self._listen()
+
+    def _listen(self):
+        self._slots = threading.BoundedSemaphore(self.max_connections)
         self.server_socket = socket(AF_INET, SOCK_STREAM)
-        self.server_socket.bind((host, port))
-        self.server_socket.listen(5)
-        print(f"Data Vault Server running on {host}:{port}")
+        self.server_socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(self.backlog)
+        self.port = self.server_socket.getsockname()[1]
+        print(f"Data Vault Server running on {self.host}:{self.port}")
 
     def handle_client(self, client_socket):
         try:
-            request = client_socket.recv(1024).decode('utf-8')
-            print(f"Received request: {request}")
-            response = self.process_request(request)
-            client_socket.sendall(response.encode('utf-8'))
+            client_socket.settimeout(self.read_timeout)
+            while True:
+                message = recv_message(client_socket, max_size=MAX_REQUEST_SIZE)
+                if message is None:
+                    return
+                started = time.perf_counter()
+                request = message.decode('utf-8')
+                session_request = self.parse_session_request(request)
+                # The response is encoded and sent frame by frame.
+                if session_request is None:
+                    response = self.handle_request(request)
+                    with _send_seconds.time():
+                        send_json(client_socket, response)
+                    record_request('plain', response, started)
+                    return
+                response = self.handle_session_request(session_request)
+                with _send_seconds.time():
+                    send_json(client_socket, response)
+                record_request('session', response, started)
+                client_socket.settimeout(self.session_idle_timeout)
+        except (FrameError, UnicodeDecodeError, OSError) as e:
+            print(f"Dropping connection: {e}")
         finally:
             client_socket.close()
+            self._slots.release()
 
-    def process_request(self, request):
+    def handle_request(self, request):
         # Here you would implement the logic to handle the request
         # For now, we will just echo back the request
-        return json.dumps({"status": "success", "data": request})
+        return {"status": "success", "data": request}
+
+    def process_request(self, request):
+        return json.dumps(self.handle_request(request))
+
+    def parse_session_request(self, request):
+        """Returns the decoded message if ``request`` is a session request, else None."""
+        if not request.startswith('{'):
+            return None
+        try:
+            message = json.loads(request)
+        except ValueError:
+            return None
+        if isinstance(message, dict) and 'id' in message and 'request' in message:
+            return message
+        return None
+
+    def authorize(self, token):
+        """
+        Validates ``token``, consuming it.
+
+        :return: The validator's result; a success carries the token's
+                 ``claims`` when it was minted by the gateway.
+        """
+        if self.token_validator is None:
+            return {"status": "success"}
+        with _authorize_seconds.time():
+            return self.token_validator.validate(token)
+
+    def handle_session_request(self, message):
+        result = self.authorize(message.get('token'))
+        if result["status"] != "success":
+            response = result
+        else:
+            response = self.fetch(message.get('token'), message['request'], result.get('claims'))
+        return dict(response, id=message['id'])
+
+    def fetch(self, token, request, claims=None):
+        if self.staging_cache is not None:
+            with _staging_seconds.time():
+                payload = self.staging_cache.pop(token)
+            if payload is not None:
+                return {"status": "success", "data": payload}
+            if self.record_store is None:
+                return {"status": "error", "message": "Record not staged"}
+        if self.record_store is not None and isinstance(request, dict) and request.get('action') == 'retrieve_data':
+            parameters = request.get('parameters')
+            return self.fetch_record(parameters if isinstance(parameters, dict) else {}, claims)
+        return self.handle_request(request)
+
+    def fetch_record(self, parameters, claims):
+        """Answers a ``retrieve_data`` request with the release ``claims`` allow."""
+        if not claims or not all(key in claims for key in ('sub', 'partner_id', 'purpose')):
+            return {"status": "error", "message": "Token does not grant access to a record"}
+        # Parameters may repeat the request the token was minted for, never widen it.
+        for parameter, claim in (('user_id', 'sub'), ('partner_id', 'partner_id'), ('purpose', 'purpose')):
+            if parameters.get(parameter, claims[claim]) != claims[claim]:
+                return {"status": "error", "message": f"Token is not valid for this {parameter}"}
+        user_id = claims['sub']
+        with _record_seconds.time():
+            record = self.record_store.get(user_id) if isinstance(user_id, str) else None
+        if record is None:
+            return {"status": "error", "message": "Record not found"}
+        return {"status": "success",
+                "data": release_record(record, claims.get('allowed_data') or (), claims.get('masked_fields') or ())}
 
     def start(self):
         while True:
-            client_socket, addr = self.server_socket.accept()
+            # At MAX_CONNECTIONS, stop accepting and let the kernel backlog queue
+            # new connections instead of spawning more threads.
+            self._slots.acquire()
+            try:
+                client_socket, addr = self.server_socket.accept()
+            except OSError:
+                self._slots.release()
+                break
+            _connections.inc()
             print(f"Accepted connection from {addr}")
             client_handler = threading.Thread(target=self.handle_client, args=(client_socket,))
             client_handler.start()
 
+    def stop(self):
+        try:
+            self.server_socket.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+        self.server_socket.close()
+
+def default_backends():
+    """
+    Returns the ``token_validator`` and ``record_store`` keyword arguments
+    the vault runs with: a validator that accepts each token the gateway
+    mints once, until it expires, and the record store in RECORD_STORE_DIR
+    if it has been built.
+    """
+    from utils.token_validator import TokenValidator
+    record_store = None
+    if os.path.isdir(RECORD_STORE_DIR):
+        from utils.record_store import RecordStore
+        record_store = RecordStore(RECORD_STORE_DIR)
+    return {"token_validator": TokenValidator(secret_key=TOKEN_SECRET_KEY), "record_store": record_store}
+
 if __name__ == "__main__":
-    server = DataVaultServer()
-    server.start()
\ No newline at end of file
+    mode = sys.argv[1] if len(sys.argv) > 1 else SERVER_MODE
+    backends = default_backends()
+    if METRICS_PORT:
+        serve_metrics(HOST, METRICS_PORT)
+    if mode == 'asyncio':
+        from async_server import AsyncDataVaultServer
+        AsyncDataVaultServer(**backends).run()
+    else:
+        server = DataVaultServer(**backends)
+        server.start()
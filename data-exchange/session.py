@@ -0,0 +1,137 @@
+import itertools
+import socket
+import threading
+import time
+
+from config import HOST, PORT, READ_TIMEOUT, SESSION_POOL_SIZE, SESSION_MAX_IDLE, PIPELINE_DEPTH
+from utils.framing import FrameError, recv_json, send_json
+
+
+class VaultConnection:
+    """One keep-alive connection to the data vault, speaking the session protocol."""
+
+    def __init__(self, host, port, timeout=READ_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout)
+        self._ids = itertools.count(1)
+        self.last_used = time.monotonic()
+
+    def pipeline(self, items):
+        """
+        Sends every ``(token, request)`` in ``items`` before reading any
+        response, then returns the responses in the order of ``items``.
+
+        Responses are matched to requests by their ``id``, so the server is
+        free to answer them in any order.
+        """
+        ids = []
+        for token, request in items:
+            request_id = next(self._ids)
+            send_json(self.sock, {"id": request_id, "token": token, "request": request})
+            ids.append(request_id)
+        responses = {}
+        while len(responses) < len(ids):
+            response = recv_json(self.sock)
+            if response is None:
+                raise ConnectionError("Data vault closed the session")
+            responses[response.pop('id', None)] = response
+        self.last_used = time.monotonic()
+        return [responses[request_id] for request_id in ids]
+
+    def close(self):
+        self.sock.close()
+
+
+class VaultSession:
+    """
+    Client session to the data vault.
+
+    Keeps up to ``pool_size`` connections open and reuses them across
+    calls, so a partner pulling many records pays the TCP connect once per
+    connection rather than once per record. Batches are pipelined
+    ``pipeline_depth`` requests at a time over a single connection. Each
+    request still carries its own single-use token.
+
+    Pooled connections idle for longer than ``max_idle`` seconds are
+    discarded rather than reused, which should be kept below the server's
+    ``SESSION_IDLE_TIMEOUT``. A connection that fails mid-request is
+    dropped and the error is raised: the request's token may already have
+    been consumed, so it is not retried.
+
+    The session is thread-safe; concurrent callers each get their own
+    connection and block while all ``pool_size`` are in use.
+    """
+
+    def __init__(self, host=HOST, port=PORT, pool_size=SESSION_POOL_SIZE, pipeline_depth=PIPELINE_DEPTH,
+                 timeout=READ_TIMEOUT, max_idle=SESSION_MAX_IDLE):
+        self.host = host
+        self.port = port
+        self.pipeline_depth = pipeline_depth
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self.stats = {"connections_opened": 0, "connections_reused": 0, "requests": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _acquire(self):
+        self._slots.acquire()
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                connection = self._idle.pop()
+                if now - connection.last_used < self.max_idle:
+                    self.stats["connections_reused"] += 1
+                    return connection
+                connection.close()
+        try:
+            connection = VaultConnection(self.host, self.port, self.timeout)
+        except OSError:
+            self._slots.release()
+            raise
+        self.stats["connections_opened"] += 1
+        return connection
+
+    def _release(self, connection, reusable):
+        if reusable:
+            with self._lock:
+                self._idle.append(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def retrieve(self, token, request):
+        """Performs a single authorised retrieval and returns the response."""
+        return self.retrieve_many([(token, request)])[0]
+
+    def retrieve_many(self, items):
+        """
+        :param items: Iterable of ``(token, request)`` pairs.
+        :return: The responses, in the same order as ``items``.
+        """
+        items = list(items)
+        responses = []
+        connection = self._acquire()
+        reusable = False
+        try:
+            for start in range(0, len(items), self.pipeline_depth):
+                responses.extend(connection.pipeline(items[start:start + self.pipeline_depth]))
+            reusable = True
+        except FrameError as e:
+            raise ConnectionError(f"Malformed response from data vault: {e}") from e
+        finally:
+            self._release(connection, reusable)
+        self.stats["requests"] += len(items)
+        return responses
+
+    def close(self):
+        """Closes every idle pooled connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
@@ -0,0 +1,185 @@
+"""
+Wire codec for the data exchange protocol.
+
+Every message is sent as one or more frames. A frame is a 4-byte
+big-endian header followed by its payload: the low 31 bits of the header
+hold the payload length, and the high bit is set when more frames of the
+same message follow. Large messages are therefore streamed in
+``chunk_size`` pieces, sliced from a memoryview rather than copied, and a
+receiver can process them chunk by chunk with bounded memory.
+"""
+import json
+import struct
+
+from config import CHUNK_SIZE, MAX_MESSAGE_SIZE
+
+HEADER = struct.Struct('>I')
+MORE_FLAG = 0x80000000
+LENGTH_MASK = 0x7FFFFFFF
+
+
+class FrameError(Exception):
+    """Raised on a malformed, truncated or oversized message."""
+
+
+def encode_header(length, more=False):
+    if length > LENGTH_MASK:
+        raise FrameError(f"Frame of {length} bytes exceeds the maximum frame size")
+    return HEADER.pack(length | (MORE_FLAG if more else 0))
+
+
+def decode_header(header):
+    value = HEADER.unpack(header)[0]
+    return value & LENGTH_MASK, bool(value & MORE_FLAG)
+
+
+def iter_frames(payload, chunk_size=CHUNK_SIZE):
+    """Yields ``(header, memoryview_chunk)`` pairs for one complete message."""
+    view = memoryview(payload)
+    if len(view) == 0:
+        yield encode_header(0), view
+        return
+    for start in range(0, len(view), chunk_size):
+        chunk = view[start:start + chunk_size]
+        yield encode_header(len(chunk), more=start + chunk_size < len(view)), chunk
+
+
+def iter_json_frames(obj, chunk_size=CHUNK_SIZE):
+    """
+    Serialises ``obj`` incrementally and yields ``(header, chunk)`` frames, so
+    the encoded document is never held in memory as a whole.
+    """
+    buffer = bytearray()
+    for piece in json.JSONEncoder().iterencode(obj):
+        buffer += piece.encode('utf-8')
+        if len(buffer) > chunk_size:
+            view = memoryview(buffer)
+            full = len(buffer) - len(buffer) % chunk_size
+            if full == len(buffer):
+                # Keep the last chunk back: only the final frame clears the flag.
+                full -= chunk_size
+            for start in range(0, full, chunk_size):
+                yield encode_header(chunk_size, more=True), view[start:start + chunk_size]
+            # Start a fresh buffer rather than resizing one the caller may
+            # still hold views into.
+            buffer = bytearray(view[full:])
+    yield encode_header(len(buffer)), memoryview(buffer)
+
+
+# Blocking sockets
+
+def _recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return None
+            raise FrameError("Connection closed in the middle of a frame")
+        received += count
+    return buffer
+
+
+def send_frames(sock, frames):
+    for header, chunk in frames:
+        sock.sendall(header)
+        if len(chunk):
+            sock.sendall(chunk)
+
+
+def send_message(sock, payload, chunk_size=CHUNK_SIZE):
+    """Sends ``payload`` (bytes, bytearray, memoryview or str) as one message."""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    send_frames(sock, iter_frames(payload, chunk_size))
+
+
+def send_json(sock, obj, chunk_size=CHUNK_SIZE):
+    send_frames(sock, iter_json_frames(obj, chunk_size))
+
+
+def iter_message_chunks(sock, max_size=MAX_MESSAGE_SIZE):
+    """
+    Yields the payload of each frame of the next message. Yields nothing if
+    the peer closed the connection cleanly before a new message started.
+    """
+    total = 0
+    first = True
+    while True:
+        header = _recv_exactly(sock, HEADER.size)
+        if header is None:
+            if first:
+                return
+            raise FrameError("Connection closed in the middle of a message")
+        first = False
+        length, more = decode_header(header)
+        total += length
+        if total > max_size:
+            raise FrameError(f"Message exceeds {max_size} bytes")
+        chunk = _recv_exactly(sock, length) if length else bytearray()
+        if chunk is None:
+            raise FrameError("Connection closed in the middle of a frame")
+        yield chunk
+        if not more:
+            return
+
+
+def recv_message(sock, max_size=MAX_MESSAGE_SIZE):
+    """Returns the next message as bytes, or None on a clean end of stream."""
+    chunks = list(iter_message_chunks(sock, max_size))
+    if not chunks:
+        return None
+    return b''.join(chunks)
+
+
+def recv_json(sock, max_size=MAX_MESSAGE_SIZE):
+    message = recv_message(sock, max_size)
+    return None if message is None else json.loads(message)
+
+
+# asyncio streams. StreamReader.readexactly raises IncompleteReadError, an
+# EOFError, so the threaded server never has to import asyncio.
+
+async def read_message(reader, max_size=MAX_MESSAGE_SIZE):
+    """Reads the next message from a StreamReader; None on a clean end of stream."""
+    chunks = []
+    total = 0
+    while True:
+        try:
+            header = await reader.readexactly(HEADER.size)
+        except EOFError as e:
+            if not e.partial and not chunks:
+                return None
+            raise FrameError("Connection closed in the middle of a message")
+        length, more = decode_header(header)
+        total += length
+        if total > max_size:
+            raise FrameError(f"Message exceeds {max_size} bytes")
+        try:
+            chunks.append(await reader.readexactly(length))
+        except EOFError:
+            raise FrameError("Connection closed in the middle of a frame")
+        if not more:
+            return b''.join(chunks)
+
+
+async def write_frames(writer, frames):
+    for header, chunk in frames:
+        writer.write(header)
+        if len(chunk):
+            writer.write(chunk)
+        # Wait for the transport buffer to drain so a large message never
+        # sits in memory as a whole.
+        await writer.drain()
+
+
+async def write_message(writer, payload, chunk_size=CHUNK_SIZE):
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    await write_frames(writer, iter_frames(payload, chunk_size))
+
+
+async def write_json(writer, obj, chunk_size=CHUNK_SIZE):
+    await write_frames(writer, iter_json_frames(obj, chunk_size))
@@ -0,0 +1,53 @@
+"""
+Reduces a customer record to what one approved request may see.
+
+The gateway binds every token to a release: the fields the partner's policy
+allows for the purpose (``allowed_data``) and the field paths to mask
+(``masked_fields``). Paths are dotted field names in which ``[]`` matches
+every element of a list, e.g. ``email`` or
+``transaction_history[].description``; string values are replaced by
+asterisks of the same length, as the gateway masks staged payloads.
+"""
+
+_EACH = object()
+
+
+def parse_path(path):
+    steps = []
+    for part in path.split('.'):
+        name = part
+        wildcards = 0
+        while name.endswith('[]'):
+            name = name[:-2]
+            wildcards += 1
+        if name:
+            steps.append(name)
+        steps.extend([_EACH] * wildcards)
+    return tuple(steps)
+
+
+def _mask(value, steps):
+    if not steps:
+        return '*' * len(value) if isinstance(value, str) else value
+    step, rest = steps[0], steps[1:]
+    if step is _EACH:
+        return [_mask(item, rest) for item in value] if isinstance(value, list) else value
+    if isinstance(value, dict) and step in value:
+        masked = dict(value)
+        masked[step] = _mask(value[step], rest)
+        return masked
+    return value
+
+
+def release_record(record, allowed_data, masked_fields):
+    """
+    :return: A copy of ``record`` holding only its ``user_id`` and the
+             ``allowed_data`` fields, with ``masked_fields`` masked.
+    """
+    released = {"user_id": record.get('user_id')}
+    for field in allowed_data:
+        if field in record:
+            released[field] = record[field]
+    for path in masked_fields:
+        released = _mask(released, parse_path(path))
+    return released
@@ -0,0 +1,64 @@
+"""
+Metrics for the data vault.
+
+The registry, metric types and text exposition format are the gateway's
+(backend/utils/metrics.py), so both processes render metrics the same way;
+this module adds the vault's stage histogram and ``serve_metrics``, which
+serves the registry over HTTP. When the vault runs inside the gateway's
+process, its metrics are part of the gateway's registry.
+"""
+import os
+import sys
+import threading
+
+# The vault runs from its own directory; the backend package is found next to it.
+_REPOSITORY = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPOSITORY not in sys.path:
+    sys.path.append(_REPOSITORY)
+
+from backend.utils.metrics import CONTENT_TYPE, registry  # noqa: E402
+
+# Time spent in each stage of serving a vault request, labelled by stage.
+STAGE_SECONDS = registry.histogram(
+    'vault_stage_duration_seconds', 'Time spent in each stage of handling a vault request.', ('stage',))
+
+
+def stage_timer(stage):
+    """Returns the STAGE_SECONDS series for ``stage``; resolve it once at import time."""
+    return STAGE_SECONDS.labels(stage)
+
+
+def _handler_class(metrics_registry):
+    # http.server is imported only by processes that serve metrics.
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics_registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are frequent; keep them out of the server's output.
+            pass
+
+    return MetricsHandler
+
+
+def serve_metrics(host, port, metrics_registry=registry):
+    """
+    Serves ``GET /metrics`` for ``metrics_registry`` on a background thread.
+
+    :return: The HTTP server; call ``shutdown()`` to stop it.
+    """
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), _handler_class(metrics_registry))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='vault-metrics', daemon=True).start()
+    return server
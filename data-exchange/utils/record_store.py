@@ -0,0 +1,273 @@
+"""
+Memory-mapped customer record store for the data vault.
+
+A store is a directory holding two files:
+
+``records.ndjson``
+    One JSON record per line. Every record starts with its ``user_id``
+    key, so a record can be checked against the requested id from its
+    first bytes without parsing it.
+
+``records.idx``
+    A header (magic, entry count, size of the data file it covers), the
+    sorted ``key_hash`` of every entry as little-endian 64-bit integers (a
+    BLAKE2b hash of the user id), then the ``(offset, length)`` of each
+    entry in the same order.
+
+Both files are read through mmap. A lookup binary-searches the hashes and
+slices the record's bytes from the data file, so opening the store and
+fetching a record never loads the dataset onto the heap. Records appended
+after the index was built are indexed in memory when the store is opened,
+by scanning only the unindexed tail of the data file; ``rebuild_index``
+folds them into the on-disk index.
+"""
+from bisect import bisect_left
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+DATA_FILE = 'records.ndjson'
+INDEX_FILE = 'records.idx'
+INDEX_MAGIC = b'RIX1'
+_HEADER = struct.Struct('>4s4xQQ')
+_HASH = struct.Struct('<Q')
+_LOCATION = struct.Struct('<QI')
+
+
+def key_hash(user_id):
+    return int.from_bytes(hashlib.blake2b(user_id.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def encode_record(record):
+    """Serialises ``record`` as one NDJSON line with ``user_id`` first."""
+    user_id = record['user_id']
+    ordered = {"user_id": user_id}
+    ordered.update((key, value) for key, value in record.items() if key != 'user_id')
+    return (json.dumps(ordered, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _record_prefix(user_id):
+    return b'{"user_id":' + json.dumps(user_id).encode('utf-8')
+
+
+def _map(path):
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _scan(data, start=0):
+    """Yields ``(user_id, offset, length)`` for each record line in ``data`` from ``start``."""
+    offset = start
+    end = len(data)
+    while offset < end:
+        newline = data.find(b'\n', offset)
+        if newline == -1:
+            # An unterminated last line is a partial append; ignore it.
+            return
+        line = data[offset:newline]
+        if line.strip():
+            try:
+                user_id = json.loads(line)['user_id']
+            except (ValueError, KeyError, TypeError):
+                # The remains of an interrupted append.
+                user_id = None
+            if user_id is not None:
+                yield user_id, offset, newline - offset
+        offset = newline + 1
+
+
+def write_index(directory, entries, data_size):
+    """
+    Writes the index for ``entries`` (``(user_id, offset, length)``, later
+    entries for the same user winning) atomically.
+    """
+    latest = {}
+    for user_id, offset, length in entries:
+        latest[user_id] = (offset, length)
+    packed = sorted((key_hash(user_id), offset, length) for user_id, (offset, length) in latest.items())
+    path = os.path.join(directory, INDEX_FILE)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(_HEADER.pack(INDEX_MAGIC, len(packed), data_size))
+        file.write(b''.join(_HASH.pack(hashed) for hashed, _, _ in packed))
+        file.write(b''.join(_LOCATION.pack(offset, length) for _, offset, length in packed))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    return len(packed)
+
+
+def build_store(directory, records):
+    """
+    Creates (or replaces) a store in ``directory`` from an iterable of
+    record dictionaries, streaming them to disk.
+
+    :return: Number of distinct user ids indexed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    entries = []
+    offset = 0
+    data_path = os.path.join(directory, DATA_FILE)
+    with open(data_path + '.tmp', 'wb') as file:
+        for record in records:
+            line = encode_record(record)
+            file.write(line)
+            entries.append((record['user_id'], offset, len(line) - 1))
+            offset += len(line)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(data_path + '.tmp', data_path)
+    return write_index(directory, entries, offset)
+
+
+class _Hashes:
+    """Sequence view of the hash section for big-endian hosts, where it cannot be cast in place."""
+
+    def __init__(self, view):
+        self._view = view
+
+    def __len__(self):
+        return len(self._view) // _HASH.size
+
+    def __getitem__(self, i):
+        return _HASH.unpack_from(self._view, i * _HASH.size)[0]
+
+
+class RecordStore:
+    """Read access to a store built by ``build_store``, plus appends."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.data_path = os.path.join(directory, DATA_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._lock = threading.Lock()
+        if not os.path.exists(self.data_path):
+            build_store(directory, ())
+        self._open()
+
+    def _open(self):
+        self._data = _map(self.data_path)
+        self._index = _map(self.index_path) if os.path.exists(self.index_path) else None
+        self._count = 0
+        self._hashes = ()
+        indexed_size = 0
+        if self._index is not None:
+            magic, self._count, indexed_size = _HEADER.unpack_from(self._index, 0)
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"{self.index_path} is not a record index")
+            view = memoryview(self._index)[_HEADER.size:_HEADER.size + self._count * _HASH.size]
+            # bisect then runs over the mapped hashes in C.
+            self._hashes = view.cast('Q') if sys.byteorder == 'little' else _Hashes(view)
+            self._locations_at = _HEADER.size + self._count * _HASH.size
+        self._recent = {}
+        if self._data is not None:
+            for user_id, offset, length in _scan(self._data, indexed_size):
+                self._recent[user_id] = (offset, length)
+
+    def __len__(self):
+        """Number of index entries plus records appended since; an upper bound on distinct users."""
+        return self._count + len(self._recent)
+
+    def _locate(self, user_id):
+        location = self._recent.get(user_id)
+        if location is not None:
+            return location
+        if not self._count:
+            return None
+        target = key_hash(user_id)
+        hashes = self._hashes
+        i = bisect_left(hashes, target)
+        prefix = _record_prefix(user_id)
+        while i < self._count and hashes[i] == target:
+            offset, length = _LOCATION.unpack_from(self._index, self._locations_at + i * _LOCATION.size)
+            i += 1
+            head = self._data[offset:offset + len(prefix) + 1]
+            if head[:-1] == prefix and head[-1:] in (b',', b'}'):
+                return offset, length
+        return None
+
+    def get_bytes(self, user_id):
+        """Returns the encoded record for ``user_id`` as a memoryview of the map, or None."""
+        with self._lock:
+            location = self._locate(user_id)
+            if location is None:
+                return None
+            offset, length = location
+            return memoryview(self._data)[offset:offset + length]
+
+    def get(self, user_id):
+        """Returns the decoded record for ``user_id``, or None."""
+        with self._lock:
+            location = self._locate(user_id)
+            if location is None:
+                return None
+            offset, length = location
+            return json.loads(self._data[offset:offset + length])
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return self._locate(user_id) is not None
+
+    def append(self, record):
+        """Appends ``record``; it replaces any earlier record for the same user."""
+        self.append_many((record,))
+
+    def append_many(self, records):
+        lines = [(record['user_id'], encode_record(record)) for record in records]
+        with self._lock:
+            with open(self.data_path, 'ab') as file:
+                if self._data is not None and self._data[-1:] != b'\n':
+                    # Close off a partial line left by an interrupted append.
+                    file.write(b'\n')
+                offset = file.tell()
+                file.write(b''.join(line for _, line in lines))
+            for user_id, line in lines:
+                self._recent[user_id] = (offset, len(line) - 1)
+                offset += len(line)
+            self._remap_data()
+
+    def _remap_data(self):
+        old = self._data
+        self._data = _map(self.data_path)
+        if old is not None:
+            try:
+                old.close()
+            except BufferError:
+                # A caller still holds a view from get_bytes; the old map is
+                # released once that view is gone.
+                pass
+
+    def rebuild_index(self):
+        """
+        Rewrites the index over the whole data file, including appended
+        records, and reopens the store.
+
+        :return: Number of distinct user ids indexed.
+        """
+        with self._lock:
+            data = self._data
+            entries = _scan(data) if data is not None else ()
+            # A partial last line is left outside the index.
+            indexed_size = data.rfind(b'\n') + 1 if data is not None else 0
+            count = write_index(self.directory, entries, indexed_size)
+            self.close()
+            self._open()
+        return count
+
+    def close(self):
+        if isinstance(self._hashes, memoryview):
+            self._hashes.release()
+        self._hashes = ()
+        for mapped in (self._data, self._index):
+            if mapped is not None:
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass
+        self._data = self._index = None
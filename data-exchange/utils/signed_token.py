@@ -0,0 +1,47 @@
+"""
+Verification of the HS256 JWTs the policy gateway mints on approval.
+
+The vault runs without the backend package, so this checks the signature
+itself: a token is accepted only with an ``HS256`` header and a signature
+made with the shared key. Expiry is left to the caller, which needs the
+``exp`` claim anyway to decide how long to remember the token.
+"""
+import base64
+import hashlib
+import hmac
+import json
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+def decode_hs256(token, secret_key):
+    """
+    :param token: Encoded JWT string.
+    :param secret_key: Key the gateway signs tokens with, as str or bytes.
+    :return: The claims if the token is well formed and its signature is
+             valid, else None. The claims always hold a numeric ``exp``.
+    """
+    if isinstance(secret_key, str):
+        secret_key = secret_key.encode('utf-8')
+    if isinstance(token, str):
+        token = token.encode('ascii', 'replace')
+    if not isinstance(token, bytes):
+        return None
+    signing_input, dot, signature = token.rpartition(b'.')
+    header, dot_, payload = signing_input.partition(b'.')
+    if not dot or not dot_:
+        return None
+    try:
+        if json.loads(_b64decode(header)).get('alg') != 'HS256':
+            return None
+        expected = hmac.new(secret_key, signing_input, hashlib.sha256).digest()
+        if not hmac.compare_digest(_b64decode(signature), expected):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get('exp'), (int, float)):
+        return None
+    return claims
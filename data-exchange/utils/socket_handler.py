@@ -1,3 +1,5 @@
+from utils.framing import send_message, recv_message, send_json, recv_json, iter_message_chunks
+
 class SocketHandler:
     def __init__(self, host='localhost', port=9999):
         self.host = host
@@ -21,6 +23,24 @@ class SocketHandler:
     def receive_data(self, conn, buffer_size=1024):
         return conn.recv(buffer_size)
 
+    def send_message(self, conn, payload):
+        """Sends one length-prefixed message, split into frames if it is large."""
+        send_message(conn, payload)
+
+    def receive_message(self, conn):
+        """Receives one complete message; None if the peer closed the connection."""
+        return recv_message(conn)
+
+    def iter_message_chunks(self, conn):
+        """Yields the next message frame by frame, for processing with bounded memory."""
+        return iter_message_chunks(conn)
+
+    def send_json(self, conn, obj):
+        send_json(conn, obj)
+
+    def receive_json(self, conn):
+        return recv_json(conn)
+
     def close_connection(self, conn):
         conn.close()
 
@@ -0,0 +1,139 @@
+import math
+import threading
+import time
+
+
+class TokenLedger:
+    """
+    Tracks issued tokens, lets each be consumed once, and forgets them when
+    they expire.
+
+    Expiry uses a hashed timing wheel: ``ceil(max_ttl / resolution) + 1``
+    slots, each holding the tokens that expire in that tick. Issuing and
+    consuming a token are O(1) set/dict operations, and advancing the wheel
+    clears each elapsed slot once, so expiry is O(1) amortised per token.
+    Memory is bounded by the number of live (issued, unconsumed, unexpired)
+    tokens.
+    """
+
+    def __init__(self, max_ttl, resolution=1.0, clock=time.monotonic):
+        self.max_ttl = max_ttl
+        self.resolution = resolution
+        self._clock = clock
+        self._slots = [set() for _ in range(int(math.ceil(max_ttl / resolution)) + 1)]
+        self._tokens = {}
+        self._tick = self._tick_for(clock())
+        self._lock = threading.Lock()
+        self.stats = {"issued": 0, "consumed": 0, "expired": 0, "rejected": 0}
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __contains__(self, token):
+        return self.peek(token)
+
+    def _tick_for(self, timestamp):
+        return int(timestamp // self.resolution)
+
+    def _advance(self, now):
+        tick = self._tick_for(now)
+        if tick <= self._tick:
+            return
+        # Every tick between the last one we processed and now has elapsed.
+        # A jump longer than the wheel visits each slot once.
+        elapsed = min(tick - self._tick, len(self._slots))
+        for step in range(1, elapsed + 1):
+            slot = self._slots[(self._tick + step) % len(self._slots)]
+            for token in slot:
+                del self._tokens[token]
+            self.stats["expired"] += len(slot)
+            slot.clear()
+        self._tick = tick
+
+    def issue(self, token, ttl=None):
+        """
+        Records a token that may be consumed once within ``ttl`` seconds.
+
+        :param ttl: Lifetime in seconds; defaults to and may not exceed ``max_ttl``.
+        """
+        ttl = self._check_ttl(ttl)
+        with self._lock:
+            now = self._clock()
+            self._advance(now)
+            self._issue(token, now + ttl)
+
+    def issue_new(self, token, ttl=None):
+        """
+        Like ``issue``, but leaves a live token untouched, so of several
+        callers racing to record the same token exactly one succeeds.
+
+        :return: True if the token was issued, False if it was already live.
+        """
+        ttl = self._check_ttl(ttl)
+        with self._lock:
+            now = self._clock()
+            self._advance(now)
+            entry = self._tokens.get(token)
+            if entry is not None and now < entry[0]:
+                return False
+            self._issue(token, now + ttl)
+            return True
+
+    def _check_ttl(self, ttl):
+        ttl = self.max_ttl if ttl is None else ttl
+        if ttl > self.max_ttl:
+            raise ValueError(f"Invalid ttl: must be at most {self.max_ttl} seconds.")
+        return ttl
+
+    def _issue(self, token, expires_at):
+        if token in self._tokens:
+            self._slots[self._tokens[token][1]].discard(token)
+        # The token's slot is the first tick at or after its expiry, so it
+        # is cleared no earlier than expires_at.
+        slot_index = int(math.ceil(expires_at / self.resolution)) % len(self._slots)
+        self._tokens[token] = (expires_at, slot_index)
+        self._slots[slot_index].add(token)
+        self.stats["issued"] += 1
+
+    def consume(self, token):
+        """
+        Uses up a token.
+
+        :return: True if the token was live and is now consumed, False if it
+                 was never issued, already consumed or has expired.
+        """
+        with self._lock:
+            now = self._clock()
+            self._advance(now)
+            entry = self._tokens.pop(token, None)
+            if entry is None:
+                self.stats["rejected"] += 1
+                return False
+            expires_at, slot_index = entry
+            self._slots[slot_index].discard(token)
+            if now >= expires_at:
+                self.stats["expired"] += 1
+                self.stats["rejected"] += 1
+                return False
+            self.stats["consumed"] += 1
+            return True
+
+    def peek(self, token):
+        """Returns True if the token is live, without consuming it."""
+        with self._lock:
+            entry = self._tokens.get(token)
+            return entry is not None and self._clock() < entry[0]
+
+    def is_expired(self, token):
+        """
+        Returns True if the token is still tracked but past its expiry. Tokens
+        are forgotten once the wheel clears them, after which this is False.
+        """
+        with self._lock:
+            entry = self._tokens.get(token)
+            return entry is not None and self._clock() >= entry[0]
+
+    def expire(self):
+        """Clears every slot that has elapsed; call periodically when idle."""
+        with self._lock:
+            self._advance(self._clock())
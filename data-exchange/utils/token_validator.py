@@ -1,20 +1,65 @@
+import time
+
+from config import TOKEN_EXPIRY
+from utils.signed_token import decode_hs256
+from utils.token_ledger import TokenLedger
+
 class TokenValidator:
-    def __init__(self, valid_tokens):
-        self.valid_tokens = valid_tokens
+    """
+    Decides whether the token on a vault request may be used, consuming it.
+
+    Tokens are either issued to the validator directly, or, with a
+    ``secret_key``, minted by the policy gateway: an HS256 JWT signed with
+    the shared key is accepted once before its ``exp``, without the gateway
+    telling the vault about it. Used signed tokens are remembered in a
+    second ledger until they expire, so a replay is refused. A signed token
+    may not outlive ``ttl``, which bounds how long that takes.
+    """
+
+    def __init__(self, valid_tokens=(), ttl=TOKEN_EXPIRY, ledger=None, secret_key=None, clock=time.time):
+        self.ledger = ledger if ledger is not None else TokenLedger(max_ttl=ttl)
+        for token in valid_tokens:
+            self.ledger.issue(token)
+        self.secret_key = secret_key
+        self._clock = clock
+        self.used = TokenLedger(max_ttl=self.ledger.max_ttl, clock=clock) if secret_key is not None else None
+
+    def issue(self, token, ttl=None):
+        """Register a token that may be used once before it expires."""
+        self.ledger.issue(token, ttl)
 
     def is_valid(self, token):
         """Check if the provided token is valid."""
-        return token in self.valid_tokens
+        return self.ledger.peek(token)
 
     def is_expired(self, token):
         """Check if the provided token has expired."""
-        # Placeholder for expiration logic
-        return False
+        return self.ledger.is_expired(token)
 
     def validate(self, token):
-        """Validate the token and return its status."""
+        """
+        Validate the token, consuming it, and return its status. A valid
+        signed token also returns its ``claims``.
+        """
         if self.is_expired(token):
+            self.ledger.consume(token)
             return {"status": "error", "message": "Token has expired"}
-        if self.is_valid(token):
+        if self.ledger.consume(token):
             return {"status": "success", "message": "Token is valid"}
-        return {"status": "error", "message": "Invalid token"}
\ No newline at end of file
+        if self.secret_key is not None:
+            return self.validate_signed(token)
+        return {"status": "error", "message": "Invalid token"}
+
+    def validate_signed(self, token):
+        """Validate a token minted by the gateway, consuming it."""
+        claims = decode_hs256(token, self.secret_key)
+        if claims is None:
+            return {"status": "error", "message": "Invalid token"}
+        remaining = claims["exp"] - self._clock()
+        if remaining <= 0:
+            return {"status": "error", "message": "Token has expired"}
+        if remaining > self.used.max_ttl:
+            return {"status": "error", "message": "Token lifetime exceeds the vault's limit"}
+        if not self.used.issue_new(token, remaining):
+            return {"status": "error", "message": "Token has already been used"}
+        return {"status": "success", "message": "Token is valid", "claims": claims}
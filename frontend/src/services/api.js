@@ -37,4 +37,26 @@ export const getPolicies = async () => {
         console.error('Error fetching policies:', error);
         throw error;
     }
-};
\ No newline at end of file
+};
+
+// Function to get policy decision counts by partner, purpose and outcome
+export const getDecisionSummary = async (params = {}) => {
+    try {
+        const response = await axios.get(`${API_BASE_URL}/logs/decisions`, { params });
+        return response.data;
+    } catch (error) {
+        console.error('Error fetching decision summary:', error);
+        throw error;
+    }
+};
+
+// Function to get audit access counts by partner, purpose, user and hour
+export const getAuditStats = async (params = {}) => {
+    try {
+        const response = await axios.get(`${API_BASE_URL}/logs/stats`, { params });
+        return response.data;
+    } catch (error) {
+        console.error('Error fetching audit stats:', error);
+        throw error;
+    }
+};
@@ -0,0 +1,66 @@
+"""
+Builds the data vault's memory-mapped record store from customer data.
+
+The input is a JSON file holding a list of records or ``{"users": [...]}``
+(as written by generate_mock_data.py), or a JSON Lines file with one record
+per line, which is streamed rather than loaded whole.
+
+Usage (from the repository root):
+    python scripts/build_record_store.py [input] [--store DIR]
+    python scripts/build_record_store.py new_records.jsonl --append [--store DIR]
+    python scripts/build_record_store.py --rebuild-index [--store DIR]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data-exchange'))
+
+from utils.record_store import RecordStore, build_store  # noqa: E402
+
+DEFAULT_INPUT = 'backend/data/mock_data.json'
+DEFAULT_STORE_DIR = 'backend/data/records'
+
+
+def iter_records(path):
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, 'r') as f:
+        data = json.load(f)
+    yield from data.get('users', []) if isinstance(data, dict) else data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', nargs='?', default=DEFAULT_INPUT)
+    parser.add_argument('--store', dest='store_dir', default=DEFAULT_STORE_DIR, help='record store directory')
+    parser.add_argument('--append', action='store_true', help='append the input to an existing store')
+    parser.add_argument('--rebuild-index', action='store_true', help='only rebuild the index of store_dir')
+    args = parser.parse_args()
+
+    if args.rebuild_index:
+        count = RecordStore(args.store_dir).rebuild_index()
+        print(f"Indexed {count} users in {args.store_dir}")
+    elif args.append:
+        store = RecordStore(args.store_dir)
+        batch = []
+        for record in iter_records(args.input):
+            batch.append(record)
+            if len(batch) >= 1000:
+                store.append_many(batch)
+                batch = []
+        if batch:
+            store.append_many(batch)
+        print(f"Appended to {args.store_dir}; run with --rebuild-index to fold the new records into the index")
+    else:
+        count = build_store(args.store_dir, iter_records(args.input))
+        print(f"Built {args.store_dir} with {count} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,53 @@
+"""
+Mock data generator.
+
+Without arguments, writes 100 Faker-generated records to
+backend/data/mock_data.json as before.
+
+With ``--users``, streams a seedable, deterministic dataset as JSON Lines
+with constant memory, split into fixed-size shards that a process pool
+generates in parallel. Each shard is seeded from ``(seed, shard)`` and user
+ids follow the record's position, so the output is byte-for-byte the same
+for a given seed and shard size whatever the number of processes. Policy,
+consent and audit-log fixtures for the gateway can be written alongside.
+
+Usage (from the repository root):
+    python scripts/generate_mock_data.py
+    python scripts/generate_mock_data.py --users 10000000 --output data/users.jsonl --processes 8 --seed 42
+    python scripts/generate_mock_data.py --users 100000 --output data/users.jsonl \\
+        --consents-output data/consents.jsonl --policies 500 --policies-output data/policies.json \\
+        --audit-logs 1000000 --audit-log-dir data/audit_logs
+"""
+import argparse
+from datetime import datetime, timedelta
 import json
+from multiprocessing import Pool
+import os
 import random
-from faker import Faker
+import shutil
+import sys
+
+FIRST_NAMES = ["Alice", "Bob", "Carol", "David", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy", "Mallory",
+               "Niaj", "Olivia", "Peggy", "Rupert", "Sybil", "Trent", "Victor", "Walter", "Yasmin"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Martinez", "Lopez",
+              "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Thompson", "White"]
+STREETS = ["Main St", "Oak Ave", "Pine Rd", "Maple Dr", "Cedar Ln", "Elm St", "Park Ave", "Lake Rd"]
+CITIES = ["Springfield", "Riverton", "Fairview", "Franklin", "Greenville", "Bristol", "Clinton", "Salem"]
+DESCRIPTIONS = ["Deposit", "Withdrawal", "Card payment", "Transfer in", "Transfer out", "Salary", "Rent",
+                "Utilities", "Groceries", "Loan repayment", "Interest", "Refund"]
+PURPOSES = ["loan_application", "credit_scoring", "regulatory_reporting", "third_party_integration"]
+DATA_SEGMENTS = ["transaction_history", "credit_score", "transaction_summary", "account_balance",
+                 "basic_profile", "email", "phone"]
+CONDITIONS = ["User consent must be obtained", "Data must be anonymized", "Data must be encrypted",
+              "Access logs must be maintained"]
+BASE_DATE = datetime(2023, 1, 1)
+SHARD_SIZE = 100000
 
-fake = Faker()
 
 def generate_mock_data(num_records=100):
+    from faker import Faker
+
+    fake = Faker()
     mock_data = []
     for _ in range(num_records):
         record = {
@@ -23,13 +66,190 @@ def generate_mock_data(num_records=100):
             ]
         }
         mock_data.append(record)
-    
+
     return mock_data
 
 def save_mock_data_to_file(data, filename='backend/data/mock_data.json'):
     with open(filename, 'w') as f:
         json.dump(data, f, indent=4)
 
+
+# Streaming generation
+
+def user_id_for(index):
+    return f"user_{index:08d}"
+
+
+def generate_user(rng, index):
+    """Builds one user record from ``rng``; the same rng state gives the same record."""
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    user_id = user_id_for(index)
+    return {
+        "user_id": user_id,
+        "name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}{index}@example.com",
+        "phone": f"+1-{rng.randint(200, 999)}-555-{rng.randint(0, 9999):04d}",
+        "address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}",
+        "transaction_history": [
+            {
+                "transaction_id": f"txn_{index}_{n}",
+                "amount": round(rng.uniform(-1000.0, 1000.0), 2),
+                "date": (BASE_DATE + timedelta(minutes=rng.randrange(365 * 24 * 60))).isoformat(),
+                "description": rng.choice(DESCRIPTIONS),
+            } for n in range(rng.randint(1, 5))
+        ],
+        "credit_score": rng.randint(300, 850),
+        "consent": {purpose: rng.random() < 0.8 for purpose in PURPOSES},
+    }
+
+
+def _shard_path(path, shard):
+    return f"{path}.part-{shard:05d}"
+
+
+def generate_shard(args):
+    """
+    Writes users ``[start, stop)`` of one shard to part files. Runs in a
+    pool worker, so it takes and returns plain tuples.
+    """
+    seed, shard, start, stop, output, consents_output = args
+    rng = random.Random(f"{seed}:{shard}")
+    with open(_shard_path(output, shard), 'w') as users_file:
+        consents_file = open(_shard_path(consents_output, shard), 'w') if consents_output else None
+        try:
+            for index in range(start, stop):
+                user = generate_user(rng, index)
+                users_file.write(json.dumps(user, separators=(',', ':')))
+                users_file.write('\n')
+                if consents_file is not None:
+                    consents_file.write(json.dumps({"user_id": user["user_id"], "consent": user["consent"]},
+                                                   separators=(',', ':')))
+                    consents_file.write('\n')
+        finally:
+            if consents_file is not None:
+                consents_file.close()
+    return shard, stop - start
+
+
+def _concatenate(output, shards):
+    with open(output, 'wb') as out:
+        for shard in range(shards):
+            part = _shard_path(output, shard)
+            with open(part, 'rb') as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+            os.remove(part)
+
+
+def generate_users(output, users, seed=0, processes=None, shard_size=SHARD_SIZE, consents_output=None):
+    """
+    Streams ``users`` records to ``output`` as JSON Lines, generating
+    shards of ``shard_size`` users on ``processes`` worker processes.
+    """
+    for path in (output, consents_output):
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    shards = [(seed, shard, start, min(start + shard_size, users), output, consents_output)
+              for shard, start in enumerate(range(0, users, shard_size))]
+    if processes == 1 or len(shards) <= 1:
+        for shard in shards:
+            generate_shard(shard)
+    else:
+        with Pool(processes) as pool:
+            for shard, count in pool.imap_unordered(generate_shard, shards):
+                print(f"  shard {shard}: {count} users", file=sys.stderr)
+    _concatenate(output, len(shards))
+    if consents_output:
+        _concatenate(consents_output, len(shards))
+
+
+def generate_policies(count, seed=0):
+    """Returns ``count`` partner policies in the ``{"policies": [...]}`` layout."""
+    rng = random.Random(f"{seed}:policies")
+    policies = []
+    for i in range(count):
+        policies.append({
+            "partner_id": f"partner_{i:05d}",
+            "data_usage": [
+                {
+                    "purpose": purpose,
+                    "allowed_data": rng.sample(DATA_SEGMENTS, rng.randint(1, 3)),
+                    "conditions": rng.sample(CONDITIONS, rng.randint(1, 2)),
+                } for purpose in rng.sample(PURPOSES, rng.randint(1, 2))
+            ],
+        })
+    return {"policies": policies}
+
+
+def iter_audit_logs(count, users, partners, seed=0, start=BASE_DATE, interval=timedelta(seconds=1)):
+    """Yields ``count`` access log entries in timestamp order."""
+    rng = random.Random(f"{seed}:audit")
+    for i in range(count):
+        yield {
+            "timestamp": (start + interval * i).isoformat(),
+            "user_id": user_id_for(rng.randrange(users)),
+            "partner_id": f"partner_{rng.randrange(partners):05d}",
+            "purpose": rng.choice(PURPOSES),
+            "data_accessed": rng.sample(DATA_SEGMENTS, rng.randint(1, 3)),
+        }
+
+
+def write_audit_logs(directory, entries, batch_size=10000):
+    """Appends entries to a SegmentedAuditStore in ``directory``, in batches."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from backend.services.audit_store import SegmentedAuditStore
+
+    store = SegmentedAuditStore(directory)
+    written = 0
+    batch = []
+    try:
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                store.append_many(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            store.append_many(batch)
+            written += len(batch)
+    finally:
+        store.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate mock customer data and gateway fixtures.")
+    parser.add_argument('--users', type=int, help='number of users to stream as JSON Lines')
+    parser.add_argument('--output', default='backend/data/mock_users.jsonl')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--consents-output', help='also write each user\'s consents as JSON Lines')
+    parser.add_argument('--policies', type=int, default=0, help='number of partner policies to generate')
+    parser.add_argument('--policies-output', default='backend/data/mock_policies.json')
+    parser.add_argument('--audit-logs', type=int, default=0, help='number of audit log entries to generate')
+    parser.add_argument('--audit-log-dir', default='backend/data/mock_audit_logs')
+    args = parser.parse_args()
+
+    if args.users is None and not args.policies and not args.audit_logs:
+        mock_data = generate_mock_data()
+        save_mock_data_to_file(mock_data)
+        return
+
+    if args.users:
+        generate_users(args.output, args.users, seed=args.seed, processes=args.processes,
+                       shard_size=args.shard_size, consents_output=args.consents_output)
+        print(f"Wrote {args.users} users to {args.output}")
+    if args.policies:
+        with open(args.policies_output, 'w') as f:
+            json.dump(generate_policies(args.policies, seed=args.seed), f, indent=2)
+        print(f"Wrote {args.policies} policies to {args.policies_output}")
+    if args.audit_logs:
+        entries = iter_audit_logs(args.audit_logs, users=args.users or 1000, partners=args.policies or 100,
+                                  seed=args.seed)
+        written = write_audit_logs(args.audit_log_dir, entries)
+        print(f"Wrote {written} audit log entries to {args.audit_log_dir}")
+
+
 if __name__ == "__main__":
-    mock_data = generate_mock_data()
-    save_mock_data_to_file(mock_data)
\ No newline at end of file
+    main()
@@ -0,0 +1,53 @@
+"""
+Folds audit and policy decision logs written by earlier releases into the segmented stores.
+
+Older releases kept every audit entry in one JSON array
+(``AUDIT_LEGACY_LOG_FILE``) and every policy decision in another
+(``POLICY_LEGACY_DECISION_LOG_FILE``). This copies those entries into the
+stores under ``AUDIT_LOG_DIR`` and ``POLICY_DECISION_LOG_DIR`` and renames
+each file to ``<file>.migrated``, so running it again is a no-op. The
+gateway never migrates on its own; run this once, before starting the
+upgraded gateway.
+
+Usage (from the repository root):
+    python scripts/migrate_audit_logs.py [--legacy-file FILE] [--audit-dir DIR]
+        [--legacy-decision-file FILE] [--decision-dir DIR]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from backend.config import Config  # noqa: E402
+from backend.services.audit_service import AuditService  # noqa: E402
+from backend.services.audit_store import SegmentedAuditStore, migrate_legacy_log  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--legacy-file', default=Config.AUDIT_LEGACY_LOG_FILE)
+    parser.add_argument('--audit-dir', default=Config.AUDIT_LOG_DIR)
+    parser.add_argument('--legacy-decision-file', default=Config.POLICY_LEGACY_DECISION_LOG_FILE)
+    parser.add_argument('--decision-dir', default=Config.POLICY_DECISION_LOG_DIR)
+    args = parser.parse_args()
+
+    service = AuditService(audit_log_dir=args.audit_dir, legacy_log_file=args.legacy_file, async_writes=False)
+    try:
+        migrated = service.migrate_legacy_log()
+    finally:
+        service.close()
+    print(f"Migrated {migrated} audit entries from {args.legacy_file} into {args.audit_dir}")
+
+    migrated = 0
+    if os.path.exists(args.legacy_decision_file):
+        store = SegmentedAuditStore(args.decision_dir, multi_process=Config.AUDIT_MULTI_PROCESS)
+        try:
+            migrated = migrate_legacy_log(args.legacy_decision_file, store)
+        finally:
+            store.close()
+    print(f"Migrated {migrated} policy decisions from {args.legacy_decision_file} into {args.decision_dir}")
+
+
+if __name__ == '__main__':
+    main()
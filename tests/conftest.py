@@ -0,0 +1,23 @@
+import os
+import shutil
+import tempfile
+
+# Routes build their services on import from Config, which reads the
+# environment once; point every data path at a scratch directory before any
+# test imports the backend so the tracked files under backend/data are never
+# written, migrated or renamed.
+_DATA_DIR = tempfile.mkdtemp(prefix='fintrust-tests-')
+for _name, _path in {
+    'AUDIT_LOG_DIR': 'audit_logs',
+    'AUDIT_LEGACY_LOG_FILE': 'audit_logs.json',
+    'POLICY_DECISION_LOG_DIR': 'policy_logs',
+    'POLICY_LEGACY_DECISION_LOG_FILE': 'policy_logs.json',
+    'POLICY_DECISION_ROLLUP_DIR': 'policy_rollups',
+}.items():
+    os.environ[_name] = os.path.join(_DATA_DIR, _path)
+# Nor is a compiled snapshot cached next to the tracked policy file.
+os.environ['POLICY_SNAPSHOT_CACHE'] = 'false'
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
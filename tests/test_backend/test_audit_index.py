@@ -0,0 +1,98 @@
+from itertools import islice
+import pytest
+from backend.services.audit_index import AuditIndex, decode_cursor, encode_cursor
+from backend.services.audit_service import AuditService
+from backend.services.audit_store import SegmentedAuditStore
+
+def make_entry(i):
+    return {
+        "timestamp": f"2024-01-{1 + i // 24:02d}T{i % 24:02d}:00:00",
+        "user_id": f"user_{i % 5}",
+        "partner_id": "partner_ABC" if i % 2 else "partner_XYZ",
+        "purpose": "loan_application",
+        "seq": i,
+    }
+
+@pytest.fixture
+def service(tmp_path):
+    service = AuditService(audit_log_dir=str(tmp_path / "audit"), legacy_log_file=str(tmp_path / "none.json"),
+                           async_writes=False)
+    service.index.block_size = 8
+    for i in range(100):
+        service.append_log_entry(make_entry(i))
+    yield service
+    service.close()
+
+def brute_force(service, user_id=None, partner_id=None, since=None, until=None):
+    return [
+        log for log in service.get_audit_logs()
+        if (user_id is None or log["user_id"] == user_id)
+        and (partner_id is None or log["partner_id"] == partner_id)
+        and (since is None or log["timestamp"] >= since)
+        and (until is None or log["timestamp"] <= until)
+    ]
+
+@pytest.mark.parametrize("filters", [
+    {"user_id": "user_3"},
+    {"partner_id": "partner_ABC"},
+    {"user_id": "user_3", "partner_id": "partner_ABC"},
+    {"since": "2024-01-02T05:00:00", "until": "2024-01-03T02:00:00"},
+    {"user_id": "user_1", "partner_id": "partner_ABC", "since": "2024-01-03T00:00:00"},
+    {"user_id": "missing"},
+])
+def test_query_matches_full_scan(service, filters):
+    assert service.query(**filters) == brute_force(service, **filters)
+
+def test_time_query_skips_blocks(service):
+    ranges = service.index.time_ranges("2024-01-04T00:00:00", None)
+    first_start = ranges[0][0]
+    assert first_start > (1, 0)
+
+def test_index_rebuilt_on_startup(tmp_path, service):
+    reopened = AuditService(audit_log_dir=service.audit_log_dir, legacy_log_file=str(tmp_path / "none.json"),
+                            async_writes=False)
+    assert reopened.index.count == 100
+    assert reopened.query(user_id="user_2") == brute_force(service, user_id="user_2")
+    reopened.close()
+
+def test_drop_segments_forgets_locations():
+    index = AuditIndex(block_size=2)
+    for i in range(4):
+        index.add((1 if i < 2 else 2, i * 10), make_entry(i))
+    index.drop_segments([1])
+    assert index.lookup(user_id="user_0") == []
+    assert index.lookup(user_id="user_2") == [(2, 20)]
+
+def test_retention_keeps_records_of_blocks_spanning_dropped_segments(tmp_path):
+    store = SegmentedAuditStore(str(tmp_path / "audit"), max_segment_bytes=2000, retention_segments=3)
+    service = AuditService(legacy_log_file=str(tmp_path / "none.json"), store=store, async_writes=False)
+    # Blocks of 16 records straddle segments of roughly 15 records.
+    service.index.block_size = 16
+    for i in range(200):
+        service.append_log_entry(make_entry(i))
+    assert service.get_audit_logs()[0]["seq"] > 0
+
+    since = "2024-01-01T00:00:00"
+    for filters in ({"user_id": "user_1"}, {"user_id": "user_1", "since": since}, {"since": since}):
+        assert service.query(**filters) == brute_force(service, **filters)
+    service.close()
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"user_id": "user_3"},
+    {"since": "2024-01-02T05:00:00", "until": "2024-01-04T02:00:00"},
+])
+def test_cursor_pages_cover_query(service, filters):
+    pages = []
+    after = None
+    while True:
+        page = list(islice(service.iter_query(after=after, **filters), 7))
+        if not page:
+            break
+        pages.extend(record for _, record in page)
+        after = decode_cursor(encode_cursor(page[-1][0]))
+    assert pages == brute_force(service, **filters)
+
+def test_invalid_cursor_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import pytest
+from backend.services.audit_service import AuditService
+from backend.services.audit_store import SegmentedAuditStore
+from backend.services.audit_writer import BatchWriter
+
+@pytest.fixture
+def store(tmp_path):
+    store = SegmentedAuditStore(str(tmp_path / "audit"), max_segment_bytes=256)
+    yield store
+    store.close()
+
+def make_entry(i):
+    return {"user_id": f"user_{i}", "partner_id": "partner_ABC", "purpose": "loan_application", "seq": i}
+
+def test_append_and_iterate_in_order(store):
+    for i in range(20):
+        store.append(make_entry(i))
+    records = [record for _, record in store.iter_records()]
+    assert [r["seq"] for r in records] == list(range(20))
+    assert len(store.segment_ids()) > 1
+
+def test_iterate_from_location(store):
+    locations = store.append_many([make_entry(i) for i in range(10)])
+    records = [record["seq"] for _, record in store.iter_records(start=locations[4])]
+    assert records == list(range(4, 10))
+
+def test_compressed_segments_are_readable(tmp_path):
+    store = SegmentedAuditStore(str(tmp_path / "audit"), max_segment_bytes=256, compress_closed=True)
+    for i in range(20):
+        store.append(make_entry(i))
+    names = os.listdir(tmp_path / "audit")
+    assert any(name.endswith(".ndjson.gz") for name in names)
+    assert [r["seq"] for _, r in store.iter_records()] == list(range(20))
+    store.close()
+
+def test_reopen_continues_active_segment(tmp_path):
+    store = SegmentedAuditStore(str(tmp_path / "audit"))
+    store.append(make_entry(0))
+    store.close()
+    store = SegmentedAuditStore(str(tmp_path / "audit"))
+    store.append(make_entry(1))
+    assert [r["seq"] for _, r in store.iter_records()] == [0, 1]
+    assert store.segment_ids() == [1]
+    store.close()
+
+def test_retention_drops_oldest_segments(tmp_path):
+    store = SegmentedAuditStore(str(tmp_path / "audit"), max_segment_bytes=100, retention_segments=2)
+    for i in range(30):
+        store.append(make_entry(i))
+    assert len(store.segment_ids()) == 3
+    records = [r["seq"] for _, r in store.iter_records()]
+    assert records == list(range(records[0], 30))
+    store.close()
+
+def test_legacy_json_file_is_migrated(tmp_path):
+    legacy = tmp_path / "audit_logs.json"
+    legacy.write_text(json.dumps({"audit_logs": [make_entry(0), make_entry(1)]}))
+    service = AuditService(audit_log_dir=str(tmp_path / "audit"), legacy_log_file=str(legacy))
+    # Starting the service leaves the legacy file alone; migration is an explicit step.
+    assert legacy.exists()
+    assert service.get_audit_logs() == []
+    assert service.migrate_legacy_log() == 2
+    assert service.migrate_legacy_log() == 0
+    service.log_access("user_2", "partner_ABC", "loan_application", ["credit_score"])
+    service.flush()
+    logs = service.get_audit_logs()
+    assert [log["user_id"] for log in logs] == ["user_0", "user_1", "user_2"]
+    assert len(service.query(user_id="user_0")) == 1
+    assert not legacy.exists()
+    assert (tmp_path / "audit_logs.json.migrated").exists()
+    service.close()
+
+def test_batch_writer_groups_entries():
+    batches = []
+    writer = BatchWriter(batches.append, batch_size=50, flush_interval=0.5)
+    for i in range(100):
+        writer.submit(i)
+    writer.close()
+    assert [entry for batch in batches for entry in batch] == list(range(100))
+    assert len(batches) < 100
+    assert writer.stats["written"] == 100
+
+def test_batch_writer_drop_newest_when_full():
+    release = threading.Event()
+    written = []
+    def slow_sink(batch):
+        release.wait()
+        written.extend(batch)
+    writer = BatchWriter(slow_sink, max_queue=2, batch_size=1, overflow="drop_newest")
+    results = [writer.submit(i) for i in range(10)]
+    release.set()
+    writer.close()
+    assert results.count(False) == writer.stats["dropped"] > 0
+    assert len(written) == results.count(True)
+
+def test_batch_writer_drop_oldest_keeps_latest():
+    release = threading.Event()
+    written = []
+    def slow_sink(batch):
+        release.wait()
+        written.extend(batch)
+    writer = BatchWriter(slow_sink, max_queue=2, batch_size=1, overflow="drop_oldest")
+    for i in range(10):
+        writer.submit(i)
+    release.set()
+    writer.close()
+    assert written[-2:] == [8, 9]
+
+def test_async_service_drains_on_close(tmp_path):
+    service = AuditService(audit_log_dir=str(tmp_path / "audit"), legacy_log_file=str(tmp_path / "none.json"),
+                           async_writes=True)
+    for i in range(25):
+        service.log_access(f"user_{i}", "partner_ABC", "loan_application", [])
+    service.close()
+    store = SegmentedAuditStore(str(tmp_path / "audit"))
+    assert len(list(store.iter_records())) == 25
+    store.close()
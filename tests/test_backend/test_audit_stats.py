@@ -0,0 +1,112 @@
+import random
+from collections import Counter
+import pytest
+from backend.services.audit_service import AuditService
+from backend.services.audit_stats import AuditStats
+from backend.services.audit_store import SegmentedAuditStore
+
+PARTNERS = ["partner_A", "partner_B", "partner_C"]
+PURPOSES = ["loan_application", "credit_scoring"]
+
+def make_records(count, seed=7):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        day, hour = divmod(i // 10, 24)
+        records.append({
+            "timestamp": f"2024-03-{day + 1:02d}T{hour:02d}:{rng.randrange(60):02d}:00",
+            "user_id": f"user_{rng.randrange(20)}",
+            "partner_id": rng.choice(PARTNERS),
+            "purpose": rng.choice(PURPOSES),
+        })
+    return records
+
+def expected(records, field, since=None, until=None, **filters):
+    counts = Counter(
+        record[field] for record in records
+        if (since is None or record["timestamp"][:13] >= since[:13])
+        and (until is None or record["timestamp"][:13] <= until[:13])
+        and all(record[key] == value for key, value in filters.items())
+    )
+    return counts
+
+def as_counter(groups, dimension):
+    return Counter({group[dimension]: group["count"] for group in groups[dimension]})
+
+@pytest.mark.parametrize("snapshot_size", [7, 100, 100000])
+def test_counts_match_a_scan_whatever_the_snapshot_size(snapshot_size):
+    records = make_records(1000)
+    stats = AuditStats(snapshot_size=snapshot_size)
+    for i, record in enumerate(records):
+        stats.add((i // 100, i), record)
+
+    groups, total = stats.query()
+    assert total == len(records)
+    assert as_counter(groups, "partner") == expected(records, "partner_id")
+    assert as_counter(groups, "purpose") == expected(records, "purpose")
+    assert as_counter(groups, "user") == expected(records, "user_id")
+    assert sum(group["count"] for group in groups["hour"]) == len(records)
+    assert groups["hour"][0] == {"hour": "2024-03-01T00:00:00", "count": 10}
+
+    since, until = "2024-03-02T05:30:00", "2024-03-03T01:00:00"
+    groups, total = stats.query(("user", "purpose"), since=since, until=until, partner_id="partner_B")
+    assert as_counter(groups, "user") == expected(records, "user_id", since, until, partner_id="partner_B")
+    assert total == sum(expected(records, "purpose", since, until, partner_id="partner_B").values())
+
+    # Whole days come from the daily snapshot, the partial days around them from the hourly one.
+    for since, until in [(since, until), ("2024-03-02T00:00:00", "2024-03-03T23:59:59"),
+                         ("2024-03-01T20:00:00", None), ("2024-03-03T02:00:00", "2024-03-03T04:00:00")]:
+        groups, total = stats.query(("partner", "purpose"), since=since, until=until, purpose="credit_scoring")
+        assert as_counter(groups, "partner") == expected(records, "partner_id", since, until, purpose="credit_scoring")
+        assert total == sum(as_counter(groups, "purpose").values())
+
+def test_groups_are_ordered_and_limited():
+    stats = AuditStats()
+    records = [{"timestamp": "2024-03-01T10:00:00", "partner_id": "partner_A", "purpose": "p", "user_id": "u1"}] * 3
+    records += [{"timestamp": "2024-03-01T08:00:00", "partner_id": "partner_B", "purpose": "p", "user_id": "u2"}] * 5
+    records += [{"timestamp": "2024-03-01T09:00:00", "partner_id": "partner_C", "purpose": "p", "user_id": "u3"}]
+    stats.rebuild(((0, i), record) for i, record in enumerate(records))
+
+    groups, total = stats.query(("partner", "hour"), limit=2)
+    assert total == 9
+    assert groups["partner"] == [{"partner": "partner_B", "count": 5}, {"partner": "partner_A", "count": 3}]
+    assert groups["hour"] == [{"hour": "2024-03-01T09:00:00", "count": 1}, {"hour": "2024-03-01T10:00:00", "count": 3}]
+
+def test_unknown_filter_values_and_untimed_records():
+    stats = AuditStats()
+    stats.add((0, 0), {"partner_id": "partner_A", "purpose": "p", "user_id": "u1"})
+    stats.add((0, 1), {"timestamp": "2024-03-01T10:00:00", "partner_id": "partner_A", "purpose": "p", "user_id": "u1"})
+
+    assert stats.query(("partner",), partner_id="nobody") == ({"partner": []}, 0)
+    groups, total = stats.query(("hour",))
+    assert groups["hour"] == [{"hour": None, "count": 1}, {"hour": "2024-03-01T10:00:00", "count": 1}]
+    assert stats.query(("hour",), until="2024-12-31T00:00:00")[1] == 1
+
+def test_invalid_queries_raise_value_error():
+    stats = AuditStats()
+    with pytest.raises(ValueError):
+        stats.query(("country",))
+    with pytest.raises(ValueError):
+        stats.query(since="not a timestamp")
+
+def test_dropped_segments_are_forgotten():
+    stats = AuditStats(snapshot_size=3)
+    records = make_records(10)
+    for i, record in enumerate(records):
+        stats.add((i // 5 + 1, i), record)
+    stats.drop_segments([1])
+    groups, total = stats.query(("partner",))
+    assert total == 5
+    assert as_counter(groups, "partner") == expected(records[5:], "partner_id")
+
+def test_audit_service_keeps_stats_current(tmp_path):
+    store = SegmentedAuditStore(str(tmp_path / "audit"), max_segment_bytes=512)
+    store.append_many(make_records(50))
+    service = AuditService(store=store, legacy_log_file=str(tmp_path / "none.json"), async_writes=False)
+    assert service.stats_query(("partner",))[1] == 50
+
+    service.log_access("user_1", "partner_A", "loan_application", "email")
+    groups, total = service.stats_query(("user",), user_id="user_1")
+    assert groups["user"][0]["user"] == "user_1"
+    assert total == expected(make_records(50), "user_id", user_id="user_1")["user_1"] + 1
+    service.close()
@@ -0,0 +1,120 @@
+import json
+from flask import Flask
+import pytest
+from backend.config import Config
+from backend.routes import auth
+from backend.services.audit_service import AuditService
+from backend.services.decision_rollup import DecisionRollup
+from backend.services.policy_engine import PolicyEngine
+from backend.utils.token_generator import token_service
+
+POLICIES = [
+    {"partner_id": "partner_ABC", "allowed_purposes": ["loan_application", "credit_scoring"]},
+    {"partner_id": "partner_XYZ", "allowed_purposes": ["regulatory_reporting"]},
+]
+
+@pytest.fixture
+def gateway(tmp_path, monkeypatch):
+    policy_file = tmp_path / "policies.json"
+    policy_file.write_text(json.dumps(POLICIES))
+    rollup = DecisionRollup()
+    engine = PolicyEngine(str(policy_file), reload_interval=0, decision_rollup=rollup, shared_snapshot="")
+    audit_service = AuditService(audit_log_dir=str(tmp_path / "audit"),
+                                 legacy_log_file=str(tmp_path / "audit_logs.json"), async_writes=False)
+    monkeypatch.setattr(auth, "policy_engine", engine)
+    monkeypatch.setattr(auth, "audit_service", audit_service)
+    monkeypatch.setattr(auth, "record_stager", None)
+    app = Flask(__name__)
+    app.register_blueprint(auth.auth_bp)
+    yield app.test_client(), audit_service, rollup
+    audit_service.close()
+    engine.snapshots.stop()
+
+def test_batch_reports_each_item(gateway):
+    client, audit_service, rollup = gateway
+    response = client.post('/authorize/batch', json={"partner_id": "partner_ABC", "items": [
+        {"user_id": "user_1", "purpose": "loan_application", "requested_data": ["credit_score"]},
+        {"user_id": "user_2", "purpose": "regulatory_reporting"},
+        {"user_id": "user_3"},
+        {"user_id": "user_4", "purpose": "marketing"},
+        "user_5",
+        {"user_id": "user_6", "purpose": "credit_scoring"},
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    results = data["results"]
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["status"] for result in results] == \
+        ["approved", "denied", "invalid", "invalid", "invalid", "approved"]
+    assert results[2]["error"] == "Missing required field: purpose"
+    assert results[3]["error"].startswith("Invalid purpose")
+    assert results[4]["error"] == "Batch item must be a dictionary."
+    assert data["approved"] == 2
+    assert data["partner_id"] == "partner_ABC"
+    assert data["policy_version"] == auth.policy_engine.snapshot.version
+
+    # Only approved items carry a token, bound to their own user, partner and purpose.
+    assert "token" not in results[1]
+    for result in (results[0], results[5]):
+        claims = token_service.verify(result["token"])
+        assert claims["sub"] == result["user_id"]
+        assert (claims["partner_id"], claims["purpose"]) == ("partner_ABC", result["purpose"])
+        assert claims["masked_fields"] == Config.STAGING_MASKED_FIELDS
+
+    logs = audit_service.get_audit_logs()
+    assert [(log["user_id"], log["purpose"], log["data_accessed"]) for log in logs] == [
+        ("user_1", "loan_application", ["credit_score"]),
+        ("user_6", "credit_scoring", []),
+    ]
+    assert all(log["partner_id"] == "partner_ABC" and log["policy_version"] == data["policy_version"]
+               for log in logs)
+    # Invalid items never reach the policy engine.
+    assert sorted((row["purpose"], row["outcome"], row["count"]) for row in rollup.summary()) == [
+        ("credit_scoring", "approved", 1),
+        ("loan_application", "approved", 1),
+        ("regulatory_reporting", "denied", 1),
+    ]
+
+def test_batch_for_unknown_partner_denies_every_item(gateway):
+    client, audit_service, _ = gateway
+    response = client.post('/authorize/batch', json={"partner_id": "partner_NONE", "items": [
+        {"user_id": "user_1", "purpose": "loan_application"},
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["approved"] == 0
+    assert data["results"] == [{"index": 0, "user_id": "user_1", "purpose": "loan_application", "status": "denied"}]
+    assert audit_service.get_audit_logs() == []
+
+@pytest.mark.parametrize("body, error", [
+    (None, "Request data must be a dictionary."),
+    ({"items": [{"user_id": "user_1", "purpose": "loan_application"}]}, "Missing required field: partner_id"),
+    ({"partner_id": "", "items": [{"user_id": "user_1", "purpose": "loan_application"}]},
+     "Invalid partner ID: must be a non-empty string."),
+    ({"partner_id": "partner_ABC", "items": []}, "Invalid items: must be a non-empty list."),
+    ({"partner_id": "partner_ABC", "items": {"user_id": "user_1"}}, "Invalid items: must be a non-empty list."),
+])
+def test_malformed_batch_is_rejected(gateway, body, error):
+    client, audit_service, _ = gateway
+    if body is None:
+        response = client.post('/authorize/batch', data="not json", content_type="text/plain")
+    else:
+        response = client.post('/authorize/batch', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": error}
+    assert audit_service.get_audit_logs() == []
+
+def test_batch_size_is_limited(gateway, monkeypatch):
+    client, audit_service, _ = gateway
+    monkeypatch.setattr(Config, "AUTHORIZE_BATCH_MAX_ITEMS", 2)
+    items = [{"user_id": f"user_{i}", "purpose": "loan_application"} for i in range(3)]
+
+    response = client.post('/authorize/batch', json={"partner_id": "partner_ABC", "items": items})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid items: at most 2 items per batch."}
+    assert audit_service.get_audit_logs() == []
+
+    response = client.post('/authorize/batch', json={"partner_id": "partner_ABC", "items": items[:2]})
+    assert response.status_code == 200
+    assert response.get_json()["approved"] == 2
+    assert len(audit_service.get_audit_logs()) == 2
@@ -0,0 +1,104 @@
+import json
+import pytest
+from backend.services.decision_cache import DecisionCache
+from backend.services.policy_engine import PolicyEngine
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_hit_and_miss_counters():
+    cache = DecisionCache(maxsize=10, ttl=60)
+    assert cache.get("p", "u", "loan_application") is None
+    cache.put("p", "u", "loan_application", True)
+    assert cache.get("p", "u", "loan_application") is True
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = DecisionCache(maxsize=10, ttl=5, clock=clock)
+    cache.put("p", "u", "loan_application", True)
+    clock.now = 5
+    assert cache.get("p", "u", "loan_application") is None
+    assert cache.stats["expirations"] == 1
+    assert len(cache) == 0
+
+def test_least_recently_used_is_evicted():
+    cache = DecisionCache(maxsize=2, ttl=60)
+    cache.put("p", "u1", "x", 1)
+    cache.put("p", "u2", "x", 2)
+    cache.get("p", "u1", "x")
+    cache.put("p", "u3", "x", 3)
+    assert cache.get("p", "u2", "x") is None
+    assert cache.get("p", "u1", "x") == 1
+    assert cache.stats["evictions"] == 1
+
+def test_invalidation_is_scoped():
+    cache = DecisionCache(maxsize=10, ttl=60)
+    cache.put("p1", "u1", "x", 1)
+    cache.put("p2", "u1", "x", 2)
+    cache.put("p2", "u2", "x", 3)
+    assert cache.invalidate_user("u1") == 2
+    assert cache.get("p2", "u2", "x") == 3
+    assert cache.invalidate_partner("p2") == 1
+    assert len(cache) == 0
+
+def test_put_after_invalidation_is_discarded():
+    cache = DecisionCache(maxsize=10, ttl=60)
+    generation = cache.generation
+    cache.invalidate_partner("p1")
+    cache.put("p1", "u1", "x", 1, generation=generation)
+    assert cache.get("p1", "u1", "x") is None
+
+def test_policy_reload_invalidates_only_changed_partners(tmp_path):
+    policy_file = tmp_path / "policies.json"
+    policies = [
+        {"partner_id": "partner_A", "allowed_purposes": ["loan_application"]},
+        {"partner_id": "partner_B", "allowed_purposes": ["loan_application"]},
+    ]
+    policy_file.write_text(json.dumps(policies))
+    engine = PolicyEngine(policy_file=str(policy_file), reload_interval=0,
+                          decision_cache=DecisionCache(maxsize=100, ttl=60))
+    assert engine.is_authorized("partner_A", "user_1", "loan_application")
+    assert engine.is_authorized("partner_B", "user_1", "loan_application")
+
+    policies[0]["allowed_purposes"] = ["credit_scoring"]
+    policy_file.write_text(json.dumps(policies))
+    engine.reload_policies()
+
+    assert engine.decision_cache.get("partner_B", "user_1", "loan_application") is not None
+    assert not engine.is_authorized("partner_A", "user_1", "loan_application")
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_consent_reload_invalidates_only_changed_users(tmp_path, shared):
+    policy_file = tmp_path / "policies.json"
+    policy_file.write_text(json.dumps([{
+        "partner_id": "partner_A",
+        "data_usage": {"purpose": "loan_application", "allowed_data": ["credit_score"],
+                       "conditions": ["User consent must be obtained"]},
+    }]))
+    consent_file = tmp_path / "consents.jsonl"
+    def write_consents(entries):
+        consent_file.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+    write_consents([{"user_id": "user_1", "consent": {"loan_application": True, "marketing": True}},
+                    {"user_id": "user_2", "consent": {"loan_application": True}}])
+    engine = PolicyEngine(policy_file=str(policy_file), reload_interval=0, consent_file=str(consent_file),
+                          decision_cache=DecisionCache(maxsize=100, ttl=60),
+                          shared_snapshot=str(tmp_path / "snapshot.bin") if shared else "")
+    assert engine.is_authorized("partner_A", "user_1", "loan_application")
+    assert engine.is_authorized("partner_A", "user_2", "loan_application")
+
+    # A new purpose named first numbers the purposes differently in a mapped snapshot.
+    write_consents([{"user_id": "user_3", "consent": {"kyc": True}},
+                    {"user_id": "user_1", "consent": {"loan_application": True, "marketing": True}},
+                    {"user_id": "user_2", "consent": {"loan_application": False}}])
+    assert engine.snapshots.reload_if_changed()
+
+    assert engine.decision_cache.get("partner_A", "user_1", "loan_application") is not None
+    assert engine.decision_cache.get("partner_A", "user_2", "loan_application") is None
+    assert not engine.is_authorized("partner_A", "user_2", "loan_application")
+    assert engine.is_authorized("partner_A", "user_1", "loan_application")
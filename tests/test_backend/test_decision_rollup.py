@@ -0,0 +1,163 @@
+from datetime import datetime
+import json
+import os
+import time
+from backend.config import Config
+from backend.services.audit_store import SegmentedAuditStore
+from backend.services.decision_cache import DecisionCache
+from backend.services.decision_rollup import DecisionRollup, create_decision_rollup, outcome_of
+from backend.services.policy_engine import Decision, PolicyEngine
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_decisions_are_counted_per_minute_bucket():
+    clock = FakeClock(1_700_000_010)
+    rollup = DecisionRollup(clock=clock)
+    rollup.record("partner_A", "loan_application", "approved")
+    rollup.record("partner_A", "loan_application", "approved")
+    clock.now += 30
+    rollup.record("partner_A", "loan_application", "denied")
+    rollup.record_many("partner_B", [("credit_scoring", "approved")] * 3)
+
+    assert rollup.summary() == [
+        {"partner_id": "partner_B", "purpose": "credit_scoring", "outcome": "approved", "count": 3},
+        {"partner_id": "partner_A", "purpose": "loan_application", "outcome": "approved", "count": 2},
+        {"partner_id": "partner_A", "purpose": "loan_application", "outcome": "denied", "count": 1},
+    ]
+    by_minute = rollup.summary(partner_id="partner_A", granularity="minute")
+    assert [(row["period"], row["outcome"], row["count"]) for row in by_minute] == [
+        ("2023-11-14T22:13:00", "approved", 2),
+        ("2023-11-14T22:14:00", "denied", 1),
+    ]
+    assert rollup.summary(since="2023-11-14T22:14:00", purpose="loan_application") == [
+        {"partner_id": "partner_A", "purpose": "loan_application", "outcome": "denied", "count": 1},
+    ]
+
+def test_only_closed_buckets_are_flushed_once():
+    clock = FakeClock(1_700_000_010)
+    written = []
+    rollup = DecisionRollup(sink=written.extend, flush_interval=0, clock=clock)
+    rollup.record("partner_A", "loan_application", "approved")
+    assert rollup.flush() == 0
+    clock.now += 60
+    rollup.record("partner_A", "loan_application", "approved")
+    assert rollup.flush() == 1
+    assert rollup.flush() == 0
+    assert written == [{"minute": "2023-11-14T22:13:00", "partner_id": "partner_A",
+                        "purpose": "loan_application", "outcome": "approved", "count": 1}]
+    rollup.close()
+    assert len(written) == 2
+    assert rollup.summary()[0]["count"] == 2
+
+def test_buckets_past_retention_are_dropped_after_flushing():
+    clock = FakeClock()
+    rollup = DecisionRollup(sink=lambda rows: None, flush_interval=0, retention=120, clock=clock)
+    rollup.record("partner_A", "loan_application", "approved")
+    clock.now += 600
+    rollup.flush()
+    assert rollup.summary() == []
+
+def test_flushed_summaries_are_restored(tmp_path):
+    clock = FakeClock()
+    store = SegmentedAuditStore(str(tmp_path / "rollups"))
+    rollup = DecisionRollup(sink=store.append_many, flush_interval=0, clock=clock)
+    rollup.record("partner_A", "loan_application", "denied", count=5)
+    rollup.close()
+    store.close()
+
+    restored = DecisionRollup(clock=clock)
+    restored.load(record for _, record in SegmentedAuditStore(str(tmp_path / "rollups")).iter_records())
+    assert restored.summary() == [
+        {"partner_id": "partner_A", "purpose": "loan_application", "outcome": "denied", "count": 5},
+    ]
+
+def test_rollup_store_keeps_only_the_retention_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "DECISION_ROLLUP_RETENTION_HOURS", 1)
+    directory = str(tmp_path / "rollups")
+    store = SegmentedAuditStore(directory, max_segment_bytes=1)
+    row = {"partner_id": "partner_A", "purpose": "loan_application", "outcome": "approved", "count": 1}
+    minute = datetime.utcnow().replace(second=0, microsecond=0).isoformat()
+    for stamp in ("2020-01-01T00:00:00", minute, minute):
+        store.append(dict(row, minute=stamp))
+    old, recent, active = store.segment_ids()
+    store.close()
+    # The oldest segment was closed two hours ago.
+    stale = time.time() - 7200
+    os.utime(os.path.join(directory, "segment-%08d.ndjson" % old), (stale, stale))
+
+    rollup = create_decision_rollup(directory)
+    rollup.close()
+    assert rollup.sink.__self__.retention_seconds == 3600
+    assert sum(row["count"] for row in rollup.summary()) == 2
+    reopened = SegmentedAuditStore(directory)
+    assert reopened.segment_ids() == [recent, active]
+    reopened.close()
+
+def test_workers_sharing_a_rollup_store_summarise_each_others_decisions(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "AUDIT_MULTI_PROCESS", True)
+    monkeypatch.setattr(Config, "DECISION_ROLLUP_FLUSH_INTERVAL", 0)
+    directory = str(tmp_path / "rollups")
+    first = create_decision_rollup(directory)
+    second = create_decision_rollup(directory)
+    first.record("partner_A", "loan_application", "approved", count=2)
+    second.record("partner_A", "loan_application", "denied")
+    second.record("partner_B", "credit_scoring", "approved")
+    first.flush(final=True)
+    second.flush(final=True)
+
+    expected = [
+        {"partner_id": "partner_A", "purpose": "loan_application", "outcome": "approved", "count": 2},
+        {"partner_id": "partner_A", "purpose": "loan_application", "outcome": "denied", "count": 1},
+        {"partner_id": "partner_B", "purpose": "credit_scoring", "outcome": "approved", "count": 1},
+    ]
+    assert first.summary() == expected
+    assert second.summary() == expected
+    # A restarted worker reads every worker's rows once.
+    assert create_decision_rollup(directory).summary() == expected
+
+def test_outcome_of():
+    assert outcome_of(Decision(False, "Policy not found", "v1")) == "no_policy"
+    assert outcome_of(Decision(True, "Policy approved", "v1")) == "approved"
+    assert outcome_of(False) == "denied"
+    assert outcome_of("approved") == "approved"
+
+class RecordingWriter:
+    def __init__(self):
+        self.entries = []
+
+    def submit(self, entry):
+        self.entries.append(entry)
+
+def make_engine(tmp_path, **kwargs):
+    policy_file = tmp_path / "policies.json"
+    policy_file.write_text(json.dumps([{"partner_id": "partner_A", "allowed_purposes": ["loan_application"]}]))
+    return PolicyEngine(policy_file=str(policy_file), reload_interval=0, decision_writer=RecordingWriter(),
+                        decision_cache=DecisionCache(maxsize=100, ttl=60), **kwargs)
+
+def test_engine_counts_every_decision_and_samples_raw_events(tmp_path):
+    rollup = DecisionRollup()
+    engine = make_engine(tmp_path, decision_rollup=rollup, decision_sample_rate=0.0)
+    engine.evaluate("partner_A", "user_1", "loan_application")
+    engine.evaluate("partner_A", "user_1", "loan_application")
+    engine.evaluate("partner_X", "user_1", "loan_application")
+    engine.evaluate_batch("partner_A", [("user_2", "loan_application"), ("user_3", "credit_scoring")])
+    assert {(row["partner_id"], row["outcome"]): row["count"] for row in rollup.summary()} == {
+        ("partner_A", "approved"): 3,
+        ("partner_X", "no_policy"): 1,
+        ("partner_A", "denied"): 1,
+    }
+    assert engine.decision_writer.entries == []
+
+    engine.decision_sample_rate = 1.0
+    engine.evaluate("partner_A", "user_1", "loan_application")
+    assert [entry["decision"] for entry in engine.decision_writer.entries] == ["approved"]
+
+def test_engine_without_rollup_logs_every_decision(tmp_path):
+    engine = make_engine(tmp_path)
+    engine.log_policy_decision("partner_A", "user_1", "loan_application", "approved")
+    assert engine.decision_writer.entries[0]["decision"] == "approved"
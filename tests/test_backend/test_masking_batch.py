@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backend.services.data_masking import DataMaskingService
+
+FIELDS = ["name", "email", "phone"]
+
+@pytest.fixture
+def records():
+    return [
+        {"user_id": "user_1", "name": "Alice Smith", "email": "alice@example.com", "phone": "555-0101"},
+        {"user_id": "user_2", "name": "", "email": None, "credit_score": 700},
+        {"user_id": "user_3", "name": ["not", "a", "string"], "phone": 5550102},
+        {"user_id": "user_4", "name": "Bob", "email": "bob@example.com", "phone": "555-0103"},
+    ]
+
+def test_mask_batch_matches_per_record_path(records):
+    service = DataMaskingService()
+    expected = [service.mask_data(record, FIELDS) for record in records]
+    assert service.mask_batch(records, FIELDS) == expected
+    assert records[0]["name"] == "Alice Smith"
+
+def test_mask_columns_on_dataframe_matches_per_record_path(records):
+    service = DataMaskingService()
+    frame = pd.DataFrame(records)
+    masked = service.mask_columns(frame, FIELDS)
+    expected = pd.DataFrame([service.mask_data(record, FIELDS) for record in records])
+    pd.testing.assert_frame_equal(masked.astype(object), expected.astype(object))
+    assert frame.loc[0, "name"] == "Alice Smith"
+
+def test_mask_columns_on_string_only_column():
+    service = DataMaskingService()
+    frame = pd.DataFrame({"email": ["a@example.com", None, "longer@example.com"], "score": [1, 2, 3]})
+    masked = service.mask_columns(frame, ["email", "score"])
+    assert masked["email"].tolist()[0] == "*" * 13
+    assert masked["email"].isna().tolist() == [False, True, False]
+    assert masked["score"].tolist() == [1, 2, 3]
+
+def test_mask_columns_on_column_dict_keeps_container_types():
+    service = DataMaskingService()
+    columns = {"name": ["Ann", None, "Christopher"], "email": np.array(["x@y.z", 7], dtype=object)}
+    masked = service.mask_columns(columns, ["name", "email", "missing"])
+    assert masked["name"] == ["***", None, "*" * 11]
+    assert isinstance(masked["email"], np.ndarray)
+    assert masked["email"].tolist() == ["*****", 7]
+    assert columns["name"][0] == "Ann"
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+import pytest
+from backend.models.policy import PolicyManager
+from backend.services.data_masking import DataMaskingService
+from backend.services.masking_plan import MaskingPlan, MaskingPlanCache, parse_path
+
+@pytest.fixture
+def record():
+    return {
+        "user_id": "user_123",
+        "name": "Alice Smith",
+        "address": {"city": "Springfield", "zip": 12345},
+        "transaction_history": [
+            {"transaction_id": "txn_001", "amount": 150.0, "description": "Deposit"},
+            {"transaction_id": "txn_002", "amount": -50.0, "description": "Withdrawal"},
+        ],
+        "tags": [["a", "bb"], ["ccc"]],
+    }
+
+def test_parse_path():
+    assert parse_path("name") == ("name",)
+    assert parse_path("transaction_history[].description")[0] == "transaction_history"
+    assert len(parse_path("tags[][]")) == 3
+    with pytest.raises(ValueError):
+        parse_path("a..b")
+
+def test_masks_nested_paths_without_touching_input(record):
+    plan = MaskingPlan(["name", "address.city", "transaction_history[].description", "tags[][]"])
+    masked = plan.apply(record)
+    assert masked["name"] == "***********"
+    assert masked["address"] == {"city": "***********", "zip": 12345}
+    assert [txn["description"] for txn in masked["transaction_history"]] == ["*******", "**********"]
+    assert masked["transaction_history"][0]["amount"] == 150.0
+    assert masked["tags"] == [["*", "**"], ["***"]]
+    assert record["name"] == "Alice Smith"
+    assert record["transaction_history"][0]["description"] == "Deposit"
+
+def test_copies_only_changed_paths(record):
+    masked = MaskingPlan(["address.city"]).apply(record)
+    assert masked is not record
+    assert masked["transaction_history"] is record["transaction_history"]
+    assert masked["address"] is not record["address"]
+
+    unchanged = MaskingPlan(["missing", "address.zip", "transaction_history[].amount"]).apply(record)
+    assert unchanged is record
+
+def test_top_level_paths_match_mask_data(record):
+    service = DataMaskingService()
+    fields = ["name", "address", "user_id", "missing"]
+    assert service.compile_plan(fields).apply(record) == service.mask_data(record, fields)
+    assert service.mask_paths(record, ["transaction_history[].description"]) == \
+        service.compile_plan(["transaction_history[].description"]).apply_many([record])[0]
+
+def test_plan_cache_follows_policy_version():
+    def snapshot(version, masked):
+        index = PolicyManager.from_dicts([{
+            "partner_id": "p",
+            "data_usage": {"purpose": "loan_application", "allowed_data": [], "masked_fields": masked},
+        }]).compile()
+        return SimpleNamespace(version=version, index=index)
+
+    engine = SimpleNamespace(snapshot=snapshot("v1", ["email"]))
+    cache = MaskingPlanCache(engine, DataMaskingService(), default_paths=["name"])
+    plan = cache.plan_for("p", "loan_application")
+    assert plan.paths == ("name", "email")
+    assert cache.plan_for("p", "loan_application") is plan
+    assert cache.plan_for("other", "loan_application").paths == ("name",)
+
+    engine.snapshot = snapshot("v2", ["transaction_history[].description"])
+    assert cache.plan_for("p", "loan_application").paths == ("name", "transaction_history[].description")
@@ -0,0 +1,77 @@
+import json
+from flask import Flask
+import pytest
+from backend.routes.metrics import metrics_bp
+from backend.services.decision_cache import DecisionCache
+from backend.services.policy_engine import PolicyEngine
+from backend.utils.metrics import CONTENT_TYPE, STAGE_SECONDS, MetricsRegistry, registry
+
+def test_histogram_buckets_are_cumulative():
+    metrics = MetricsRegistry()
+    histogram = metrics.histogram('op_seconds', 'Op latency.', ('stage',), buckets=(0.001, 0.01))
+    series = histogram.labels('lookup')
+    for seconds in (0.0005, 0.001, 0.005, 0.5):
+        series.observe(seconds)
+    text = metrics.render()
+    assert '# TYPE op_seconds histogram' in text
+    assert 'op_seconds_bucket{stage="lookup",le="0.001"} 2' in text
+    assert 'op_seconds_bucket{stage="lookup",le="0.01"} 3' in text
+    assert 'op_seconds_bucket{stage="lookup",le="+Inf"} 4' in text
+    assert 'op_seconds_count{stage="lookup"} 4' in text
+    assert 'op_seconds_sum{stage="lookup"} 0.5065' in text
+
+def test_counters_and_label_escaping():
+    metrics = MetricsRegistry()
+    counter = metrics.counter('events_total', 'Events.', ('kind',))
+    counter.labels('a"b').inc()
+    counter.labels('a"b').inc(2)
+    metrics.counter('plain_total', 'Unlabelled.').inc()
+    text = metrics.render()
+    assert 'events_total{kind="a\\"b"} 3' in text
+    assert 'plain_total 1' in text
+
+def test_registry_returns_existing_metric_and_rejects_kind_change():
+    metrics = MetricsRegistry()
+    assert metrics.counter('x_total', 'X.') is metrics.counter('x_total', 'X.')
+    with pytest.raises(ValueError):
+        metrics.histogram('x_total', 'X.')
+    with pytest.raises(ValueError):
+        metrics.counter('y_total', 'Y.', ('a',)).labels('1', '2')
+
+def test_timer_observes_its_block():
+    histogram = MetricsRegistry().histogram('block_seconds', 'Block.')
+    with histogram.time():
+        pass
+    assert histogram.labels().count == 1
+
+def test_metrics_endpoint_reports_requests_by_route():
+    app = Flask(__name__)
+    app.register_blueprint(metrics_bp)
+
+    @app.route('/items/<item_id>')
+    def get_item(item_id):
+        return item_id
+
+    client = app.test_client()
+    client.get('/items/1')
+    client.get('/items/2')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert 'gateway_requests_total{route="/items/<item_id>",status="200"} 2' in text
+    assert 'gateway_request_duration_seconds_count{route="/items/<item_id>"} 2' in text
+    assert '# TYPE gateway_stage_duration_seconds histogram' in text
+
+def test_policy_evaluation_is_timed_and_counted(tmp_path):
+    policy_file = tmp_path / "policies.json"
+    policy_file.write_text(json.dumps([{"partner_id": "partner_A", "allowed_purposes": ["loan_application"]}]))
+    engine = PolicyEngine(policy_file=str(policy_file), reload_interval=0,
+                          decision_cache=DecisionCache(maxsize=100, ttl=60))
+    stage = STAGE_SECONDS.labels('policy_evaluate')
+    hits = registry.get('policy_decision_cache_lookups_total').labels('hit')
+    before_count, before_hits = stage.count, hits.value
+    engine.evaluate("partner_A", "user_1", "loan_application")
+    engine.evaluate("partner_A", "user_1", "loan_application")
+    assert stage.count == before_count + 2
+    assert hits.value == before_hits + 1
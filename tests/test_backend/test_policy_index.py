@@ -0,0 +1,93 @@
+import json
+import pytest
+from backend.models.policy import Policy, PolicyManager
+from backend.services.policy_engine import PolicyEngine
+
+POLICIES = {
+    "policies": [
+        {
+            "partner_id": "partner_ABC",
+            "data_usage": {
+                "purpose": "loan_application",
+                "allowed_data": ["transaction_history", "credit_score"],
+                "conditions": ["User consent must be obtained"]
+            }
+        },
+        {
+            "partner_id": "partner_ABC",
+            "data_usage": {
+                "purpose": "credit_scoring",
+                "allowed_data": ["credit_score"],
+                "conditions": []
+            }
+        },
+        {"partner_id": "partner_LEGACY", "allowed_purposes": ["regulatory_reporting"]}
+    ]
+}
+
+@pytest.fixture
+def engine(tmp_path):
+    policy_file = tmp_path / "policies.json"
+    policy_file.write_text(json.dumps(POLICIES))
+    return PolicyEngine(policy_file=str(policy_file), reload_interval=0)
+
+def test_policies_for_one_partner_are_merged(engine):
+    policy = engine.get_policy("partner_ABC")
+    assert policy.purposes == frozenset({"loan_application", "credit_scoring"})
+    assert policy.consent_required is True
+    assert engine.allowed_data("partner_ABC", "credit_scoring") == frozenset({"credit_score"})
+
+def test_is_authorized(engine):
+    assert engine.is_authorized("partner_ABC", "user_123", "loan_application")
+    assert not engine.is_authorized("partner_ABC", "user_123", "regulatory_reporting")
+    assert not engine.is_authorized("unknown", "user_123", "loan_application")
+
+def test_allowed_purposes_layout(engine):
+    assert engine.is_authorized("partner_LEGACY", "user_123", "regulatory_reporting")
+    assert engine.allowed_data("partner_LEGACY", "regulatory_reporting") == frozenset()
+
+def test_compiled_policies_are_immutable():
+    manager = PolicyManager()
+    manager.add_policy(Policy.from_dict({"partner_id": "p", "allowed_purposes": ["credit_scoring"]}))
+    compiled = manager.compile()
+    with pytest.raises(AttributeError):
+        compiled.extra = 1
+    with pytest.raises(TypeError):
+        compiled.get("p").rules["loan_application"] = None
+
+def test_reload_swaps_snapshot(tmp_path):
+    policy_file = tmp_path / "policies.json"
+    policy_file.write_text(json.dumps(POLICIES))
+    engine = PolicyEngine(policy_file=str(policy_file), reload_interval=0)
+    before = engine.evaluate("partner_NEW", "user_123", "credit_scoring")
+    assert not before.allowed
+
+    updated = {"policies": POLICIES["policies"] + [{"partner_id": "partner_NEW", "allowed_purposes": ["credit_scoring"]}]}
+    policy_file.write_text(json.dumps(updated))
+    assert engine.snapshots.reload_if_changed()
+
+    after = engine.evaluate("partner_NEW", "user_123", "credit_scoring")
+    assert after.allowed
+    assert after.policy_version != before.policy_version
+    assert engine.snapshot.generation == 2
+
+def test_invalid_policy_file_keeps_previous_snapshot(tmp_path):
+    policy_file = tmp_path / "policies.json"
+    policy_file.write_text(json.dumps(POLICIES))
+    engine = PolicyEngine(policy_file=str(policy_file), reload_interval=0)
+    version = engine.snapshot.version
+    policy_file.write_text("{ not json")
+    assert not engine.reload_policies()
+    assert engine.snapshot.version == version
+    assert engine.is_authorized("partner_ABC", "user_123", "loan_application")
+
+def test_evaluate_batch_matches_single_decisions(engine):
+    requests = [
+        ("user_1", "loan_application"),
+        ("user_2", "regulatory_reporting"),
+        ("user_3", "credit_scoring"),
+    ]
+    decisions = engine.evaluate_batch("partner_ABC", requests)
+    assert [d.allowed for d in decisions] == [engine.is_authorized("partner_ABC", u, p) for u, p in requests]
+    assert {d.policy_version for d in decisions} == {engine.snapshot.version}
+    assert not any(d.allowed for d in engine.evaluate_batch("unknown", requests))
@@ -0,0 +1,195 @@
+import json
+import multiprocessing
+import os
+import pytest
+from backend.config import Config
+from backend.services.audit_store import SegmentedAuditStore
+from backend.services.consents import ConsentIndex
+from backend.services.policy_engine import PolicyEngine
+from backend.services.policy_index import changed_partners
+from backend.services.policy_snapshot import build_snapshot
+from backend.services.shared_snapshot import SNAPSHOT_SUFFIX, SharedSnapshotManager, open_shared_snapshot
+
+POLICIES = {
+    "policies": [
+        {
+            "partner_id": "partner_ABC",
+            "data_usage": {
+                "purpose": "loan_application",
+                "allowed_data": ["transaction_history", "credit_score"],
+                "conditions": ["User consent must be obtained"]
+            },
+            "masking_rules": {"credit_score": "range"}
+        },
+        {"partner_id": "partner_LEGACY", "allowed_purposes": ["regulatory_reporting", "credit_scoring"]}
+    ]
+}
+CONSENTS = [
+    {"user_id": "user_1", "consent": {"loan_application": True, "marketing": False}},
+    {"user_id": "user_2", "consent": {"loan_application": False}},
+]
+
+@pytest.fixture
+def sources(tmp_path):
+    policy_file = tmp_path / "policies.json"
+    policy_file.write_text(json.dumps(POLICIES))
+    consent_file = tmp_path / "consents.jsonl"
+    consent_file.write_text("\n".join(json.dumps(entry) for entry in CONSENTS) + "\n")
+    return str(policy_file), str(consent_file), str(tmp_path / "snapshot.bin")
+
+def test_mapped_snapshot_matches_compiled_policies(sources):
+    policy_file, consent_file, snapshot_path = sources
+    compiled = build_snapshot(policy_file, consent_file=consent_file)
+    manager = SharedSnapshotManager(policy_file, snapshot_path, poll_interval=0, consent_file=consent_file)
+    mapped = manager.current
+
+    assert mapped.version == compiled.version
+    assert mapped.consent_version == compiled.consent_version
+    assert tuple(mapped.policies) == tuple(compiled.policies)
+    assert len(mapped.index) == len(compiled.index)
+    for partner in compiled.index:
+        assert mapped.index.get(partner.partner_id) == partner
+    assert mapped.index.get("partner_NONE") is None
+    assert mapped.index.masked_fields("partner_ABC", "loan_application") == \
+        compiled.index.masked_fields("partner_ABC", "loan_application")
+    for user_id in ("user_1", "user_2", "user_3"):
+        for purpose in ("loan_application", "marketing", "credit_scoring"):
+            assert mapped.consents.allows(user_id, purpose) == compiled.consents.allows(user_id, purpose)
+
+def test_consent_index_reads_json_arrays(tmp_path):
+    consent_file = tmp_path / "consents.json"
+    consent_file.write_text(json.dumps(CONSENTS))
+    consents = ConsentIndex.from_file(str(consent_file))
+    assert len(consents) == 2
+    assert consents.allows("user_1", "loan_application") is True
+    assert consents.allows("user_2", "loan_application") is False
+    assert consents.allows("user_3", "loan_application") is None
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_consent_required_policies_check_consent(sources, shared):
+    policy_file, consent_file, snapshot_path = sources
+    engine = PolicyEngine(policy_file=policy_file, reload_interval=0, consent_file=consent_file,
+                          shared_snapshot=snapshot_path if shared else "")
+    assert engine.is_authorized("partner_ABC", "user_1", "loan_application")
+    assert not engine.is_authorized("partner_ABC", "user_2", "loan_application")
+    assert not engine.is_authorized("partner_ABC", "user_3", "loan_application")
+    # Policies without the consent condition are unaffected.
+    assert engine.is_authorized("partner_LEGACY", "user_3", "credit_scoring")
+
+    with open(consent_file, "a") as file:
+        file.write(json.dumps({"user_id": "user_3", "consent": {"loan_application": True}}) + "\n")
+    assert engine.snapshots.reload_if_changed()
+    assert engine.is_authorized("partner_ABC", "user_3", "loan_application")
+
+def test_workers_share_one_rebuild(sources):
+    policy_file, consent_file, snapshot_path = sources
+    first = SharedSnapshotManager(policy_file, snapshot_path, poll_interval=0, consent_file=consent_file)
+    second = SharedSnapshotManager(policy_file, snapshot_path, poll_interval=0, consent_file=consent_file)
+    assert second.current.generation == 1
+    old_version = second.current.version
+    swaps = []
+    second.add_listener(lambda old, new: swaps.append((old.version, new.version)))
+
+    updated = {"policies": POLICIES["policies"] + [{"partner_id": "partner_NEW", "allowed_purposes": ["kyc"]}]}
+    with open(policy_file, "w") as file:
+        json.dump(updated, file)
+    assert first.reload_if_changed()
+    built = os.stat(snapshot_path)
+    assert second.reload_if_changed()
+    # The second worker maps the file the first one built rather than rebuilding it.
+    assert os.stat(snapshot_path).st_ino == built.st_ino
+    assert second.current.index.allows("partner_NEW", "kyc")
+    assert second.current.generation == first.current.generation == 2
+    assert swaps == [(old_version, first.current.version)]
+    assert not second.reload_if_changed()
+
+def test_mapped_reload_diffs_partners_without_decoding_them(sources):
+    policy_file, consent_file, snapshot_path = sources
+    manager = SharedSnapshotManager(policy_file, snapshot_path, poll_interval=0, consent_file=consent_file)
+    swaps = []
+    manager.add_listener(lambda old, new: swaps.append((old, new)))
+
+    updated = json.loads(json.dumps(POLICIES))
+    updated["policies"][1]["allowed_purposes"] = ["credit_scoring"]
+    updated["policies"].append({"partner_id": "partner_NEW", "allowed_purposes": ["kyc"]})
+    with open(policy_file, "w") as file:
+        json.dump(updated, file)
+    assert manager.reload_if_changed()
+    (old, new), = swaps
+
+    assert new.index.changed_since(old.index) == {"partner_LEGACY", "partner_NEW"}
+    assert not old.index._decoded and not new.index._decoded
+    assert new.index.changed_since(old.index) == changed_partners(old.index, new.index)
+
+def test_invalid_policy_file_keeps_mapped_snapshot(sources):
+    policy_file, consent_file, snapshot_path = sources
+    manager = SharedSnapshotManager(policy_file, snapshot_path, poll_interval=0, consent_file=consent_file)
+    version = manager.current.version
+    with open(policy_file, "w") as file:
+        file.write("{ not json")
+    assert not manager.reload_if_changed()
+    assert manager.current.version == version
+    snapshot, _ = open_shared_snapshot(snapshot_path)
+    assert snapshot.version == version
+
+def test_engine_caches_the_compiled_snapshot_next_to_the_policy_file(sources, monkeypatch):
+    monkeypatch.setattr(Config, "POLICY_SNAPSHOT_CACHE", True)
+    policy_file, _, _ = sources
+    first = PolicyEngine(policy_file=policy_file, reload_interval=0)
+    snapshot_path = policy_file + SNAPSHOT_SUFFIX
+    built = os.stat(snapshot_path)
+    # A restarted process maps the cached snapshot instead of compiling the policies again.
+    second = PolicyEngine(policy_file=policy_file, reload_interval=0)
+    assert isinstance(second.snapshots, SharedSnapshotManager)
+    assert os.stat(snapshot_path).st_mtime_ns == built.st_mtime_ns
+    assert second.snapshot.version == first.snapshot.version
+    assert second.is_authorized("partner_LEGACY", "user_1", "credit_scoring")
+
+def test_engine_compiles_in_process_without_a_usable_snapshot_path(sources):
+    policy_file, _, _ = sources
+    engine = PolicyEngine(policy_file=policy_file, reload_interval=0,
+                          shared_snapshot=os.path.join(policy_file, "snapshot.bin"))
+    assert not isinstance(engine.snapshots, SharedSnapshotManager)
+    assert engine.is_authorized("partner_LEGACY", "user_1", "credit_scoring")
+
+def test_multi_process_stores_interleave_appends(tmp_path):
+    directory = str(tmp_path / "audit")
+    first = SegmentedAuditStore(directory, max_segment_bytes=300, multi_process=True)
+    second = SegmentedAuditStore(directory, max_segment_bytes=300, multi_process=True)
+    seen = []
+    first.add_listener(lambda location, record: seen.append(record["seq"]))
+    for i in range(0, 20, 2):
+        first.append({"seq": i})
+        second.append({"seq": i + 1})
+    first.sync()
+
+    assert seen == list(range(20))
+    assert [record["seq"] for _, record in first.iter_records()] == list(range(20))
+    locations = [location for location, _ in second.iter_records()]
+    assert len(set(locations)) == 20
+    assert [record["seq"] for _, record in first.read_locations(locations[5:6])] == [5]
+    first.close()
+    second.close()
+
+def _append_from_worker(directory, worker, count):
+    store = SegmentedAuditStore(directory, max_segment_bytes=2048, multi_process=True)
+    for i in range(count):
+        store.append_many([{"worker": worker, "seq": i}])
+    store.close()
+
+def test_worker_processes_append_to_one_store(tmp_path):
+    directory = str(tmp_path / "audit")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_from_worker, args=(directory, worker, 200)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    assert all(process.exitcode == 0 for process in workers)
+
+    store = SegmentedAuditStore(directory)
+    records = [record for _, record in store.iter_records()]
+    store.close()
+    assert len(records) == 800
+    for worker in range(4):
+        assert [record["seq"] for record in records if record["worker"] == worker] == list(range(200))
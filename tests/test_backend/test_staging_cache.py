@@ -0,0 +1,141 @@
+import sys
+import threading
+from types import SimpleNamespace
+from backend.cohosted_vault import VAULT_DIR, import_vault_modules, start_cohosted_vault
+from backend.models.policy import PolicyManager
+from backend.services.data_masking import DataMaskingService
+from backend.services.staging_cache import RecordStager, StagedRecordCache, scope_record
+from backend.utils.token_generator import generate_token
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakePolicyEngine:
+    def __init__(self):
+        self.index = PolicyManager.from_dicts([{
+            "partner_id": "partner_ABC",
+            "data_usage": {"purpose": "loan_application", "allowed_data": ["credit_score", "email", "transactions"],
+                           "masked_fields": ["transactions[].description"]},
+        }]).compile()
+        self.snapshot = SimpleNamespace(version="v1", index=self.index)
+
+    def allowed_data(self, partner_id, purpose):
+        return self.index.allowed_data(partner_id, purpose)
+
+def wait_staged(cache, count=1):
+    for _ in range(200):
+        if cache.stats["staged"] + cache.stats["failures"] >= count:
+            return
+        threading.Event().wait(0.01)
+
+def test_pop_returns_staged_payload_once():
+    cache = StagedRecordCache()
+    cache.stage("tok", lambda: {"credit_score": 720}, ttl=60)
+    assert cache.pop("tok") == {"credit_score": 720}
+    assert cache.pop("tok") is None
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+    assert cache.hit_rate == 0.5
+    assert cache.bytes_used == 0
+
+def test_pop_waits_for_payload_being_prepared():
+    release = threading.Event()
+    cache = StagedRecordCache(wait_timeout=2)
+
+    def slow_loader():
+        release.wait(2)
+        return {"ready": True}
+
+    cache.stage("tok", slow_loader, ttl=60)
+    threading.Timer(0.05, release.set).start()
+    assert cache.pop("tok") == {"ready": True}
+
+def test_payload_expires_with_token():
+    clock = FakeClock()
+    cache = StagedRecordCache(clock=clock)
+    cache.stage("tok", lambda: {"a": 1}, ttl=5)
+    wait_staged(cache)
+    clock.now = 5
+    assert cache.pop("tok") is None
+    assert cache.stats["expirations"] == 1
+
+def test_expired_payloads_are_purged_on_stage():
+    clock = FakeClock()
+    cache = StagedRecordCache(clock=clock)
+    cache.stage("old", lambda: {"a": 1}, ttl=5)
+    wait_staged(cache)
+    clock.now = 10
+    cache.stage("new", lambda: {"a": 2}, ttl=5)
+    wait_staged(cache, 2)
+    assert len(cache) == 1
+    assert cache.bytes_used == len('{"a":2}')
+
+def test_entry_and_byte_caps_evict_oldest():
+    cache = StagedRecordCache(max_entries=2)
+    for i in range(3):
+        cache.stage("tok-%d" % i, lambda i=i: {"i": i}, ttl=60)
+    wait_staged(cache, 2)
+    assert cache.pop("tok-0") is None
+    assert cache.stats["evictions"] == 1
+
+    cache = StagedRecordCache(max_bytes=30)
+    cache.stage("big-1", lambda: {"data": "x" * 10}, ttl=60)
+    wait_staged(cache)
+    cache.stage("big-2", lambda: {"data": "y" * 10}, ttl=60)
+    wait_staged(cache, 2)
+    assert cache.bytes_used <= 30
+    assert cache.pop("big-1") is None
+    assert cache.pop("big-2") == {"data": "y" * 10}
+
+def test_failed_loader_leaves_nothing_staged():
+    cache = StagedRecordCache()
+
+    def broken():
+        raise KeyError("user")
+
+    cache.stage("tok", broken, ttl=60)
+    wait_staged(cache)
+    assert cache.stats["failures"] == 1
+    assert cache.pop("tok") is None
+
+def test_stager_scopes_and_masks_record():
+    record = {"user_id": "user_123", "name": "Alice", "email": "alice@example.com", "credit_score": 720,
+              "transactions": [{"amount": 5, "description": "Rent"}]}
+    cache = StagedRecordCache()
+    stager = RecordStager(cache, {"user_123": record}, FakePolicyEngine(), DataMaskingService(),
+                          masked_fields=["email"], ttl=60)
+    stager.stage("tok", "partner_ABC", "user_123", "loan_application")
+    stager.stage("unknown", "partner_ABC", "user_999", "loan_application")
+    assert cache.pop("tok") == {"user_id": "user_123", "email": "*" * 17, "credit_score": 720,
+                                "transactions": [{"amount": 5, "description": "****"}]}
+    assert record["transactions"][0]["description"] == "Rent"
+    assert cache.pop("unknown") is None
+    assert scope_record(record, ()) == {"user_id": "user_123"}
+
+def test_cohosted_vault_serves_staged_payloads():
+    cache = StagedRecordCache()
+    token = generate_token("user_123")
+    cache.stage(token, lambda: {"user_id": "user_123", "credit_score": 720}, ttl=60)
+    unstaged = generate_token("user_456")
+    gateway_config = sys.modules.get("config")
+    server = start_cohosted_vault(cache, "127.0.0.1", 0)
+    try:
+        session_module, = import_vault_modules("session")
+        request = {"action": "retrieve_data", "parameters": {"user_id": "user_123"}}
+        with session_module.VaultSession("127.0.0.1", server.port) as session:
+            staged, replayed, forged, missed = session.retrieve_many(
+                [(token, request), (token, request), ("forged", request), (unstaged, request)])
+    finally:
+        server.stop()
+    assert staged == {"status": "success", "data": {"user_id": "user_123", "credit_score": 720}}
+    assert replayed == {"status": "error", "message": "Token has already been used"}
+    assert forged == {"status": "error", "message": "Invalid token"}
+    # A valid token whose payload is not staged gets no data, not its request echoed back.
+    assert missed == {"status": "error", "message": "Record not staged"}
+    # The vault's bare module names do not leak into the gateway's process.
+    assert VAULT_DIR not in sys.path
+    assert sys.modules.get("config") is gateway_config
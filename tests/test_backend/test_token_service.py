@@ -0,0 +1,75 @@
+from datetime import timedelta
+import warnings
+import jwt
+import pytest
+from backend.utils.token_service import HS256TokenService
+
+SECRET = "test-secret-key-that-is-long-enough"
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(autouse=True)
+def ignore_key_length_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+def test_tokens_interoperate_with_pyjwt():
+    service = HS256TokenService(SECRET)
+    token = service.mint("user_123")
+    assert jwt.decode(token, SECRET, algorithms=["HS256"])["sub"] == "user_123"
+
+    other = jwt.encode({"sub": "user_456", "exp": 4_000_000_000}, SECRET, algorithm="HS256")
+    assert service.verify(other)["sub"] == "user_456"
+
+def test_mint_many_shares_expiry():
+    service = HS256TokenService(SECRET)
+    tokens = service.mint_many(["a", "b", "c"], expires_delta=timedelta(seconds=60))
+    claims = [service.verify(t) for t in tokens]
+    assert [c["sub"] for c in claims] == ["a", "b", "c"]
+    assert len({c["exp"] for c in claims}) == 1
+    tokens = service.mint_many(["a", "b"], claims=[{"purpose": "x"}, {"purpose": "y"}])
+    assert [(c["sub"], c["purpose"]) for c in map(service.verify, tokens)] == [("a", "x"), ("b", "y")]
+
+def test_extra_claims_never_override_subject_or_expiry():
+    service = HS256TokenService(SECRET, clock=FakeClock())
+    extra = {"sub": "admin", "exp": 4_000_000_000, "purpose": "x"}
+    token = service.mint("user_123", timedelta(seconds=60), extra)
+    assert service.verify(token) == {"purpose": "x", "sub": "user_123", "exp": 1_700_000_060}
+    assert service.mint_many(["user_123"], timedelta(seconds=60), [extra]) == [token]
+
+def test_expired_token_rejected_even_when_cached():
+    clock = FakeClock()
+    service = HS256TokenService(SECRET, verify_cache_ttl=600, clock=clock)
+    token = service.mint("user_123", expires_delta=timedelta(seconds=10))
+    assert service.verify(token) is not None
+    clock.now += 10
+    assert service.verify(token) is None
+
+def test_repeat_verification_hits_cache():
+    service = HS256TokenService(SECRET)
+    token = service.mint("user_123")
+    service.verify(token)
+    service.verify(token)
+    assert service.stats["cache_hits"] == 1
+
+def test_cached_signature_with_forged_payload_rejected():
+    service = HS256TokenService(SECRET)
+    token = service.mint("user_123")
+    assert service.verify(token) is not None
+    header, payload, signature = token.split(".")
+    forged_payload = service.mint("admin").split(".")[1]
+    assert service.verify(f"{header}.{forged_payload}.{signature}") is None
+
+@pytest.mark.parametrize("token", ["", "abc", "a.b.c", "a.b"])
+def test_malformed_tokens_rejected(token):
+    assert HS256TokenService(SECRET).verify(token) is None
+
+def test_wrong_key_rejected():
+    token = HS256TokenService("another-secret-key-entirely-different").mint("user_123")
+    assert HS256TokenService(SECRET).verify(token) is None
@@ -0,0 +1,110 @@
+import logging
+import pytest
+from backend.services.data_masking import DataMaskingService
+from backend.services.tokenization import Tokenizer, TokenVault
+
+def test_tokens_are_deterministic_and_keyed():
+    tokenizer = Tokenizer("key-1")
+    assert tokenizer.tokenize("4111-1111-1111-1111") == Tokenizer("key-1").tokenize("4111-1111-1111-1111")
+    assert tokenizer.tokenize("4111-1111-1111-1111") != Tokenizer("key-2").tokenize("4111-1111-1111-1111")
+
+def test_tokens_preserve_format():
+    tokenizer = Tokenizer("key")
+    token = tokenizer.tokenize("Alice Smith, ACCT 0042-17")
+    assert len(token) == len("Alice Smith, ACCT 0042-17")
+    assert token[5] == " " and token[11:13] == ", " and token[22] == "-"
+    assert token[0].isupper() and token[1:5].islower() and token[18:22].isdigit()
+    number = tokenizer.tokenize(123456)
+    assert isinstance(number, int) and len(str(number)) == 6
+    assert tokenizer.tokenize(-123456) == -number
+    assert tokenizer.tokenize(None) is None
+    assert tokenizer.tokenize(True) is True
+
+def test_tokenize_many_matches_tokenize():
+    tokenizer = Tokenizer("key", cache_size=2)
+    values = ["a1", "b2", "a1", 77, None, "c3", "a1"]
+    assert tokenizer.tokenize_many(values) == [Tokenizer("key").tokenize(value) for value in values]
+    assert tokenizer.tokenize_many(iter(["x"])) == [tokenizer.tokenize("x")]
+
+def test_vault_round_trip_and_persistence(tmp_path):
+    path = str(tmp_path / "vault.bin")
+    tokenizer = Tokenizer("key", vault=TokenVault(path))
+    tokens = tokenizer.tokenize_many(["acct-001", "acct-002", "acct-001", 9001])
+    single = tokenizer.tokenize("acct-003")
+    assert tokenizer.detokenize(tokens[0]) == "acct-001"
+    assert len(tokenizer.vault) == 4
+    tokenizer.vault.close()
+
+    reopened = Tokenizer("key", vault=TokenVault(path))
+    assert reopened.detokenize(single) == "acct-003"
+    assert reopened.detokenize(tokens[3]) == 9001
+    with pytest.raises(LookupError):
+        reopened.detokenize("unknown")
+    with pytest.raises(LookupError):
+        Tokenizer("key").detokenize(single)
+
+def test_vault_drops_a_truncated_tail(tmp_path):
+    path = str(tmp_path / "vault.bin")
+    vault = TokenVault(path)
+    vault.record_many([("tok-a", "a"), ("tok-b", "b")])
+    vault.close()
+    with open(path, "r+b") as file:
+        file.truncate(file.seek(0, 2) - 1)
+    vault = TokenVault(path)
+    assert vault.get("tok-a") == "a" and vault.get("tok-b") is None
+    vault.record("tok-c", "c")
+    vault.close()
+    assert TokenVault(path).get("tok-c") == "c"
+
+def test_masking_service_tokenizes_fields():
+    service = DataMaskingService(tokenizer=Tokenizer("key"))
+    records = [{"account_number": "0042", "name": "Ann"}, {"account_number": "0042"}, {"name": "Bob"}]
+    tokenized = service.tokenize_batch(records, ["account_number"])
+    assert tokenized == [service.tokenize_data(record, ["account_number"]) for record in records]
+    assert tokenized[0]["account_number"] == tokenized[1]["account_number"] == service.generate_token("0042")
+    assert tokenized[0]["name"] == "Ann"
+    assert records[0]["account_number"] == "0042"
+
+def test_vault_keeps_the_first_value_and_logs_a_collision(tmp_path, caplog):
+    vault = TokenVault(str(tmp_path / "vault.bin"))
+    token = Tokenizer("key").tokenize("1234")
+    vault.record(token, "9999")
+    tokenizer = Tokenizer("key", vault=vault)
+    with caplog.at_level(logging.WARNING, logger="backend.services.tokenization"):
+        assert tokenizer.tokenize("1234") == token
+    assert vault.get(token) == "9999"
+    assert vault.stats["collisions"] == 1
+    assert "collision" in caplog.text and "1234" not in caplog.text
+    # Values that tokenize to themselves are not recorded.
+    assert tokenizer.tokenize("--") == "--"
+    assert len(vault) == 1
+    vault.close()
+
+def test_vault_keeps_int_and_str_tokens_apart(tmp_path):
+    plain = Tokenizer("key")
+    # An int and a str value whose tokens have the same text.
+    value_int, value_str = next((i, str(j)) for i in range(10) for j in range(10)
+                                if str(plain.tokenize(i)) == plain.tokenize(str(j)))
+    path = str(tmp_path / "vault.bin")
+    tokenizer = Tokenizer("key", vault=TokenVault(path))
+    int_token, str_token = tokenizer.tokenize_many([value_int, value_str])
+    assert tokenizer.detokenize(int_token) == value_int
+    assert tokenizer.detokenize(str_token) == value_str
+    assert tokenizer.vault.stats["collisions"] == 0
+    tokenizer.vault.close()
+
+    reopened = TokenVault(path)
+    assert reopened.get(int_token) == value_int and reopened.get(str_token) == value_str
+    reopened.close()
+
+def test_tokenize_many_records_what_tokenize_records(tmp_path):
+    one, many = TokenVault(str(tmp_path / "one.bin")), TokenVault(str(tmp_path / "many.bin"))
+    values = ["--", "1234", "ab-cd", 7, 42]
+    for value in values:
+        Tokenizer("key", vault=one).tokenize(value)
+    Tokenizer("key", vault=many).tokenize_many(values)
+    assert len(many) == len(one) == 4
+    one.close()
+    many.close()
+    with open(str(tmp_path / "one.bin"), "rb") as a, open(str(tmp_path / "many.bin"), "rb") as b:
+        assert a.read() == b.read()
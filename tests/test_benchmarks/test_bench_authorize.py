@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+REPOSITORY = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DATA_DIR = os.path.join(REPOSITORY, 'backend', 'data')
+
+def list_data_files():
+    listing = {}
+    for root, _, files in os.walk(DATA_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            listing[os.path.relpath(path, DATA_DIR)] = os.stat(path).st_mtime_ns
+    return listing
+
+def test_benchmark_leaves_the_repository_data_untouched():
+    # Run with the gateway's default settings, not the scratch paths the test session sets.
+    env = {name: value for name, value in os.environ.items()
+           if not name.startswith(('AUDIT_', 'POLICY_'))}
+    env['PYTHONPATH'] = REPOSITORY
+    before = list_data_files()
+    subprocess.run([sys.executable, '-c', 'from benchmarks import bench_authorize; bench_authorize.run(200, 20)'],
+                   cwd=REPOSITORY, env=env, check=True, timeout=120)
+    assert list_data_files() == before
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The data exchange service runs from its own directory and imports its
+# modules (config, utils.*) by bare name.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'data-exchange'))
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+from async_server import AsyncDataVaultServer
+from utils.framing import read_message, write_message
+
+def make_server(**kwargs):
+    options = {"host": "127.0.0.1", "port": 0, "read_timeout": 2, "write_timeout": 2, "queue_timeout": 2,
+               "drain_timeout": 2}
+    options.update(kwargs)
+    return AsyncDataVaultServer(**options)
+
+async def request(port, payload):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await write_message(writer, payload)
+    response = await read_message(reader)
+    writer.close()
+    return (response or b"").decode()
+
+def test_same_response_as_threaded_server():
+    async def scenario():
+        server = make_server()
+        await server.serve()
+        try:
+            payload = json.dumps({"action": "retrieve_data"})
+            assert await request(server.port, payload) == server.process_request(payload)
+        finally:
+            await server.stop()
+    asyncio.run(scenario())
+
+def test_connections_beyond_limit_wait_for_a_slot():
+    async def scenario():
+        server = make_server(max_connections=1, read_timeout=0.5, queue_timeout=0.1)
+        await server.serve()
+        try:
+            # Hold the only slot without sending anything.
+            _, idle_writer = await asyncio.open_connection("127.0.0.1", server.port)
+            await asyncio.sleep(0.05)
+            assert await request(server.port, "hello") == ""
+            idle_writer.close()
+            await asyncio.sleep(0.6)
+            assert json.loads(await request(server.port, "hello"))["status"] == "success"
+        finally:
+            await server.stop()
+    asyncio.run(scenario())
+
+def test_stop_drains_in_flight_connections():
+    async def scenario():
+        server = make_server()
+        await server.serve()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await asyncio.sleep(0.05)
+        stopping = asyncio.ensure_future(server.stop())
+        await asyncio.sleep(0.05)
+        await write_message(writer, b"late request")
+        response = await read_message(reader)
+        await stopping
+        assert json.loads(response.decode())["data"] == "late request"
+    asyncio.run(scenario())
+
+def test_large_request_round_trips_in_chunks():
+    async def scenario():
+        server = make_server()
+        await server.serve()
+        try:
+            payload = "x" * (3 * 64 * 1024 + 17)
+            assert json.loads(await request(server.port, payload))["data"] == payload
+        finally:
+            await server.stop()
+    asyncio.run(scenario())
+
+def test_entry_points_serve_the_record_store_from_any_working_directory(tmp_path, monkeypatch):
+    import config
+    import server
+    from utils.record_store import build_store
+    assert os.path.isabs(config.RECORD_STORE_DIR)
+    build_store(str(tmp_path / "records"), [{"user_id": "user_1", "credit_score": 720}])
+    monkeypatch.setattr(server, "RECORD_STORE_DIR", str(tmp_path / "records"))
+    monkeypatch.chdir(tmp_path)
+    backends = server.default_backends()
+    assert backends["record_store"].get("user_1")["credit_score"] == 720
+    assert backends["token_validator"].secret_key == config.TOKEN_SECRET_KEY
+    assert make_server(**backends).record_store is backends["record_store"]
@@ -0,0 +1,90 @@
+import json
+import socket
+import threading
+
+import pytest
+
+from server import DataVaultServer
+from utils.framing import (FrameError, HEADER, decode_header, encode_header, iter_frames, iter_json_frames,
+                           iter_message_chunks, recv_json, recv_message, send_message)
+
+
+def test_header_round_trip():
+    assert decode_header(encode_header(1234)) == (1234, False)
+    assert decode_header(encode_header(1234, more=True)) == (1234, True)
+
+
+def test_iter_frames_splits_payload_without_copying():
+    payload = bytearray(b"a" * 10)
+    frames = list(iter_frames(payload, chunk_size=4))
+    assert [decode_header(header) for header, _ in frames] == [(4, True), (4, True), (2, False)]
+    assert all(isinstance(chunk, memoryview) and chunk.obj is payload for _, chunk in frames)
+
+
+def test_empty_message_is_a_single_frame():
+    left, right = socket.socketpair()
+    with left, right:
+        send_message(left, b"")
+        assert recv_message(right) == b""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_json_frames_decode_to_the_same_document(chunk_size):
+    document = {"transactions": [{"id": i, "description": "payment %d" % i} for i in range(200)]}
+    frames = list(iter_json_frames(document, chunk_size=chunk_size))
+    assert all(decode_header(header)[0] <= chunk_size for header, _ in frames)
+    assert [decode_header(header)[1] for header, _ in frames] == [True] * (len(frames) - 1) + [False]
+    assert json.loads(b"".join(bytes(chunk) for _, chunk in frames)) == document
+
+
+def test_multi_megabyte_message_streams_over_a_socket():
+    payload = bytes(range(256)) * (3 * 1024 * 1024 // 256)
+    left, right = socket.socketpair()
+    with left, right:
+        sender = threading.Thread(target=send_message, args=(left, payload), kwargs={"chunk_size": 64 * 1024})
+        sender.start()
+        chunks = list(iter_message_chunks(right))
+        sender.join()
+    assert max(len(chunk) for chunk in chunks) == 64 * 1024
+    assert b"".join(chunks) == payload
+
+
+def test_clean_close_returns_none():
+    left, right = socket.socketpair()
+    with right:
+        left.close()
+        assert recv_message(right) is None
+
+
+def test_truncated_frame_raises():
+    left, right = socket.socketpair()
+    with right:
+        left.sendall(encode_header(100) + b"only part")
+        left.close()
+        with pytest.raises(FrameError):
+            recv_message(right)
+
+
+def test_oversized_message_is_rejected():
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(encode_header(1024))
+        with pytest.raises(FrameError):
+            recv_message(right, max_size=512)
+
+
+def test_threaded_server_streams_large_response():
+    server = DataVaultServer(host="127.0.0.1", port=0, read_timeout=2)
+    acceptor = threading.Thread(target=server.start, daemon=True)
+    acceptor.start()
+    try:
+        payload = "r" * (512 * 1024)
+        with socket.create_connection(("127.0.0.1", server.port)) as client:
+            send_message(client, payload)
+            first = client.recv(HEADER.size, socket.MSG_PEEK | socket.MSG_WAITALL)
+            assert decode_header(first)[1], "a large response should span several frames"
+            response = recv_json(client)
+        assert response == {"status": "success", "data": payload}
+    finally:
+        server.stop()
+        acceptor.join(2)
@@ -0,0 +1,47 @@
+import threading
+from urllib.request import urlopen
+
+import pytest
+
+from server import DataVaultServer
+from session import VaultSession
+from utils.metrics import CONTENT_TYPE, registry, serve_metrics
+
+
+@pytest.fixture
+def server():
+    server = DataVaultServer(host="127.0.0.1", port=0, read_timeout=2)
+    threading.Thread(target=server.start, daemon=True).start()
+    yield server
+    server.stop()
+
+
+def test_session_requests_are_counted_and_timed(server):
+    requests = registry.get('vault_requests_total').labels('session', 'success')
+    latency = registry.get('vault_request_duration_seconds').labels('session')
+    before_requests, before_latency = requests.value, latency.count
+    with VaultSession("127.0.0.1", server.port) as session:
+        session.retrieve_many([("token", {"action": "retrieve_data"})] * 3)
+    assert requests.value == before_requests + 3
+    assert latency.count == before_latency + 3
+
+
+def test_metrics_are_served_over_http(server):
+    metrics_server = serve_metrics("127.0.0.1", 0)
+    try:
+        with VaultSession("127.0.0.1", server.port) as session:
+            session.retrieve("token", {"action": "retrieve_data"})
+        with urlopen(f"http://127.0.0.1:{metrics_server.server_address[1]}/metrics", timeout=5) as response:
+            assert response.headers['Content-Type'] == CONTENT_TYPE
+            text = response.read().decode('utf-8')
+        assert '# TYPE vault_request_duration_seconds histogram' in text
+        assert 'vault_stage_duration_seconds_count{stage="send"}' in text
+    finally:
+        metrics_server.shutdown()
+        metrics_server.server_close()
+
+
+def test_vault_and_gateway_share_one_registry():
+    from backend.utils.metrics import registry as gateway_registry
+    assert registry is gateway_registry
+    assert 'vault_stage_duration_seconds' in gateway_registry.render()
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+from utils.record_store import DATA_FILE, RecordStore, build_store, encode_record
+
+
+def make_users(count):
+    return [{"name": "User %d" % i, "user_id": "user_%d" % i, "transaction_history": [{"amount": i}]}
+            for i in range(count)]
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    directory = str(tmp_path / "records")
+    build_store(directory, iter(make_users(500)))
+    return directory
+
+
+def test_lookup_by_user_id(store_dir):
+    store = RecordStore(store_dir)
+    assert len(store) == 500
+    assert store.get("user_321") == {"user_id": "user_321", "name": "User 321",
+                                     "transaction_history": [{"amount": 321}]}
+    assert json.loads(bytes(store.get_bytes("user_7")))["name"] == "User 7"
+    assert store.get("user_999") is None
+    assert "user_0" in store and "missing" not in store
+
+
+def test_records_are_stored_with_user_id_first():
+    assert encode_record({"a": 1, "user_id": "u"}) == b'{"user_id":"u","a":1}\n'
+
+
+def test_appends_are_visible_and_survive_reopen(store_dir):
+    store = RecordStore(store_dir)
+    store.append({"user_id": "user_3", "name": "Updated"})
+    store.append_many([{"user_id": "user_new"}])
+    assert store.get("user_3")["name"] == "Updated"
+    assert store.get("user_new") == {"user_id": "user_new"}
+    store.close()
+
+    reopened = RecordStore(store_dir)
+    assert reopened.get("user_3")["name"] == "Updated"
+    assert reopened.get("user_new") == {"user_id": "user_new"}
+
+
+def test_rebuild_index_folds_in_appends(store_dir):
+    store = RecordStore(store_dir)
+    store.append({"user_id": "user_3", "name": "Updated"})
+    store.append({"user_id": "user_500", "name": "New"})
+    assert store.rebuild_index() == 501
+    assert len(store) == 501
+    assert store.get("user_3")["name"] == "Updated"
+    assert store.get("user_500")["name"] == "New"
+
+
+def test_partial_append_is_ignored(store_dir):
+    with open(os.path.join(store_dir, DATA_FILE), "ab") as file:
+        file.write(b'{"user_id":"user_half","na')
+    store = RecordStore(store_dir)
+    assert store.get("user_half") is None
+    store.append({"user_id": "user_after"})
+    assert store.get("user_after") == {"user_id": "user_after"}
+    assert RecordStore(store_dir).get("user_after") == {"user_id": "user_after"}
+    assert store.rebuild_index() == 501
+
+
+def test_empty_store(tmp_path):
+    store = RecordStore(str(tmp_path / "empty"))
+    assert len(store) == 0
+    assert store.get("anyone") is None
+    store.append({"user_id": "first"})
+    assert store.get("first") == {"user_id": "first"}
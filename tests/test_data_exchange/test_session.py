@@ -0,0 +1,150 @@
+import asyncio
+from datetime import timedelta
+import threading
+
+import pytest
+
+from async_server import AsyncDataVaultServer
+from server import DataVaultServer
+from session import VaultSession
+from utils.token_validator import TokenValidator
+
+
+@pytest.fixture
+def threaded_server():
+    servers = []
+
+    def start(**kwargs):
+        server = DataVaultServer(host="127.0.0.1", port=0, read_timeout=2, **kwargs)
+        threading.Thread(target=server.start, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def request_for(user_id):
+    return {"action": "retrieve_data", "parameters": {"user_id": user_id}}
+
+
+def test_pipelined_requests_share_one_connection(threaded_server):
+    server = threaded_server()
+    with VaultSession("127.0.0.1", server.port, pipeline_depth=4) as session:
+        items = [("token-%d" % i, request_for("user_%d" % i)) for i in range(10)]
+        responses = session.retrieve_many(items)
+        assert [response["data"]["parameters"]["user_id"] for response in responses] == [
+            "user_%d" % i for i in range(10)]
+        assert session.retrieve("token-x", request_for("user_x"))["status"] == "success"
+        assert session.stats["connections_opened"] == 1
+        assert session.stats["connections_reused"] == 1
+
+
+def test_each_request_consumes_its_own_token(threaded_server):
+    server = threaded_server(token_validator=TokenValidator(["t1", "t2"]))
+    with VaultSession("127.0.0.1", server.port) as session:
+        responses = session.retrieve_many([
+            ("t1", request_for("user_1")),
+            ("t1", request_for("user_1")),
+            ("t2", request_for("user_2")),
+            ("forged", request_for("user_3")),
+        ])
+    assert [response["status"] for response in responses] == ["success", "error", "success", "error"]
+    assert responses[1]["message"] == "Invalid token"
+
+
+def test_stale_pooled_connections_are_replaced(threaded_server):
+    server = threaded_server(session_idle_timeout=0.1)
+    with VaultSession("127.0.0.1", server.port, max_idle=0.05) as session:
+        session.retrieve("a", request_for("user_1"))
+        threading.Event().wait(0.2)
+        assert session.retrieve("b", request_for("user_1"))["status"] == "success"
+        assert session.stats["connections_opened"] == 2
+
+
+def test_concurrent_callers_get_separate_connections(threaded_server):
+    server = threaded_server()
+    results = []
+    with VaultSession("127.0.0.1", server.port, pool_size=2) as session:
+        def worker(n):
+            results.extend(session.retrieve_many([("t", request_for("user_%d" % n))] * 5))
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        assert session.stats["connections_opened"] <= 2
+    assert len(results) == 20
+
+
+def test_async_server_supports_sessions():
+    async def scenario():
+        server = AsyncDataVaultServer(host="127.0.0.1", port=0, read_timeout=2, write_timeout=2,
+                                      queue_timeout=2, drain_timeout=0.5,
+                                      token_validator=TokenValidator(["t1"]))
+        await server.serve()
+        try:
+            with VaultSession("127.0.0.1", server.port) as session:
+                return await asyncio.get_running_loop().run_in_executor(None, session.retrieve_many, [
+                    ("t1", request_for("user_1")),
+                    ("t1", request_for("user_1")),
+                ])
+        finally:
+            await server.stop()
+    responses = asyncio.run(scenario())
+    assert [response["status"] for response in responses] == ["success", "error"]
+
+
+def test_staged_payloads_are_served_from_the_cache(threaded_server):
+    from backend.services.staging_cache import StagedRecordCache
+    cache = StagedRecordCache()
+    cache.stage("t1", lambda: {"user_id": "user_1", "credit_score": 720}, ttl=60)
+    server = threaded_server(staging_cache=cache)
+    with VaultSession("127.0.0.1", server.port) as session:
+        staged, unstaged = session.retrieve_many([("t1", request_for("user_1")), ("t2", request_for("user_2"))])
+    assert staged["data"] == {"user_id": "user_1", "credit_score": 720}
+    assert unstaged == {"status": "error", "message": "Record not staged"}
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_retrievals_are_served_from_the_record_store(threaded_server, tmp_path):
+    from backend.utils.token_service import HS256TokenService
+    from utils.record_store import RecordStore, build_store
+    build_store(str(tmp_path), [{"user_id": "user_1", "name": "Alice", "credit_score": 720, "ssn": "123-45-6789",
+                                 "transactions": [{"amount": 5, "description": "Rent"}]}])
+    gateway = HS256TokenService("shared-key", default_expires=timedelta(seconds=60))
+    release = {"partner_id": "partner_ABC", "purpose": "loan_application",
+               "allowed_data": ["name", "credit_score", "transactions"],
+               "masked_fields": ["name", "transactions[].description"]}
+    server = threaded_server(record_store=RecordStore(str(tmp_path)),
+                             token_validator=TokenValidator(["unbound"], secret_key="shared-key"))
+    # Distinct lifetimes keep tokens minted in the same second distinct.
+    own, other_user, other_purpose = [gateway.mint("user_1", timedelta(seconds=60 - i), release) for i in range(3)]
+    missing = gateway.mint("user_2", claims=release)
+    with VaultSession("127.0.0.1", server.port) as session:
+        responses = session.retrieve_many([
+            (own, request_for("user_1")),
+            (other_user, request_for("user_2")),
+            (other_purpose, dict(request_for("user_1"), parameters={"purpose": "marketing"})),
+            (missing, {"action": "retrieve_data", "parameters": {}}),
+            ("unbound", request_for("user_1")),
+            (own, request_for("user_1")),
+        ])
+    # Only the allowed fields of the token's own user, with the release's masking applied.
+    assert responses[0] == {"status": "success", "data": {
+        "user_id": "user_1", "name": "*****", "credit_score": 720,
+        "transactions": [{"amount": 5, "description": "****"}]}}
+    assert responses[1] == {"status": "error", "message": "Token is not valid for this user_id"}
+    assert responses[2] == {"status": "error", "message": "Token is not valid for this purpose"}
+    assert responses[3] == {"status": "error", "message": "Record not found"}
+    assert responses[4] == {"status": "error", "message": "Token does not grant access to a record"}
+    assert responses[5] == {"status": "error", "message": "Token has already been used"}
+
+
+def test_record_store_requires_a_token_validator(tmp_path):
+    from utils.record_store import RecordStore, build_store
+    build_store(str(tmp_path), [{"user_id": "user_1"}])
+    with pytest.raises(ValueError):
+        DataVaultServer(host="127.0.0.1", port=0, record_store=RecordStore(str(tmp_path)))
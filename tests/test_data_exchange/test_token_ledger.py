@@ -0,0 +1,109 @@
+from datetime import timedelta
+import pytest
+from utils.token_ledger import TokenLedger
+from utils.token_validator import TokenValidator
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def test_token_can_be_consumed_once(clock):
+    ledger = TokenLedger(max_ttl=300, clock=clock)
+    ledger.issue("t1")
+    assert ledger.consume("t1")
+    assert not ledger.consume("t1")
+    assert len(ledger) == 0
+
+def test_unknown_token_rejected(clock):
+    ledger = TokenLedger(max_ttl=300, clock=clock)
+    assert not ledger.consume("never-issued")
+
+def test_expired_tokens_are_evicted(clock):
+    ledger = TokenLedger(max_ttl=300, clock=clock)
+    for i in range(1000):
+        ledger.issue(f"t{i}", ttl=10 + i % 50)
+    clock.now += 30
+    ledger.expire()
+    assert 0 < len(ledger) < 1000
+    clock.now += 31
+    ledger.expire()
+    assert len(ledger) == 0
+    assert ledger.stats["expired"] == 1000
+
+def test_token_never_evicted_early(clock):
+    ledger = TokenLedger(max_ttl=300, resolution=1.0, clock=clock)
+    clock.now = 1000.4
+    ledger.issue("t1", ttl=5)
+    clock.now = 1005.3
+    assert ledger.consume("t1")
+
+def test_consume_after_expiry_fails(clock):
+    ledger = TokenLedger(max_ttl=300, clock=clock)
+    ledger.issue("t1", ttl=5)
+    clock.now += 5
+    assert not ledger.consume("t1")
+
+def test_long_idle_gap_clears_wheel(clock):
+    ledger = TokenLedger(max_ttl=10, clock=clock)
+    ledger.issue("t1")
+    clock.now += 10_000
+    ledger.issue("t2")
+    assert len(ledger) == 1
+    assert ledger.consume("t2")
+
+def test_ttl_above_maximum_rejected(clock):
+    with pytest.raises(ValueError):
+        TokenLedger(max_ttl=10, clock=clock).issue("t1", ttl=11)
+
+def test_validator_enforces_single_use(clock):
+    validator = TokenValidator(["t1"], ledger=TokenLedger(max_ttl=300, clock=clock))
+    assert validator.is_valid("t1")
+    assert validator.validate("t1")["status"] == "success"
+    assert validator.validate("t1") == {"status": "error", "message": "Invalid token"}
+
+def test_validator_reports_expiry(clock):
+    validator = TokenValidator(ledger=TokenLedger(max_ttl=300, resolution=60, clock=clock))
+    validator.issue("t1", ttl=5)
+    clock.now += 6
+    assert validator.validate("t1") == {"status": "error", "message": "Token has expired"}
+
+def test_issue_new_leaves_live_tokens_alone(clock):
+    ledger = TokenLedger(max_ttl=300, clock=clock)
+    assert ledger.issue_new("t1", ttl=10)
+    assert not ledger.issue_new("t1", ttl=10)
+    clock.now += 11
+    assert ledger.issue_new("t1", ttl=10)
+
+def test_validator_accepts_gateway_tokens_once(clock):
+    from backend.utils.token_service import HS256TokenService
+    gateway = HS256TokenService("shared-key", default_expires=timedelta(seconds=300), clock=clock)
+    validator = TokenValidator(secret_key="shared-key", clock=clock)
+    token = gateway.mint("user_1", claims={"partner_id": "partner_ABC"})
+
+    result = validator.validate(token)
+    assert result["status"] == "success"
+    assert result["claims"]["sub"] == "user_1"
+    assert result["claims"]["partner_id"] == "partner_ABC"
+    assert validator.validate(token) == {"status": "error", "message": "Token has already been used"}
+
+    forged = HS256TokenService("other-key", clock=clock).mint("user_1", expires_delta=timedelta(seconds=60))
+    assert validator.validate(forged) == {"status": "error", "message": "Invalid token"}
+    assert validator.validate("not-a-token") == {"status": "error", "message": "Invalid token"}
+
+    expiring = gateway.mint("user_2", expires_delta=timedelta(seconds=5))
+    clock.now += 6
+    assert validator.validate(expiring) == {"status": "error", "message": "Token has expired"}
+    long_lived = gateway.mint("user_3", expires_delta=timedelta(hours=1))
+    assert validator.validate(long_lived)["message"] == "Token lifetime exceeds the vault's limit"
+
+def test_validator_without_key_rejects_gateway_tokens(clock):
+    from backend.utils.token_service import HS256TokenService
+    token = HS256TokenService("shared-key", clock=clock).mint("user_1", expires_delta=timedelta(seconds=60))
+    assert TokenValidator(ledger=TokenLedger(max_ttl=300, clock=clock)).validate(token)["status"] == "error"
@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+from backend.services.audit_store import SegmentedAuditStore
+
+SCRIPT = os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'generate_mock_data.py')
+
+def generate(directory, *options):
+    """Runs the generator in ``directory`` and returns the bytes of each file it wrote there, by name."""
+    os.makedirs(directory, exist_ok=True)
+    subprocess.run([sys.executable, os.path.abspath(SCRIPT)] + [str(option) for option in options],
+                   cwd=directory, check=True, capture_output=True, timeout=120)
+    written = {}
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                written[name] = f.read()
+    return written
+
+def generate_users(directory, *options):
+    return generate(directory, '--users', 2500, '--shard-size', 1000, '--output', 'users.jsonl',
+                    '--consents-output', 'consents.jsonl', *options)
+
+def test_output_does_not_depend_on_the_number_of_processes(tmp_path):
+    single = generate_users(tmp_path / "single", '--seed', 7, '--processes', 1)
+    pooled = generate_users(tmp_path / "pooled", '--seed', 7, '--processes', 3)
+    assert set(single) == {"users.jsonl", "consents.jsonl"}
+    assert single == pooled
+    users = [json.loads(line) for line in single["users.jsonl"].splitlines()]
+    assert [user["user_id"] for user in users] == [f"user_{i:08d}" for i in range(2500)]
+
+def test_same_seed_regenerates_the_same_dataset(tmp_path):
+    first = generate_users(tmp_path / "first", '--seed', 42, '--processes', 2, '--policies', 5,
+                           '--policies-output', 'policies.json')
+    second = generate_users(tmp_path / "second", '--seed', 42, '--processes', 2, '--policies', 5,
+                            '--policies-output', 'policies.json')
+    other = generate_users(tmp_path / "other", '--seed', 43, '--processes', 2, '--policies', 5,
+                           '--policies-output', 'policies.json')
+    assert first == second
+    assert first["users.jsonl"] != other["users.jsonl"]
+
+def test_fixture_counts_follow_their_options(tmp_path):
+    written = generate(tmp_path, '--users', 40, '--output', 'users.jsonl', '--consents-output', 'consents.jsonl',
+                       '--policies', 6, '--policies-output', 'policies.json',
+                       '--audit-logs', 123, '--audit-log-dir', 'audit_logs', '--processes', 1)
+    users = [json.loads(line) for line in written["users.jsonl"].splitlines()]
+    consents = [json.loads(line) for line in written["consents.jsonl"].splitlines()]
+    policies = json.loads(written["policies.json"])["policies"]
+    assert len(users) == len(consents) == 40
+    assert [consent["user_id"] for consent in consents] == [user["user_id"] for user in users]
+    assert [policy["partner_id"] for policy in policies] == [f"partner_{i:05d}" for i in range(6)]
+
+    store = SegmentedAuditStore(str(tmp_path / "audit_logs"))
+    try:
+        entries = [record for _, record in store.iter_records()]
+    finally:
+        store.close()
+    assert len(entries) == 123
+    assert {entry["user_id"] for entry in entries} <= {user["user_id"] for user in users}
+    assert {entry["partner_id"] for entry in entries} <= {policy["partner_id"] for policy in policies}